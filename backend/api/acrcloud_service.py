@@ -1,9 +1,19 @@
+import io
+import os
 import base64
 import hashlib
 import hmac
 import time
-import requests
-from typing import Dict, Optional, Any
+import threading
+from typing import BinaryIO, Dict, Optional, Any
+from .feature_cache import audio_digest
+from .http_session import StreamingMultipart, get_http_session
+from .recognition_cache import recognition_cache
+from .recognition_snippet import extract_snippet
+from .quota import quota_limiter, quota_refusal
+
+# Código de estado de ACRCloud para cuota agotada
+ACRCLOUD_LIMIT_EXCEEDED = 3003
 
 class ACRCloudService:
     """
@@ -11,31 +21,81 @@ class ACRCloudService:
     Mucho más preciso que implementaciones caseras
     """
     
-    def __init__(self, host: str, access_key: str, access_secret: str):
+    def __init__(self, host: str, access_key: str, access_secret: str, base_url: str = None):
         self.host = host
+        self.base_url = base_url or f"https://{host}"
         self.access_key = access_key
         self.access_secret = access_secret
         self.timeout = 10
     
-    def recognize_file(self, file_path: str) -> Dict[str, Any]:
+    def recognize_file(self, file_path: str, cancel_event: threading.Event = None) -> Dict[str, Any]:
         """
         Reconocer archivo de audio usando ACRCloud
+        
+        Se envía solo un fragmento comprimido de ~12 s (extract_snippet); si el
+        audio ya es corto, el archivo se envía por bloques desde disco.
+        cancel_event permite abortar el envío.
         """
         try:
-            with open(file_path, 'rb') as f:
-                audio_data = f.read()
-            
-            return self.recognize_audio(audio_data)
+            content_hash = audio_digest(file_path)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error leyendo archivo: {str(e)}'
+            }
+        
+        cached = recognition_cache.get('acrcloud', content_hash)
+        if cached is not None:
+            return cached
+        
+        try:
+            snippet = extract_snippet(file_path)
+            if snippet is not None:
+                result = self.identify(
+                    io.BytesIO(snippet['data']), len(snippet['data']), cancel_event=cancel_event
+                )
+            else:
+                with open(file_path, 'rb') as f:
+                    result = self.identify(f, os.path.getsize(file_path), cancel_event=cancel_event)
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Error leyendo archivo: {str(e)}'
             }
+        
+        recognition_cache.set('acrcloud', content_hash, result)
+        return result
     
     def recognize_audio(self, audio_data: bytes) -> Dict[str, Any]:
         """
         Reconocer datos de audio usando ACRCloud API
+        
+        Si el mismo audio (mismo SHA-256) ya se reconoció, devuelve el resultado
+        guardado sin hacer la petición.
         """
+        content_hash = recognition_cache.digest_bytes(audio_data)
+        cached = recognition_cache.get('acrcloud', content_hash)
+        if cached is not None:
+            return cached
+        
+        result = self.identify(io.BytesIO(audio_data), len(audio_data))
+        recognition_cache.set('acrcloud', content_hash, result)
+        return result
+    
+    def identify(self, sample: BinaryIO, sample_bytes: int,
+                 cancel_event: threading.Event = None) -> Dict[str, Any]:
+        """
+        Envía el audio a ACRCloud (siempre hace la petición)
+        
+        Args:
+            sample (BinaryIO): Audio a reconocer (se lee por bloques)
+            sample_bytes (int): Tamaño del audio en bytes
+            cancel_event (threading.Event): Si se activa, se aborta el envío
+        """
+        decision = quota_limiter.acquire('acrcloud')
+        if not decision['allowed']:
+            return quota_refusal('acrcloud', decision)
+        
         try:
             # Preparar request
             http_method = "POST"
@@ -55,23 +115,32 @@ class ACRCloudService:
             ).decode('utf-8')
             
             # Preparar datos
-            files = {'sample': audio_data}
             data = {
                 'access_key': self.access_key,
-                'sample_bytes': len(audio_data),
+                'sample_bytes': sample_bytes,
                 'timestamp': timestamp,
                 'signature': signature,
                 'data_type': data_type,
                 'signature_version': signature_version
             }
+            body = StreamingMultipart(data, [
+                ('sample', 'sample', sample, sample_bytes, 'application/octet-stream')
+            ], cancel_event=cancel_event)
             
-            # Hacer request
-            url = f"https://{self.host}{http_uri}"
-            response = requests.post(url, files=files, data=data, timeout=self.timeout)
+            # Hacer request (sesión compartida con keep-alive y reintentos)
+            url = f"{self.base_url}{http_uri}"
+            response = get_http_session().post(
+                url,
+                data=body,
+                headers={'Content-Type': body.content_type},
+                timeout=self.timeout
+            )
             
             if response.status_code == 200:
-                result = response.json()
-                return self.parse_acrcloud_response(result)
+                result = self.parse_acrcloud_response(response.json())
+                if result.get('quota_exceeded'):
+                    quota_limiter.mark_exhausted('acrcloud')
+                return result
             else:
                 return {
                     'success': False,
@@ -132,6 +201,13 @@ class ACRCloudService:
                         'message': 'No se encontró coincidencia',
                         'raw_response': response
                     }
+            elif status.get('code') == ACRCLOUD_LIMIT_EXCEEDED:
+                return {
+                    'success': False,
+                    'quota_exceeded': True,
+                    'error': f"🚫 Límite de API alcanzado: {status.get('msg', 'Limit exceeded')}",
+                    'raw_response': response
+                }
             else:
                 return {
                     'success': False,
@@ -164,6 +240,14 @@ def get_acrcloud_service():
         access_key = getattr(settings, 'ACRCLOUD_ACCESS_KEY', '')
         access_secret = getattr(settings, 'ACRCLOUD_ACCESS_SECRET', '')
         
+        # Servidor local de pruebas (manage.py run_mock_recognizer): no necesita credenciales
+        mock_url = getattr(settings, 'RECOGNITION_MOCK_URL', None)
+        if mock_url:
+            acrcloud_service = ACRCloudService(
+                host, access_key or 'mock', access_secret or 'mock', base_url=mock_url.rstrip('/')
+            )
+            return acrcloud_service
+        
         if not access_key or not access_secret:
             raise ValueError(
                 'ACRCloud credentials not configured. '
@@ -0,0 +1,163 @@
+"""
+Índice aproximado de vecinos más cercanos (IVF) sobre los vectores de fingerprint
+
+Implementación en NumPy de un índice de listas invertidas: k-means agrupa los
+vectores en nlist celdas y cada búsqueda solo recorre las nprobe celdas más
+cercanas al query. Se usa como generador de candidatos; el ranking final se
+calcula de forma exacta con compare_fingerprints.
+"""
+import logging
+import numpy as np
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Índice IVF por producto interno con inserciones incrementales
+    
+    Parámetros de recall/latencia:
+        nlist: número de celdas (por defecto ~sqrt(N) al entrenar)
+        nprobe: celdas visitadas por búsqueda (más celdas = más recall, más latencia)
+    """
+    
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: int = 8,
+                 n_iter: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        # Vectores e ids de cada celda; las inserciones se consolidan de forma perezosa
+        self._list_vectors = []
+        self._list_ids = []
+        self._pending = []
+        # Celda de cada id presente en el índice
+        self._id_cell = {}
+        self.trained_size = 0
+        # Ids que no se pueden indexar (vectores no estándar): el llamador los
+        # compara siempre de forma exacta
+        self.fallback_ids = set()
+    
+    def __len__(self):
+        return len(self._id_cell)
+    
+    def train(self, vectors: np.ndarray):
+        """
+        Entrena los centroides con k-means (asignación por producto interno)
+        
+        Args:
+            vectors (np.ndarray): Vectores de entrenamiento (N, dim)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = max(1, min(nlist, n))
+        
+        rng = np.random.default_rng(self.seed)
+        if n == 0:
+            centroids = np.zeros((1, self.dim), dtype=np.float32)
+        else:
+            # Muestra acotada para que el entrenamiento no crezca con el catálogo
+            sample = vectors[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            
+            for _ in range(self.n_iter):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(nlist):
+                    members = sample[assignment == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+        
+        self.centroids = centroids
+        self._list_vectors = [np.zeros((0, self.dim), dtype=np.float32) for _ in range(len(centroids))]
+        self._list_ids = [np.zeros(0, dtype=np.int64) for _ in range(len(centroids))]
+        self._pending = [[] for _ in range(len(centroids))]
+        self._id_cell = {}
+        self.trained_size = n
+        
+        logger.info(f"Índice IVF entrenado: {len(centroids)} celdas, {n} vectores")
+    
+    def add(self, vectors: np.ndarray, ids: Iterable[int]):
+        """
+        Inserta vectores en su celda más cercana (sin reentrenar)
+        
+        Args:
+            vectors (np.ndarray): Vectores (M, dim)
+            ids (Iterable[int]): Id de cada vector
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if len(vectors) == 0:
+            return
+        
+        # Un id reinsertado reemplaza su versión anterior
+        self.remove(ids.tolist())
+        
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for c in np.unique(assignment):
+            mask = assignment == c
+            self._pending[c].append((vectors[mask], ids[mask]))
+        self._id_cell.update(zip(ids.tolist(), assignment.tolist()))
+    
+    def remove(self, ids: Iterable[int]):
+        """
+        Elimina ids del índice (los ids ausentes se ignoran)
+        """
+        for track_id in ids:
+            c = self._id_cell.pop(int(track_id), None)
+            if c is None:
+                continue
+            self._flush(c)
+            keep = self._list_ids[c] != int(track_id)
+            self._list_vectors[c] = self._list_vectors[c][keep]
+            self._list_ids[c] = self._list_ids[c][keep]
+    
+    def _flush(self, c: int):
+        """
+        Consolida las inserciones pendientes de una celda
+        """
+        if self._pending[c]:
+            self._list_vectors[c] = np.vstack([self._list_vectors[c]] + [v for v, _ in self._pending[c]])
+            self._list_ids[c] = np.concatenate([self._list_ids[c]] + [i for _, i in self._pending[c]])
+            self._pending[c] = []
+    
+    def search(self, query: np.ndarray, k: int = 50, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca los k vectores con mayor producto interno con el query
+        
+        Args:
+            query (np.ndarray): Vector del query (dim,)
+            k (int): Número de candidatos
+            nprobe (Optional[int]): Celdas a visitar (por defecto self.nprobe)
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (ids, puntuaciones) en orden descendente
+        """
+        if len(self.centroids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        cell_scores = self.centroids @ query
+        cells = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+        
+        for c in cells:
+            self._flush(c)
+        ids = np.concatenate([self._list_ids[c] for c in cells])
+        if len(ids) == 0:
+            return ids, np.zeros(0, dtype=np.float32)
+        scores = np.concatenate([self._list_vectors[c] @ query for c in cells])
+        
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return ids[top], scores[top]
+    
+    def needs_retrain(self) -> bool:
+        """
+        Indica si las inserciones desde el entrenamiento desequilibran las celdas
+        """
+        return len(self) > 2 * max(self.trained_size, 500)
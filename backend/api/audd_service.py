@@ -1,6 +1,13 @@
-import requests
+import io
+import os
 import json
-from typing import Dict, Any
+import threading
+from typing import BinaryIO, Dict, Any
+from .http_session import StreamingMultipart, get_http_session
+from .feature_cache import audio_digest
+from .recognition_cache import recognition_cache
+from .recognition_snippet import extract_snippet
+from .quota import quota_limiter, quota_refusal
 
 class AudDService:
     """
@@ -8,39 +15,106 @@ class AudDService:
     Alternativa simple y gratuita a ACRCloud
     """
     
-    def __init__(self, api_token: str = None):
+    def __init__(self, api_token: str = None, base_url: str = None):
         self.api_token = api_token
-        self.base_url = "https://api.audd.io/"
+        self.base_url = base_url or "https://api.audd.io/"
         self.timeout = 30
     
-    def recognize_file(self, file_path: str) -> Dict[str, Any]:
+    def recognize_file(self, file_path: str, content_hash: str = None,
+                       cancel_event: threading.Event = None) -> Dict[str, Any]:
         """
         Reconocer archivo de audio usando AudD API
+        
+        Si el mismo audio (mismo SHA-256) ya se reconoció, devuelve el resultado
+        guardado sin consumir cuota. Se sube solo un fragmento comprimido de
+        ~12 s (extract_snippet) salvo que el audio ya sea corto.
+        cancel_event permite abortar el envío.
+        """
+        try:
+            if content_hash is None:
+                content_hash = audio_digest(file_path)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error en reconocimiento: {str(e)}'
+            }
+        
+        cached = recognition_cache.get('audd', content_hash)
+        if cached is not None:
+            return cached
+        
+        snippet = extract_snippet(file_path)
+        if snippet is not None:
+            result = self.post_sample(
+                io.BytesIO(snippet['data']), snippet['filename'], len(snippet['data']),
+                content_type=snippet['content_type'], cancel_event=cancel_event
+            )
+        else:
+            result = self.post_file(file_path, cancel_event=cancel_event)
+        recognition_cache.set('audd', content_hash, result)
+        return result
+    
+    def post_file(self, file_path: str, cancel_event: threading.Event = None) -> Dict[str, Any]:
+        """
+        Envía el archivo a AudD (siempre consume una llamada de la cuota)
         """
         try:
             with open(file_path, 'rb') as f:
-                files = {'file': f}
-                data = {'return': 'apple_music,spotify'}
-                
-                if self.api_token:
-                    data['api_token'] = self.api_token
-                
-                response = requests.post(
-                    self.base_url,
-                    files=files,
-                    data=data,
-                    timeout=self.timeout
+                return self.post_sample(
+                    f, os.path.basename(file_path), os.path.getsize(file_path),
+                    cancel_event=cancel_event
                 )
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Error en reconocimiento: {str(e)}'
+            }
+    
+    def post_sample(self, sample: BinaryIO, filename: str, sample_bytes: int,
+                    content_type: str = 'application/octet-stream',
+                    cancel_event: threading.Event = None) -> Dict[str, Any]:
+        """
+        Envía un audio abierto a AudD (siempre consume una llamada de la cuota)
+        
+        Args:
+            sample (BinaryIO): Audio a reconocer (se lee por bloques)
+            filename (str): Nombre con el que se sube
+            sample_bytes (int): Tamaño del audio en bytes
+            content_type (str): Content type del audio
+            cancel_event (threading.Event): Si se activa, se aborta el envío
+        """
+        decision = quota_limiter.acquire('audd')
+        if not decision['allowed']:
+            return quota_refusal('audd', decision)
+        
+        try:
+            data = {'return': 'apple_music,spotify'}
+            
+            if self.api_token:
+                data['api_token'] = self.api_token
+            
+            # Cuerpo multipart leído por bloques, sesión con keep-alive
+            body = StreamingMultipart(data, [
+                ('file', filename, sample, sample_bytes, content_type)
+            ], cancel_event=cancel_event)
+            response = get_http_session().post(
+                self.base_url,
+                data=body,
+                headers={'Content-Type': body.content_type},
+                timeout=self.timeout
+            )
+            
+            if response.status_code == 200:
+                result = self.parse_audd_response(response.json())
+                if result.get('quota_exceeded'):
+                    quota_limiter.mark_exhausted('audd')
+                return result
+            else:
+                return {
+                    'success': False,
+                    'error': f'HTTP {response.status_code}: {response.text}'
+                }
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    return self.parse_audd_response(result)
-                else:
-                    return {
-                        'success': False,
-                        'error': f'HTTP {response.status_code}: {response.text}'
-                    }
-                    
         except Exception as e:
             return {
                 'success': False,
@@ -51,6 +125,10 @@ class AudDService:
         """
         Reconocer audio desde URL usando AudD API
         """
+        decision = quota_limiter.acquire('audd')
+        if not decision['allowed']:
+            return quota_refusal('audd', decision)
+        
         try:
             data = {
                 'url': audio_url,
@@ -60,15 +138,17 @@ class AudDService:
             if self.api_token:
                 data['api_token'] = self.api_token
             
-            response = requests.post(
+            response = get_http_session().post(
                 self.base_url,
                 data=data,
                 timeout=self.timeout
             )
             
             if response.status_code == 200:
-                result = response.json()
-                return self.parse_audd_response(result)
+                result = self.parse_audd_response(response.json())
+                if result.get('quota_exceeded'):
+                    quota_limiter.mark_exhausted('audd')
+                return result
             else:
                 return {
                     'success': False,
@@ -186,6 +266,12 @@ def get_audd_service():
         
         # API token es opcional para AudD (gratuito con límites)
         api_token = getattr(settings, 'AUDD_API_TOKEN', None)
-        audd_service = AudDService(api_token)
+        
+        # Servidor local de pruebas (manage.py run_mock_recognizer)
+        mock_url = getattr(settings, 'RECOGNITION_MOCK_URL', None)
+        if mock_url:
+            audd_service = AudDService(api_token, base_url=f"{mock_url.rstrip('/')}/")
+        else:
+            audd_service = AudDService(api_token)
     
     return audd_service 
\ No newline at end of file
@@ -0,0 +1,614 @@
+"""
+Decodificación de audio a PCM float32 mediante una tubería de ffmpeg
+
+librosa.load decodifica con soundfile/audioread y después remuestrea en
+Python. Aquí ffmpeg decodifica, mezcla a mono y remuestrea en un único
+proceso, y las muestras se leen de su stdout directamente a un buffer de
+NumPy. Si ffmpeg no está disponible o falla, se recurre a librosa.load.
+
+Configuración (settings):
+    AUDIO_DECODE_BACKEND: 'ffmpeg' (por defecto) o 'librosa'
+    AUDIO_RESAMPLE_QUALITY: 'fast', 'hq' (por defecto) o 'vhq'
+    AUDIO_INGEST_MAX_SECONDS: duración máxima que AudioIngestContext decodifica
+        entera en memoria (por defecto 600 s); las pistas más largas se leen
+        por bloques
+    FFMPEG_BINARY: ruta al ejecutable (por defecto 'ffmpeg' en el PATH)
+"""
+import os
+import re
+import shutil
+import logging
+import tempfile
+import subprocess
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+import librosa
+from django.conf import settings
+from .audio_quality import QualityAccumulator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 22050
+READ_CHUNK_BYTES = 1 << 20
+# Frames por bloque al leer una pista larga (~24 s a 44,1 kHz)
+STREAM_BLOCK_FRAMES = 1 << 20
+
+# Filtro de remuestreo de ffmpeg y res_type equivalente de librosa por calidad
+RESAMPLE_QUALITIES = {
+    # Resampler interno de swresample: el más rápido
+    'fast': ('aresample=resampler=swr:filter_size=16', 'soxr_lq'),
+    # soxr con 20 bits de precisión: la calidad de librosa.load por defecto (soxr_hq)
+    'hq': ('aresample=resampler=soxr:precision=20', 'soxr_hq'),
+    # soxr con 28 bits de precisión
+    'vhq': ('aresample=resampler=soxr:precision=28', 'soxr_vhq'),
+}
+
+# Calidad equivalente de soxr.ResampleStream (remuestreo por bloques)
+SOXR_QUALITIES = {'fast': 'LQ', 'hq': 'HQ', 'vhq': 'VHQ'}
+
+
+def resample_quality(quality: Optional[str] = None) -> str:
+    """
+    Calidad de remuestreo a usar (argumento o AUDIO_RESAMPLE_QUALITY)
+    """
+    quality = quality or getattr(settings, 'AUDIO_RESAMPLE_QUALITY', 'hq')
+    if quality not in RESAMPLE_QUALITIES:
+        raise ValueError(f"Calidad de remuestreo desconocida: {quality}")
+    return quality
+
+
+def ffmpeg_binary() -> Optional[str]:
+    """
+    Ruta del ejecutable de ffmpeg o None si no está instalado
+    """
+    return shutil.which(getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'))
+
+
+def run_ffmpeg(command) -> Tuple[bytearray, str]:
+    """
+    Ejecuta ffmpeg leyendo su stdout por bloques
+
+    stderr va a un archivo temporal para que un log largo no bloquee la
+    tubería mientras se lee el PCM.
+
+    Returns:
+        Tuple[bytearray, str]: (PCM de stdout, log de stderr)
+    """
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        buffer = bytearray()
+        try:
+            # Leer el PCM por bloques mientras ffmpeg sigue decodificando
+            while True:
+                chunk = process.stdout.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                buffer += chunk
+        finally:
+            process.stdout.close()
+            process.wait()
+
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg terminó con código {process.returncode}: {stderr.strip()}")
+    return buffer, stderr
+
+
+def stream_ffmpeg(command, chunk_bytes: int) -> Iterator[bytes]:
+    """
+    Ejecuta ffmpeg y entrega su stdout en bloques de chunk_bytes
+
+    Si el consumidor deja de iterar antes del final, ffmpeg se termina.
+
+    Yields:
+        bytes: Bloques de PCM (el último puede ser más corto)
+    """
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        finished = False
+        try:
+            while True:
+                chunk = process.stdout.read(chunk_bytes)
+                if not chunk:
+                    finished = True
+                    break
+                yield chunk
+        finally:
+            if not finished:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
+        if finished and process.returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode(errors='replace')
+            raise RuntimeError(f"ffmpeg terminó con código {process.returncode}: {stderr.strip()}")
+
+
+def pcm_from_buffer(buffer: bytearray, channels: int) -> np.ndarray:
+    """
+    Convierte PCM f32le entrelazado en un array (canales, muestras) sin copiar
+    """
+    usable = len(buffer) - len(buffer) % (4 * channels)
+    y = np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+    return y.reshape(-1, channels).T
+
+
+def decode_with_ffmpeg(audio_path: str, sr: int = DEFAULT_SAMPLE_RATE, mono: bool = True,
+                       quality: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """
+    Decodifica un archivo con ffmpeg a float32 al sample rate pedido
+
+    Args:
+        audio_path (str): Ruta al archivo de audio
+        sr (int): Sample rate de salida
+        mono (bool): Mezclar a mono (media de canales, como librosa)
+        quality (Optional[str]): 'fast', 'hq' o 'vhq'
+
+    Returns:
+        Tuple[np.ndarray, int]: (señal, sample rate); estéreo como (canales, muestras)
+    """
+    binary = ffmpeg_binary()
+    if binary is None:
+        raise FileNotFoundError('ffmpeg no está instalado')
+
+    resample_filter, _ = RESAMPLE_QUALITIES[resample_quality(quality)]
+    command = [
+        binary, '-nostdin', '-hide_banner', '-loglevel', 'info',
+        '-i', audio_path,
+        '-vn',
+        '-af', f'{resample_filter}:osr={int(sr)}',
+    ]
+    if not mono:
+        command += ['-ac', '2']
+    command += [
+        '-f', 'f32le',
+        '-acodec', 'pcm_f32le',
+        'pipe:1',
+    ]
+
+    buffer, log = run_ffmpeg(command)
+
+    if not mono:
+        return pcm_from_buffer(buffer, 2), int(sr)
+
+    # Canales originales mezclados aquí con la media, igual que librosa y
+    # AudioIngestContext: '-ac 1' usa la mezcla de swresample, que no es la media
+    channels = AudioIngestContext._parse_ffmpeg_header(log)['channels']
+    y = pcm_from_buffer(buffer, channels)
+    return (np.mean(y, axis=0) if channels > 1 else y[0]), int(sr)
+
+
+def decode_audio(audio_path: str, sr: int = DEFAULT_SAMPLE_RATE, mono: bool = True,
+                 quality: Optional[str] = None) -> Tuple[np.ndarray, int, Dict]:
+    """
+    load_audio informando además de cómo se decodificó
+
+    Returns:
+        Tuple[np.ndarray, int, Dict]: (señal, sample rate, decodificación), con
+            la decodificación como en load_audio_decoding
+    """
+    quality = resample_quality(quality)
+    resample_filter, res_type = RESAMPLE_QUALITIES[quality]
+
+    if getattr(settings, 'AUDIO_DECODE_BACKEND', 'ffmpeg') == 'ffmpeg' and ffmpeg_binary():
+        try:
+            y, sr = decode_with_ffmpeg(audio_path, sr=sr, mono=mono, quality=quality)
+            return y, sr, {'decoder': 'ffmpeg', 'resampler': resample_filter, 'downmix': 'mean'}
+        except Exception as e:
+            logger.warning(f"⚠️  ffmpeg no pudo decodificar {audio_path}, usando librosa: {str(e)}")
+
+    y, sr = librosa.load(audio_path, sr=sr, mono=mono, res_type=res_type)
+    return y, sr, {'decoder': 'librosa', 'resampler': res_type}
+
+
+def load_audio(audio_path: str, sr: int = DEFAULT_SAMPLE_RATE, mono: bool = True,
+               quality: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """
+    Reemplazo de librosa.load(audio_path, sr=sr, mono=mono)
+
+    Usa ffmpeg si AUDIO_DECODE_BACKEND lo permite y está instalado; si no,
+    o si ffmpeg falla, decodifica con librosa con la misma calidad.
+
+    Args:
+        audio_path (str): Ruta al archivo de audio
+        sr (int): Sample rate de salida
+        mono (bool): Mezclar a mono
+        quality (Optional[str]): 'fast', 'hq' o 'vhq' (por defecto AUDIO_RESAMPLE_QUALITY)
+
+    Returns:
+        Tuple[np.ndarray, int]: (señal float32, sample rate)
+    """
+    y, sr, _ = decode_audio(audio_path, sr=sr, mono=mono, quality=quality)
+    return y, sr
+
+
+def load_audio_decoding(quality: Optional[str] = None) -> Dict:
+    """
+    Decodificación que usará load_audio con la configuración actual
+
+    Es una previsión (para buscar en la cache antes de decodificar): si
+    ffmpeg falla, decode_audio informa de la que realmente se usó.
+
+    Returns:
+        Dict: 'decoder' ('ffmpeg' o 'librosa') y 'resampler' (filtro de
+            ffmpeg o res_type de librosa); con ffmpeg, también 'downmix' (la
+            mezcla a mono la hace decode_with_ffmpeg con la media)
+    """
+    resample_filter, res_type = RESAMPLE_QUALITIES[resample_quality(quality)]
+    if getattr(settings, 'AUDIO_DECODE_BACKEND', 'ffmpeg') == 'ffmpeg' and ffmpeg_binary():
+        return {'decoder': 'ffmpeg', 'resampler': resample_filter, 'downmix': 'mean'}
+    return {'decoder': 'librosa', 'resampler': res_type}
+
+
+def stream_decoding(quality: Optional[str] = None) -> Dict:
+    """
+    Decodificación de la lectura por bloques de SimpleFingerprint (librosa.stream,
+    que usa soundfile, y soxr)
+    """
+    return {'decoder': 'soundfile', 'resampler': RESAMPLE_QUALITIES[resample_quality(quality)][1]}
+
+
+def source_duration(audio_path: str) -> float:
+    """
+    Duración del archivo sin decodificarlo (0 si no se puede determinar)
+    """
+    try:
+        return float(librosa.get_duration(path=audio_path))
+    except Exception:
+        return 0.0
+
+
+# Nombres de distribución de canales de ffmpeg
+CHANNEL_LAYOUTS = {
+    'mono': 1, 'stereo': 2, '2.1': 3, '3.0': 3, '4.0': 4, 'quad': 4,
+    '5.0': 5, '5.1': 6, '6.0': 6, '6.1': 7, '7.0': 7, '7.1': 8,
+}
+# Bytes por muestra según el formato de muestra de ffmpeg. Los formatos en coma
+# flotante (códecs con pérdida) se cuentan como 16 bits, igual que pydub al
+# convertirlos a WAV
+SAMPLE_WIDTHS = {'u8': 1, 's16': 2, 's32': 4, 'flt': 2, 'dbl': 2, 's64': 8}
+
+
+class AudioIngestContext:
+    """
+    Audio de un archivo decodificado una sola vez, con sus metadatos de contenedor
+
+    Las pistas de hasta AUDIO_INGEST_MAX_SECONDS se decodifican enteras: el
+    PCM se guarda a la frecuencia y número de canales originales y las
+    versiones mono remuestreadas que piden el fingerprint y los landmarks se
+    derivan de él en memoria (y se cachean). Una vez derivadas, release_pcm()
+    libera el PCM original y conserva solo lo que necesita el análisis de
+    calidad (QualityAccumulator).
+
+    Las pistas más largas solo leen los metadatos: signal_blocks() decodifica
+    y remuestrea por bloques, y esa misma pasada acumula las métricas de
+    calidad, así que la memoria no depende de la duración.
+    """
+
+    def __init__(self, audio_path: str, pcm: Optional[np.ndarray], sample_rate: int, sample_width: int,
+                 format_name: str = '', bit_rate: Optional[int] = None, quality: Optional[str] = None,
+                 channels: Optional[int] = None, n_frames: Optional[int] = None, decoder: str = 'soundfile'):
+        """
+        Args:
+            audio_path (str): Ruta al archivo de audio
+            pcm (Optional[np.ndarray]): (canales, muestras) float32 en [-1, 1], o
+                None para leer el archivo por bloques
+            sample_rate (int): Sample rate original
+            sample_width (int): Bytes por muestra del original
+            format_name (str): Formato del contenedor
+            bit_rate (Optional[int]): Bitrate en bits/s
+            quality (Optional[str]): Calidad de los remuestreos
+            channels (Optional[int]): Canales (si no hay PCM)
+            n_frames (Optional[int]): Frames del archivo (si no hay PCM; estimado
+                hasta que se lee entero)
+            decoder (str): 'ffmpeg', 'soundfile' o 'librosa' (audioread)
+        """
+        self.path = audio_path
+        self.pcm = None if pcm is None else np.atleast_2d(pcm)
+        self.in_memory = self.pcm is not None
+        self.sample_rate = int(sample_rate)
+        self.channels = self.pcm.shape[0] if self.in_memory else int(channels)
+        self.n_frames = self.pcm.shape[1] if self.in_memory else int(n_frames or 0)
+        self.sample_width = int(sample_width)
+        self.format_name = format_name
+        self.bit_rate = bit_rate
+        self.file_size = os.path.getsize(audio_path)
+        self.quality = resample_quality(quality)
+        self.decoder = decoder
+        self._signals = {}
+        self._quality = None
+
+    @property
+    def frame_width(self) -> int:
+        return self.sample_width * self.channels
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.n_frames / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def resampler(self) -> str:
+        """
+        Remuestreador de las señales derivadas (librosa.resample o soxr por bloques)
+        """
+        return RESAMPLE_QUALITIES[self.quality][1]
+
+    @property
+    def decoding(self) -> Dict:
+        """
+        Decodificación de las señales derivadas (mismo formato que load_audio_decoding)
+        """
+        return {'decoder': self.decoder, 'resampler': self.resampler}
+
+    def signal(self, sr: int = DEFAULT_SAMPLE_RATE) -> Tuple[np.ndarray, int]:
+        """
+        Señal mono al sample rate pedido (equivale a librosa.load(path, sr=sr))
+
+        Sin el PCM en memoria se construye con signal_blocks(), que solo
+        guarda la señal mono al sample rate pedido.
+        """
+        if sr not in self._signals:
+            if self.pcm is None:
+                y = np.concatenate([np.zeros(0, dtype=np.float32), *self.signal_blocks(sr)])
+            else:
+                y = np.mean(self.pcm, axis=0) if self.channels > 1 else self.pcm[0]
+                if sr != self.sample_rate:
+                    _, res_type = RESAMPLE_QUALITIES[self.quality]
+                    y = librosa.resample(y, orig_sr=self.sample_rate, target_sr=sr, res_type=res_type)
+            self._signals[sr] = np.ascontiguousarray(y, dtype=np.float32)
+        return self._signals[sr], sr
+
+    def release_pcm(self):
+        """
+        Libera el PCM original tras derivar las señales que se vayan a usar
+
+        Antes acumula las métricas de calidad, que son lo único que lo necesita.
+        """
+        if self.pcm is not None:
+            self._quality = QualityAccumulator(self.sample_rate, self.channels)
+            self._quality.add(self.pcm)
+            self.pcm = None
+
+    def blocks(self, block_frames: int = STREAM_BLOCK_FRAMES) -> Iterator[np.ndarray]:
+        """
+        PCM original por bloques (canales, muestras) float32
+
+        Raises:
+            ValueError: Si el PCM de un contexto en memoria ya se liberó
+        """
+        if self.in_memory:
+            if self.pcm is None:
+                raise ValueError('El PCM de este contexto ya se liberó')
+            for start in range(0, self.pcm.shape[1], block_frames):
+                yield self.pcm[:, start:start + block_frames]
+        elif self.decoder == 'ffmpeg':
+            command = [
+                ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error',
+                '-i', self.path,
+                '-vn',
+                '-f', 'f32le',
+                '-acodec', 'pcm_f32le',
+                'pipe:1',
+            ]
+            for chunk in stream_ffmpeg(command, block_frames * self.channels * 4):
+                yield pcm_from_buffer(chunk, self.channels)
+        else:
+            import soundfile as sf
+
+            for block in sf.blocks(self.path, blocksize=block_frames, dtype='float32', always_2d=True):
+                yield block.T
+
+    def signal_blocks(self, sr: int = DEFAULT_SAMPLE_RATE,
+                      block_frames: int = STREAM_BLOCK_FRAMES) -> Iterator[np.ndarray]:
+        """
+        Señal mono al sample rate pedido, por bloques contiguos
+
+        En un contexto por bloques la pasada completa deja acumuladas las
+        métricas de calidad (quality_metrics() no vuelve a decodificar el archivo).
+
+        Yields:
+            np.ndarray: Bloques float32 mono sin solapamiento
+        """
+        if self.in_memory:
+            y, _ = self.signal(sr)
+            for start in range(0, len(y), block_frames):
+                yield y[start:start + block_frames]
+            return
+
+        import soxr
+
+        accumulator = QualityAccumulator(self.sample_rate, self.channels)
+        resampler = None
+        if sr != self.sample_rate:
+            resampler = soxr.ResampleStream(self.sample_rate, sr, 1, dtype='float32',
+                                            quality=SOXR_QUALITIES[self.quality])
+
+        for block in self.blocks(block_frames):
+            accumulator.add(block)
+            mono = np.ascontiguousarray(np.mean(block, axis=0) if self.channels > 1 else block[0], dtype=np.float32)
+            out = resampler.resample_chunk(mono) if resampler is not None else mono
+            if len(out):
+                yield out
+        if resampler is not None:
+            out = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(out):
+                yield out
+
+        self.n_frames = accumulator.n_frames
+        self._quality = accumulator
+
+    def quality_metrics(self, min_silence_len: int = 100, silence_thresh: float = -50,
+                keep_silence: int = 100) -> Dict:
+        """
+        Métricas de calidad del audio (mismo formato que analyze_quality)
+
+        Usa lo acumulado por release_pcm() o por una pasada completa de
+        signal_blocks(); si no hay nada, recorre el PCM (o el archivo por bloques).
+        """
+        if self._quality is None:
+            accumulator = QualityAccumulator(self.sample_rate, self.channels)
+            for block in self.blocks():
+                accumulator.add(block)
+            self._quality = accumulator
+        return self._quality.result(self.sample_width, min_silence_len, silence_thresh, keep_silence)
+
+    @classmethod
+    def from_file(cls, audio_path: str, quality: Optional[str] = None,
+                  max_seconds: Optional[float] = None) -> 'AudioIngestContext':
+        """
+        Decodifica el archivo una vez (ffmpeg o, en su defecto, soundfile/librosa)
+
+        Args:
+            audio_path (str): Ruta al archivo de audio
+            quality (Optional[str]): Calidad para los remuestreos posteriores
+            max_seconds (Optional[float]): Duración máxima para decodificar en
+                memoria (por defecto AUDIO_INGEST_MAX_SECONDS)
+
+        Returns:
+            AudioIngestContext: PCM original (o solo metadatos si la pista es
+                más larga) y metadatos
+        """
+        if max_seconds is None:
+            max_seconds = getattr(settings, 'AUDIO_INGEST_MAX_SECONDS', 600)
+        use_ffmpeg = getattr(settings, 'AUDIO_DECODE_BACKEND', 'ffmpeg') == 'ffmpeg' and ffmpeg_binary()
+
+        duration = source_duration(audio_path)
+        if duration > max_seconds:
+            try:
+                if use_ffmpeg:
+                    return cls._probe_ffmpeg(audio_path, quality, duration)
+                return cls._probe_soundfile(audio_path, quality)
+            except Exception as e:
+                logger.warning(f"⚠️  No se pudo leer {audio_path} por bloques, decodificando entero: {str(e)}")
+
+        if use_ffmpeg:
+            try:
+                return cls._from_ffmpeg(audio_path, quality)
+            except Exception as e:
+                logger.warning(f"⚠️  ffmpeg no pudo decodificar {audio_path}, usando soundfile/librosa: {str(e)}")
+        return cls._from_soundfile(audio_path, quality)
+
+    @staticmethod
+    def _parse_ffmpeg_header(log: str) -> Dict:
+        """
+        Metadatos de la cabecera que ffmpeg imprime al abrir la entrada
+        (los mismos que devolvería ffprobe)
+        """
+        stream = re.search(r"Stream #0:\d+.*?: Audio: [^\n]*?, (\d+) Hz, ([^,\n]+), (\w+)(?: \((\d+) bit\))?", log)
+        if stream is None:
+            raise ValueError('No se encontró un stream de audio en la salida de ffmpeg')
+        sample_rate = int(stream.group(1))
+        layout = stream.group(2).split('(')[0].strip()
+        channels = CHANNEL_LAYOUTS.get(layout)
+        if channels is None:
+            match = re.match(r"(\d+) channels", layout)
+            if match is None:
+                raise ValueError(f"Distribución de canales desconocida: {layout}")
+            channels = int(match.group(1))
+        if stream.group(4):
+            sample_width = (int(stream.group(4)) + 7) // 8
+        else:
+            sample_width = SAMPLE_WIDTHS.get(stream.group(3).rstrip('p'), 2)
+
+        container = re.search(r"Input #0, (.+?), from '", log)
+        bitrate = re.search(r"Duration: .*?bitrate: (\d+) kb/s", log)
+
+        return {
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'sample_width': sample_width,
+            'format_name': container.group(1) if container else '',
+            'bit_rate': int(bitrate.group(1)) * 1000 if bitrate else None,
+        }
+
+    @classmethod
+    def _from_ffmpeg(cls, audio_path: str, quality: Optional[str]) -> 'AudioIngestContext':
+        command = [
+            ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'info',
+            '-i', audio_path,
+            '-vn',
+            '-f', 'f32le',
+            '-acodec', 'pcm_f32le',
+            'pipe:1',
+        ]
+        buffer, log = run_ffmpeg(command)
+        header = cls._parse_ffmpeg_header(log)
+
+        return cls(
+            audio_path,
+            pcm_from_buffer(buffer, header['channels']),
+            header['sample_rate'],
+            header['sample_width'],
+            format_name=header['format_name'],
+            bit_rate=header['bit_rate'],
+            quality=quality,
+            decoder='ffmpeg'
+        )
+
+    @classmethod
+    def _probe_ffmpeg(cls, audio_path: str, quality: Optional[str], duration: float) -> 'AudioIngestContext':
+        # Abrir la entrada sin decodificar nada: solo la cabecera
+        command = [
+            ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'info',
+            '-i', audio_path,
+            '-vn', '-t', '0',
+            '-f', 'null', '-',
+        ]
+        _, log = run_ffmpeg(command)
+        header = cls._parse_ffmpeg_header(log)
+
+        return cls(
+            audio_path,
+            None,
+            header['sample_rate'],
+            header['sample_width'],
+            format_name=header['format_name'],
+            bit_rate=header['bit_rate'],
+            quality=quality,
+            channels=header['channels'],
+            n_frames=int(round(duration * header['sample_rate'])),
+            decoder='ffmpeg'
+        )
+
+    @staticmethod
+    def _soundfile_width(subtype: str) -> int:
+        match = re.match(r"PCM_(\d+)", subtype)
+        return int(match.group(1)) // 8 if match else (1 if subtype == 'PCM_U8' else 2)
+
+    @classmethod
+    def _probe_soundfile(cls, audio_path: str, quality: Optional[str]) -> 'AudioIngestContext':
+        import soundfile as sf
+
+        info = sf.info(audio_path)
+        bit_rate = int(os.path.getsize(audio_path) * 8 / info.duration) if info.duration else None
+        return cls(audio_path, None, info.samplerate, cls._soundfile_width(info.subtype),
+                   format_name=info.format.lower(), bit_rate=bit_rate, quality=quality,
+                   channels=info.channels, n_frames=info.frames)
+
+    @classmethod
+    def _from_soundfile(cls, audio_path: str, quality: Optional[str]) -> 'AudioIngestContext':
+        import soundfile as sf
+
+        try:
+            info = sf.info(audio_path)
+            pcm, sample_rate = sf.read(audio_path, dtype='float32', always_2d=True)
+            pcm = pcm.T
+            sample_width = cls._soundfile_width(info.subtype)
+            format_name = info.format.lower()
+            decoder = 'soundfile'
+        except Exception:
+            # Formatos que libsndfile no soporta: audioread vía librosa
+            pcm, sample_rate = librosa.load(audio_path, sr=None, mono=False)
+            sample_width = 2
+            format_name = os.path.splitext(audio_path)[1].lstrip('.').lower()
+            decoder = 'librosa'
+
+        pcm = np.atleast_2d(pcm)
+        duration = pcm.shape[1] / sample_rate if sample_rate else 0
+        bit_rate = int(os.path.getsize(audio_path) * 8 / duration) if duration else None
+
+        return cls(audio_path, pcm, sample_rate, sample_width,
+                   format_name=format_name, bit_rate=bit_rate, quality=quality, decoder=decoder)
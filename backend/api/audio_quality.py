@@ -0,0 +1,264 @@
+"""
+Métricas de calidad de audio (picos, clipping, RMS y silencio) con NumPy
+
+Reproduce lo que analyze_audio_file calculaba con pydub (AudioSegment.max,
+AudioSegment.rms y pydub.silence.split_on_silence) a partir del PCM ya
+decodificado, en una sola pasada vectorizada: la energía se acumula por
+milisegundo y el dBFS de cada ventana deslizante sale de sumas acumuladas,
+en lugar de recortar el AudioSegment milisegundo a milisegundo.
+QualityAccumulator hace lo mismo por bloques, para las pistas largas que no
+se decodifican enteras en memoria.
+"""
+from typing import Dict
+import numpy as np
+
+
+def full_scale(sample_width: int) -> int:
+    """
+    Amplitud máxima de una muestra entera del ancho dado (32768 para 16 bits)
+    """
+    return 2 ** (8 * sample_width - 1)
+
+
+def ms_index(frames: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Milisegundo al que pertenece cada frame
+
+    El milisegundo m empieza en el frame floor(m * sample_rate / 1000), como
+    el slicing de pydub.
+    """
+    return ((frames + 1) * 1000 + sample_rate - 1) // sample_rate - 1
+
+
+class QualityAccumulator:
+    """
+    Acumula por bloques lo que necesita analyze_quality
+
+    Guarda el pico, la suma de cuadrados y la energía y el número de frames
+    de cada milisegundo (12 bytes por milisegundo, unos 90 MB para dos
+    horas), así que las métricas de una pista larga salen sin tener el PCM
+    completo en memoria y coinciden con las de la pista entera.
+    """
+
+    def __init__(self, sample_rate: int, channels: int):
+        self.sample_rate = int(sample_rate)
+        self.channels = int(channels)
+        self.n_frames = 0
+        self.peak = 0.0
+        self.sum_squares = 0.0
+        self.n_ms = 0
+        self._energy = []
+        self._counts = []
+
+    def add(self, pcm: np.ndarray):
+        """
+        Añade el siguiente bloque (canales, muestras) float en [-1, 1]
+        """
+        pcm = np.atleast_2d(pcm)
+        n = pcm.shape[1]
+        if n == 0 or self.sample_rate <= 0:
+            return
+
+        energy = np.square(pcm, dtype=np.float32).sum(axis=0)
+        self.peak = max(self.peak, float(np.max(np.abs(pcm))))
+        self.sum_squares += float(energy.sum(dtype=np.float64))
+
+        ms = ms_index(np.arange(self.n_frames, self.n_frames + n, dtype=np.int64), self.sample_rate)
+        first = int(ms[0])
+        per_ms = np.bincount(ms - first, weights=energy)
+        counts = np.bincount(ms - first).astype(np.int32)
+
+        # El primer milisegundo del bloque puede haber empezado en el anterior
+        if first < self.n_ms:
+            self._energy[-1][-1] += per_ms[0]
+            self._counts[-1][-1] += counts[0]
+            per_ms, counts = per_ms[1:], counts[1:]
+        if len(per_ms):
+            self._energy.append(per_ms)
+            self._counts.append(counts)
+            self.n_ms += len(per_ms)
+        self.n_frames += n
+
+    @property
+    def length_ms(self) -> int:
+        """
+        Duración en milisegundos redondeada, como len(AudioSegment)
+        """
+        return int(round(1000 * self.n_frames / self.sample_rate)) if self.sample_rate else 0
+
+    def window_dbfs(self, window_ms: int = 100) -> np.ndarray:
+        """
+        dBFS de cada ventana de window_ms que empieza en cada milisegundo
+
+        Returns:
+            np.ndarray: dBFS (RMS de todos los canales) por ventana; vacío si el
+                audio dura menos que una ventana
+        """
+        length_ms = self.length_ms
+        if length_ms < window_ms or self.n_frames == 0:
+            return np.zeros(0, dtype=np.float64)
+
+        energy = np.zeros(length_ms, dtype=np.float64)
+        counts = np.zeros(length_ms, dtype=np.int64)
+        per_ms = np.concatenate(self._energy)
+        frames = np.concatenate(self._counts)
+        used = min(length_ms, len(per_ms))
+        energy[:used] = per_ms[:used]
+        counts[:used] = frames[:used]
+        # Frames más allá de la duración redondeada: su energía cuenta en el
+        # último milisegundo, pero no como muestras (igual que pydub)
+        energy[-1] += per_ms[used:].sum()
+
+        cumulative = np.concatenate([[0.0], np.cumsum(energy)])
+        cumulative_frames = np.concatenate([[0], np.cumsum(counts)])
+        starts = np.arange(length_ms - window_ms + 1)
+        ends = starts + window_ms
+        samples = (cumulative_frames[ends] - cumulative_frames[starts]) * self.channels
+        mean_square = (cumulative[ends] - cumulative[starts]) / np.maximum(samples, 1)
+
+        with np.errstate(divide='ignore'):
+            return 10.0 * np.log10(np.maximum(mean_square, 0.0))
+
+    def result(self, sample_width: int = 2, min_silence_len: int = 100,
+               silence_thresh: float = -50, keep_silence: int = 100) -> Dict:
+        """
+        Métricas de todo lo acumulado (mismo formato que analyze_quality)
+        """
+        if self.n_frames == 0:
+            return {
+                'duration_ms': 0,
+                'max_amplitude': 0.0,
+                'rms_amplitude': 0.0,
+                'peak_dbfs': float('-inf'),
+                'rms_dbfs': float('-inf'),
+                'clipping_detected': False,
+                'silence_percentage': 0.0,
+            }
+
+        scale = full_scale(sample_width)
+        length_ms = self.length_ms
+        peak = self.peak
+        rms = float(np.sqrt(self.sum_squares / (self.n_frames * self.channels)))
+        max_amplitude = float(min(round(peak * scale), scale))
+
+        with np.errstate(divide='ignore'):
+            peak_dbfs = float(20 * np.log10(peak)) if peak > 0 else float('-inf')
+            rms_dbfs = float(20 * np.log10(rms)) if rms > 0 else float('-inf')
+
+        dbfs = self.window_dbfs(window_ms=min_silence_len)
+
+        return {
+            'duration_ms': length_ms,
+            'max_amplitude': max_amplitude,
+            'rms_amplitude': rms * scale,
+            'peak_dbfs': peak_dbfs,
+            'rms_dbfs': rms_dbfs,
+            # Picos al 99% de la escala completa (32767 * 0.99 en 16 bits)
+            'clipping_detected': max_amplitude >= (scale - 1) * 0.99,
+            'silence_percentage': silence_percentage(
+                dbfs, length_ms, min_silence_len, silence_thresh, keep_silence
+            ),
+        }
+
+
+def window_dbfs(pcm: np.ndarray, sample_rate: int, window_ms: int = 100) -> np.ndarray:
+    """
+    dBFS de cada ventana de window_ms que empieza en cada milisegundo
+
+    Args:
+        pcm (np.ndarray): Audio (canales, muestras) float en [-1, 1]
+        sample_rate (int): Sample rate
+        window_ms (int): Duración de la ventana en milisegundos
+
+    Returns:
+        np.ndarray: dBFS (RMS de todos los canales) por ventana; vacío si el
+            audio dura menos que una ventana
+    """
+    pcm = np.atleast_2d(pcm)
+    accumulator = QualityAccumulator(sample_rate, pcm.shape[0])
+    accumulator.add(pcm)
+    return accumulator.window_dbfs(window_ms)
+
+
+def silent_ranges(dbfs: np.ndarray, min_silence_len: int, silence_thresh: float) -> np.ndarray:
+    """
+    Rangos de silencio en milisegundos (mismo criterio que pydub.silence.detect_silence)
+
+    Returns:
+        np.ndarray: (n_rangos, 2) con [inicio, fin) de cada rango
+    """
+    starts = np.flatnonzero(dbfs <= silence_thresh)
+    if len(starts) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # pydub une ventanas silenciosas separadas por menos de min_silence_len
+    breaks = np.flatnonzero(np.diff(starts) > min_silence_len)
+    range_starts = starts[np.concatenate([[0], breaks + 1])]
+    range_ends = starts[np.concatenate([breaks, [len(starts) - 1]])] + min_silence_len
+    return np.column_stack([range_starts, range_ends])
+
+
+def silence_percentage(dbfs: np.ndarray, length_ms: int, min_silence_len: int = 100,
+                       silence_thresh: float = -50, keep_silence: int = 100) -> float:
+    """
+    Porcentaje del audio que split_on_silence descartaría como silencio
+
+    Args:
+        dbfs (np.ndarray): Resultado de window_dbfs con window_ms=min_silence_len
+        length_ms (int): Duración total en milisegundos
+        min_silence_len (int): Duración mínima de un silencio (ms)
+        silence_thresh (float): Umbral en dBFS
+        keep_silence (int): Silencio que conserva cada fragmento a cada lado (ms)
+
+    Returns:
+        float: Porcentaje de silencio (0-100)
+    """
+    if length_ms <= 0:
+        return 0.0
+
+    silences = silent_ranges(dbfs, min_silence_len, silence_thresh)
+    if len(silences) == 0:
+        return 0.0
+
+    # Rangos con sonido: complemento de los silencios
+    edges = np.concatenate([[0], silences.ravel(), [length_ms]])
+    sound = edges.reshape(-1, 2)
+    sound = sound[sound[:, 1] > sound[:, 0]]
+    if len(sound) == 0:
+        return 100.0
+
+    # Cada fragmento conserva keep_silence a cada lado; los solapes se parten por la mitad
+    out_starts = sound[:, 0] - keep_silence
+    out_ends = sound[:, 1] + keep_silence
+    overlap = out_starts[1:] < out_ends[:-1]
+    middle = (out_ends[:-1] + out_starts[1:]) // 2
+    out_ends[:-1] = np.where(overlap, middle, out_ends[:-1])
+    out_starts[1:] = np.where(overlap, middle, out_starts[1:])
+
+    kept = np.maximum(np.minimum(out_ends, length_ms) - np.maximum(out_starts, 0), 0).sum()
+    return float(max(length_ms - kept, 0) / length_ms * 100)
+
+
+def analyze_quality(pcm: np.ndarray, sample_rate: int, sample_width: int = 2,
+                    min_silence_len: int = 100, silence_thresh: float = -50,
+                    keep_silence: int = 100) -> Dict:
+    """
+    Métricas básicas de calidad del audio decodificado
+
+    Args:
+        pcm (np.ndarray): Audio (canales, muestras) float en [-1, 1]
+        sample_rate (int): Sample rate
+        sample_width (int): Bytes por muestra del original (escala de las amplitudes)
+        min_silence_len (int): Duración mínima de un silencio (ms)
+        silence_thresh (float): Umbral de silencio en dBFS
+        keep_silence (int): Silencio conservado alrededor del sonido (ms)
+
+    Returns:
+        Dict: duration_ms, max_amplitude y rms_amplitude (en unidades de muestra
+            entera, como pydub), peak_dbfs, rms_dbfs, clipping_detected y
+            silence_percentage
+    """
+    pcm = np.atleast_2d(pcm)
+    accumulator = QualityAccumulator(sample_rate, pcm.shape[0])
+    accumulator.add(pcm)
+    return accumulator.result(sample_width, min_silence_len, silence_thresh, keep_silence)
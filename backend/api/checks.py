@@ -0,0 +1,34 @@
+"""
+Comprobaciones de configuración al arrancar cada proceso (web y workers)
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# Alias de cache cuyo contenido tienen que ver todos los procesos (además del
+# de RECOGNITION_CACHE_ALIAS, la cache de resultados de AudD/ACRCloud)
+SHARED_CACHE_ALIASES = ['default']
+
+# Backends que guardan las entradas en la memoria de cada proceso
+PROCESS_LOCAL_CACHE_BACKENDS = ['django.core.cache.backends.locmem.LocMemCache']
+
+
+def check_shared_caches():
+    """
+    Falla si un cache que debe ser compartido usa un backend local al proceso
+
+    Con LocMemCache cada worker tendría su propia copia y los cambios hechos
+    en un proceso no llegarían al resto sin ningún error visible.
+
+    Raises:
+        ImproperlyConfigured: Si algún alias compartido falta o es local
+    """
+    aliases = SHARED_CACHE_ALIASES + [getattr(settings, 'RECOGNITION_CACHE_ALIAS', 'recognition')]
+    for alias in aliases:
+        if alias not in settings.CACHES:
+            raise ImproperlyConfigured(f"Falta CACHES['{alias}'] (ver CACHES en settings)")
+        backend = settings.CACHES[alias].get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHE_BACKENDS:
+            raise ImproperlyConfigured(
+                f"CACHES['{alias}'] usa {backend}, que no se comparte entre procesos. "
+                f"Configura Redis (CACHE_REDIS_URL) o DatabaseCache (python manage.py createcachetable)."
+            )
@@ -0,0 +1,135 @@
+"""
+GET condicionales (ETag / Last-Modified) para endpoints de solo lectura
+
+Los reconocimientos terminados y el catálogo de referencia (géneros, moods)
+casi nunca cambian, pero cada petición reconstruía y serializaba la respuesta
+completa. Aquí los validadores salen de las columnas updated_at de las filas
+que forman la respuesta (una consulta ligera con values() o aggregate()), y
+se comparan con If-None-Match / If-Modified-Since antes de serializar nada:
+si coinciden se responde 304 sin cuerpo.
+
+Las respuestas dependen del usuario autenticado, así que se marcan como
+private, no-cache: el navegador guarda la copia pero la revalida siempre.
+"""
+import hashlib
+from datetime import datetime
+from typing import Any, Optional
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    ETag fuerte a partir de los valores que determinan la respuesta
+
+    Args:
+        *parts: Identificadores y marcas de tiempo (se usa su repr)
+
+    Returns:
+        str: ETag entre comillas
+    """
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def latest(*timestamps: Optional[datetime]) -> Optional[datetime]:
+    """
+    Marca de tiempo más reciente (ignora los None)
+    """
+    values = [t for t in timestamps if t is not None]
+    return max(values) if values else None
+
+
+def not_modified(request, etag: str, last_modified: Optional[datetime] = None):
+    """
+    Respuesta 304 si la copia del cliente sigue vigente, None en otro caso
+
+    Args:
+        request: Petición (Django o DRF)
+        etag (str): ETag actual de la respuesta
+        last_modified (Optional[datetime]): Última modificación de los datos
+
+    Returns:
+        HttpResponseNotModified o None
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag: str, last_modified: Optional[datetime] = None):
+    """
+    Añade ETag, Last-Modified y Cache-Control a una respuesta
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def queryset_etag(queryset) -> str:
+    """
+    ETag de un listado: número de filas, id máximo y updated_at más reciente
+
+    Las altas cambian el id máximo, las bajas el número de filas y las
+    ediciones updated_at, así que basta una consulta aggregate().
+    """
+    summary = queryset.aggregate(count=Count('pk'), max_id=Max('pk'), updated=Max('updated_at'))
+    return make_etag(queryset.model._meta.label, summary['count'], summary['max_id'], summary['updated'])
+
+
+def row_validators(queryset, *fields: str, **filters: Any):
+    """
+    ETag y Last-Modified de la primera fila de un queryset sin cargar objetos
+
+    Args:
+        queryset: Queryset (ordenado) donde buscar la fila
+        *fields: Campos a leer con values(); los que acaban en updated_at
+            cuentan para Last-Modified (p. ej. recognized_track__updated_at)
+        **filters: Filtros hasta la fila buscada (p. ej. pk de la URL)
+
+    Returns:
+        Tuple[str, Optional[datetime]] o None si no hay fila
+    """
+    try:
+        row = queryset.filter(**filters).values('pk', *fields).first()
+    except (TypeError, ValueError, ValidationError):
+        # pk mal formado en la URL: la vista devolverá su propio 404
+        return None
+    if row is None:
+        return None
+    etag = make_etag(queryset.model._meta.label, *row.values())
+    last_modified = latest(*(value for name, value in row.items() if name.endswith('updated_at')))
+    return etag, last_modified
+
+
+class ConditionalGetMixin:
+    """
+    list() y retrieve() con validadores para ViewSets de modelos con updated_at
+
+    El listado solo lleva ETag: borrar una fila no mueve ningún updated_at,
+    así que Last-Modified podría dar un 304 incorrecto.
+    """
+
+    def list(self, request, *args, **kwargs):
+        etag = queryset_etag(self.filter_queryset(self.get_queryset()))
+        cached = not_modified(request, etag)
+        if cached is not None:
+            return cached
+        return set_validators(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(instance._meta.label, instance.pk, instance.updated_at)
+        cached = not_modified(request, etag, instance.updated_at)
+        if cached is not None:
+            return cached
+
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, instance.updated_at)
@@ -11,20 +11,141 @@ import logging
 from django.conf import settings
 from django.core.cache import cache
 from typing import Dict, List, Tuple, Optional
+from .ann_index import IVFIndex
+from .audio_decode import (
+    SOXR_QUALITIES, AudioIngestContext, decode_audio, load_audio_decoding, resample_quality,
+    source_duration, stream_decoding
+)
+from .feature_cache import audio_digest, feature_cache
 
 logger = logging.getLogger(__name__)
 
 
+class RunningStats:
+    """
+    Media y desviación estándar incrementales (Welford / Chan por bloques)
+    """
+    
+    def __init__(self, dim: int):
+        self.count = 0
+        self.mean = np.zeros(dim, dtype=np.float64)
+        self.m2 = np.zeros(dim, dtype=np.float64)
+    
+    def update(self, block: np.ndarray):
+        """
+        Añade un bloque de frames (dim, n_frames)
+        """
+        block = np.atleast_2d(block).astype(np.float64)
+        n = block.shape[1]
+        if n == 0:
+            return
+        block_mean = block.mean(axis=1)
+        block_m2 = ((block - block_mean[:, None]) ** 2).sum(axis=1)
+        
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+    
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (media, desviación estándar poblacional, como np.std)
+        """
+        if self.count == 0:
+            return self.mean, self.m2
+        return self.mean, np.sqrt(self.m2 / self.count)
+
+
+class SegmentAccumulator:
+    """
+    Sumas por segmentos de frames consecutivos, alimentadas por bloques
+    
+    Produce lo mismo que SimpleFingerprint.segment_features sobre la pista
+    completa: un segmento puede empezar en un bloque y terminar en el siguiente.
+    """
+    
+    def __init__(self, frames_per_segment: int, dim: int):
+        self.frames_per_segment = frames_per_segment
+        self.dim = dim
+        self.n_frames = 0
+        self._sums = []
+        self._counts = []
+    
+    def update(self, values: np.ndarray):
+        """
+        Añade un bloque de frames (dim, n_frames)
+        """
+        n = values.shape[1]
+        if n == 0:
+            return
+        segment_ids = (self.n_frames + np.arange(n)) // self.frames_per_segment
+        starts = np.flatnonzero(np.r_[True, segment_ids[1:] != segment_ids[:-1]])
+        sums = np.add.reduceat(values.astype(np.float64), starts, axis=1).T
+        counts = np.diff(np.append(starts, n))
+        
+        # El primer segmento del bloque continúa el último si quedó a medias
+        if self.n_frames % self.frames_per_segment:
+            self._sums[-1] = self._sums[-1] + sums[0]
+            self._counts[-1] += int(counts[0])
+            sums, counts = sums[1:], counts[1:]
+        self._sums.extend(sums)
+        self._counts.extend(int(c) for c in counts)
+        self.n_frames += n
+    
+    def result(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (sumas float32 (n_segmentos, dim), frames por segmento)
+        """
+        sums = np.array(self._sums, dtype=np.float64).reshape(-1, self.dim)
+        return sums.astype(np.float32), np.array(self._counts, dtype=np.int32)
+
+
 class SimpleFingerprint:
     """
     Sistema de fingerprinting de audio simplificado tipo Shazam
     """
     
+    # Incrementar al cambiar cómo se calculan las características (invalida la cache)
+    FEATURE_VERSION = 2
+    # Rango dinámico del espectrograma mel en dB (top_db de librosa.power_to_db)
+    TOP_DB = 80.0
+    
     def __init__(self):
         self.sample_rate = 22050
         self.n_fft = 2048
         self.hop_length = 512
         self.n_mels = 128
+        # Pistas más largas se procesan por bloques con memoria acotada
+        self.streaming_min_duration = 600  # segundos
+        self.stream_block_samples = 1 << 20  # ~47 s a 22050 Hz
+        # Segmentos para las ventanas de referencia (ventanas de 5 s con solape del 50%)
+        self.segment_seconds = 2.5
+        self.window_segments = 2
+    
+    def extractor_config(self) -> Dict:
+        """
+        Parámetros que determinan las características (clave de la cache, junto
+        con la decodificación que produjo la señal)
+        """
+        return {
+            'extractor': 'summary',
+            'version': self.FEATURE_VERSION,
+            'sample_rate': self.sample_rate,
+            'n_fft': self.n_fft,
+            'hop_length': self.hop_length,
+            'n_mels': self.n_mels,
+            'streaming_min_duration': self.streaming_min_duration,
+        }
+    
+    def expected_decoding(self, audio_path: str) -> Dict:
+        """
+        Decodificación que usará extract_features con este archivo (previsión
+        para buscar en la cache antes de decodificar)
+        """
+        if self._source_duration(audio_path) >= self.streaming_min_duration:
+            return stream_decoding()
+        return load_audio_decoding()
         
     def extract_features(self, audio_path: str) -> Dict:
         """
@@ -34,77 +155,417 @@ class SimpleFingerprint:
             audio_path (str): Ruta al archivo de audio
             
         Returns:
-            Dict: Características extraídas
+            Dict: Características extraídas; si tiene éxito, 'decoding' indica el
+                decodificador y el remuestreador usados
         """
         try:
-            # Cargar audio
-            y, sr = librosa.load(audio_path, sr=self.sample_rate)
+            if self._source_duration(audio_path) >= self.streaming_min_duration:
+                result = self.extract_features_streaming(audio_path)
+                decoding = stream_decoding()
+            else:
+                # Cargar audio
+                y, sr, decoding = decode_audio(audio_path, sr=self.sample_rate)
+                result = self.extract_features_from_signal(y, sr)
             
-            # Características espectrales
-            spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-            spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(y)[0]
+            if result['success']:
+                result['decoding'] = decoding
+            return result
             
-            # MFCC (características más importantes para identificación)
-            mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        except Exception as e:
+            logger.error(f"Error extrayendo características de {audio_path}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    @staticmethod
+    def _source_duration(audio_path: str) -> float:
+        """
+        Duración del archivo sin decodificarlo (0 si no se puede determinar)
+        """
+        return source_duration(audio_path)
+    
+    def _stream_blocks(self, audio_path: str):
+        """
+        Decodifica el archivo por bloques mono al sample rate de trabajo
+        
+        Yields:
+            np.ndarray: Bloques float32 contiguos (sin solapamiento)
+        """
+        import soxr
+        
+        native_sr = librosa.get_samplerate(audio_path)
+        block = self.stream_block_samples
+        stream = librosa.stream(
+            audio_path,
+            block_length=1,
+            frame_length=block,
+            hop_length=block,
+            mono=True
+        )
+        
+        if native_sr == self.sample_rate:
+            yield from stream
+            return
+        
+        # Remuestreo en streaming con la calidad configurada (AUDIO_RESAMPLE_QUALITY)
+        resampler = soxr.ResampleStream(native_sr, self.sample_rate, 1, dtype='float32',
+                                        quality=SOXR_QUALITIES[resample_quality()])
+        for chunk in stream:
+            out = resampler.resample_chunk(chunk)
+            if len(out):
+                yield out
+        out = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        if len(out):
+            yield out
+    
+    def extract_features_streaming(self, audio_path: str) -> Dict:
+        """
+        Extrae características de un archivo por bloques con memoria acotada
+        
+        Args:
+            audio_path (str): Ruta al archivo de audio
             
-            # Chroma features (características tonales)
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+        Returns:
+            Dict: Características extraídas (mismo formato que extract_features)
+        """
+        logger.info(f"🧩 Extracción por bloques: {audio_path}")
+        return self.extract_features_from_blocks(self._stream_blocks(audio_path))
+    
+    def extract_features_from_blocks(self, blocks, with_segments: bool = False,
+                                     peak_finder: Optional['StreamingPeakFinder'] = None) -> Dict:
+        """
+        Extrae características de una señal que llega por bloques
+        
+        Las estadísticas por frame se acumulan con RunningStats (y las sumas
+        por segmento con SegmentAccumulator), así que el pico de memoria no
+        depende de la duración de la pista: solo se guarda la envolvente de
+        onsets, un float por frame, para el tempo. Los frames coinciden con los
+        de compute_frame_features; las diferencias son que el recorte top_db del
+        espectrograma mel usa el máximo visto hasta cada bloque y la afinación
+        del chroma se estima en el primer bloque, no sobre la pista completa
+        (las pruebas acotan esa diferencia).
+        
+        Args:
+            blocks: Iterable de bloques mono float32 al sample rate de trabajo
+            with_segments (bool): Añadir las sumas por segmento, como
+                extract_features_from_signal
+            peak_finder (Optional[StreamingPeakFinder]): Recibe la STFT de magnitud
+                de cada bloque (picos de landmarks sin una segunda STFT)
             
-            # Spectral contrast
-            contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-            
-            # Tempo y beats
-            tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-            
-            # Crear fingerprint hash único
-            features_array = np.concatenate([
-                np.mean(mfccs, axis=1),
-                np.std(mfccs, axis=1),
-                [np.mean(spectral_centroids), np.std(spectral_centroids)],
-                [np.mean(spectral_rolloff), np.std(spectral_rolloff)],
-                [np.mean(zero_crossing_rate), np.std(zero_crossing_rate)],
-                np.mean(chroma, axis=1),
-                np.mean(contrast, axis=1),
-                [tempo]
-            ])
-            
-            # Generar hash único para este fingerprint
-            fingerprint_hash = hashlib.md5(features_array.tobytes()).hexdigest()
+        Returns:
+            Dict: Características extraídas (mismo formato que extract_features_from_signal)
+        """
+        sr = self.sample_rate
+        n_fft, hop = self.n_fft, self.hop_length
+        pad = n_fft // 2
+        
+        stats = {
+            'mfcc': RunningStats(13),
+            'spectral_centroid': RunningStats(1),
+            'spectral_rolloff': RunningStats(1),
+            'zero_crossing_rate': RunningStats(1),
+            'chroma': RunningStats(12),
+            'contrast': RunningStats(7),
+        }
+        segments = SegmentAccumulator(
+            max(1, int(round(self.segment_seconds * sr / hop))),
+            sum(dim for key, dim in self.SEGMENT_COLUMNS)
+        ) if with_segments else None
+        onset_diffs = []
+        prev_mel_db = None
+        max_mel_db = -np.inf
+        tuning = None
+        total_samples = 0
+        
+        # Buffers con el mismo padding que center=True: ceros para la STFT,
+        # repetición del borde para el ZCR
+        stft_buf = np.zeros(pad, dtype=np.float32)
+        zcr_buf = None
+        last_sample = 0.0
+        
+        def process(stft_buf, zcr_buf):
+            nonlocal prev_mel_db, max_mel_db, tuning
+            n_frames = 0 if len(stft_buf) < n_fft else 1 + (len(stft_buf) - n_fft) // hop
+            if n_frames == 0:
+                return stft_buf, zcr_buf
+            used = (n_frames - 1) * hop + n_fft
+            
+            S = np.abs(librosa.stft(stft_buf[:used], n_fft=n_fft, hop_length=hop, center=False))
+            if peak_finder is not None:
+                peak_finder.add(S)
+            S_power = S ** 2
+            # Recorte top_db respecto al máximo visto hasta ahora (el de la pista
+            # completa no se conoce aún): coincide con la versión en memoria
+            # salvo en tramos más bajos que preceden al máximo global
+            mel_db = librosa.power_to_db(
+                librosa.feature.melspectrogram(S=S_power, sr=sr, n_mels=self.n_mels),
+                top_db=None
+            )
+            max_mel_db = max(max_mel_db, float(mel_db.max()))
+            mel_db = np.maximum(mel_db, max_mel_db - self.TOP_DB)
+            if tuning is None:
+                tuning = librosa.estimate_tuning(S=S_power, sr=sr, bins_per_octave=12)
+            
+            frames = {
+                'mfcc': librosa.feature.mfcc(S=mel_db, n_mfcc=13),
+                'spectral_centroid': librosa.feature.spectral_centroid(S=S, sr=sr),
+                'spectral_rolloff': librosa.feature.spectral_rolloff(S=S, sr=sr),
+                'chroma': librosa.feature.chroma_stft(S=S_power, sr=sr, n_fft=n_fft, tuning=tuning),
+                'contrast': librosa.feature.spectral_contrast(S=S, sr=sr, n_fft=n_fft),
+                'zero_crossing_rate': librosa.feature.zero_crossing_rate(
+                    zcr_buf[:used], frame_length=n_fft, hop_length=hop, center=False
+                ),
+            }
+            for key, acc in stats.items():
+                acc.update(frames[key])
+            if segments is not None:
+                segments.update(np.vstack([frames[key] for key, dim in self.SEGMENT_COLUMNS]))
+            
+            # Diferencias de onsets (lag=1, mediana) enlazando con el bloque anterior
+            if prev_mel_db is None:
+                previous, current = mel_db[:, :-1], mel_db[:, 1:]
+            else:
+                previous, current = np.hstack([prev_mel_db, mel_db[:, :-1]]), mel_db
+            onset_diffs.append(np.median(np.maximum(0.0, current - previous), axis=0))
+            prev_mel_db = mel_db[:, -1:]
+            
+            consumed = n_frames * hop
+            return stft_buf[consumed:], zcr_buf[consumed:]
+        
+        try:
+            for block in blocks:
+                if len(block) == 0:
+                    continue
+                block = np.asarray(block, dtype=np.float32)
+                if zcr_buf is None:
+                    zcr_buf = np.full(pad, block[0], dtype=np.float32)
+                total_samples += len(block)
+                last_sample = block[-1]
+                stft_buf = np.concatenate([stft_buf, block])
+                zcr_buf = np.concatenate([zcr_buf, block])
+                stft_buf, zcr_buf = process(stft_buf, zcr_buf)
+            
+            if total_samples == 0:
+                raise ValueError('Archivo de audio vacío')
+            
+            stft_buf = np.concatenate([stft_buf, np.zeros(pad, dtype=np.float32)])
+            zcr_buf = np.concatenate([zcr_buf, np.full(pad, last_sample, dtype=np.float32)])
+            process(stft_buf, zcr_buf)
+            
+            # Envolvente de onsets con el mismo desplazamiento que onset_strength
+            # (lag + n_fft // (2 * hop_length) frames de ceros al inicio)
+            n_frames = 1 + total_samples // hop
+            onset_envelope = np.concatenate([
+                np.zeros(1 + n_fft // (2 * hop)),
+                np.concatenate(onset_diffs)
+            ])[:n_frames]
             
+            tempo, beats = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr, hop_length=hop)
+            
+            result = self.build_fingerprint(
+                {key: acc.result() for key, acc in stats.items()},
+                tempo,
+                total_samples / sr
+            )
+            if segments is not None:
+                result['segment_sums'], result['segment_counts'] = segments.result()
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error extrayendo características por bloques: {str(e)}")
             return {
-                'fingerprint_hash': fingerprint_hash,
-                'features': {
-                    'mfcc_mean': np.mean(mfccs, axis=1).tolist(),
-                    'mfcc_std': np.std(mfccs, axis=1).tolist(),
-                    'spectral_centroid_mean': float(np.mean(spectral_centroids)),
-                    'spectral_centroid_std': float(np.std(spectral_centroids)),
-                    'spectral_rolloff_mean': float(np.mean(spectral_rolloff)),
-                    'spectral_rolloff_std': float(np.std(spectral_rolloff)),
-                    'zero_crossing_rate_mean': float(np.mean(zero_crossing_rate)),
-                    'zero_crossing_rate_std': float(np.std(zero_crossing_rate)),
-                    'chroma_mean': np.mean(chroma, axis=1).tolist(),
-                    'contrast_mean': np.mean(contrast, axis=1).tolist(),
-                    'tempo': float(tempo),
-                    'duration': float(len(y) / sr)
-                },
-                'success': True
+                'success': False,
+                'error': str(e)
             }
+    
+    def extract_features_from_signal(self, y: np.ndarray, sr: int, with_segments: bool = False) -> Dict:
+        """
+        Extrae características a partir de una señal ya decodificada
+        
+        Args:
+            y (np.ndarray): Señal mono
+            sr (int): Sample rate de la señal
+            with_segments (bool): Añadir también las sumas por segmento
+                ('segment_sums', 'segment_counts') para el índice de ventanas
+            
+        Returns:
+            Dict: Características extraídas (mismo formato que extract_features)
+        """
+        try:
+            frames = self.compute_frame_features(y, sr)
+            
+            # Tempo y beats a partir de la envolvente de onsets ya calculada
+            tempo, beats = librosa.beat.beat_track(
+                onset_envelope=frames['onset_envelope'],
+                sr=sr,
+                hop_length=self.hop_length
+            )
+            
+            result = self.summarize_frame_features(frames, tempo, float(len(y) / sr))
+            if with_segments:
+                result['segment_sums'], result['segment_counts'] = self.segment_features(frames, sr)
+            return result
             
         except Exception as e:
-            logger.error(f"Error extrayendo características de {audio_path}: {str(e)}")
+            logger.error(f"Error extrayendo características de la señal: {str(e)}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def compare_fingerprints(self, features1: Dict, features2: Dict) -> float:
+    def compute_frame_features(self, y: np.ndarray, sr: int) -> Dict[str, np.ndarray]:
+        """
+        Calcula las características por frame a partir de una única STFT
+        
+        Cada extractor de librosa recalcula su propia STFT o espectrograma mel
+        si recibe la señal; aquí se calcula una sola STFT de magnitud y todas
+        las características se derivan de ella. Los parámetros coinciden con
+        los valores por defecto de librosa, así que los resultados son los
+        mismos que llamando a cada extractor con y=...
+        
+        Args:
+            y (np.ndarray): Señal mono
+            sr (int): Sample rate de la señal
+            
+        Returns:
+            Dict[str, np.ndarray]: Matrices de características por frame
+        """
+        # Única STFT de magnitud para toda la pista
+        S = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length))
+        S_power = S ** 2
+        
+        # Espectrograma mel en dB: compartido por MFCC y envolvente de onsets
+        mel_db = librosa.power_to_db(
+            librosa.feature.melspectrogram(S=S_power, sr=sr, n_mels=self.n_mels),
+            top_db=self.TOP_DB
+        )
+        
+        return {
+            # Características espectrales
+            'spectral_centroid': librosa.feature.spectral_centroid(S=S, sr=sr)[0],
+            'spectral_rolloff': librosa.feature.spectral_rolloff(S=S, sr=sr)[0],
+            'zero_crossing_rate': librosa.feature.zero_crossing_rate(
+                y, frame_length=self.n_fft, hop_length=self.hop_length
+            )[0],
+            # MFCC (características más importantes para identificación)
+            'mfcc': librosa.feature.mfcc(S=mel_db, n_mfcc=13),
+            # Chroma features (características tonales)
+            'chroma': librosa.feature.chroma_stft(S=S_power, sr=sr, n_fft=self.n_fft),
+            # Spectral contrast
+            'contrast': librosa.feature.spectral_contrast(S=S, sr=sr, n_fft=self.n_fft),
+            # Envolvente de onsets para el tempo (mediana, como beat_track)
+            'onset_envelope': librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median),
+        }
+    
+    # Columnas de segment_features: mfcc | chroma | contrast | centroide
+    SEGMENT_COLUMNS = (('mfcc', 13), ('chroma', 12), ('contrast', 7), ('spectral_centroid', 1))
+    
+    def segment_features(self, frames: Dict[str, np.ndarray], sr: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Suma las características por frame en segmentos consecutivos de segment_seconds
+        
+        Guardar sumas (y no medias) permite construir al reconocer la media de
+        cualquier ventana de segmentos consecutivos con sumas acumuladas, sin
+        volver a decodificar la referencia.
+        
+        Args:
+            frames (Dict[str, np.ndarray]): Resultado de compute_frame_features
+            sr (int): Sample rate de la señal
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (sumas float32 (n_segmentos, 33), frames por segmento)
+        """
+        values = np.vstack([np.atleast_2d(frames[key]) for key, dim in self.SEGMENT_COLUMNS])
+        n_frames = values.shape[1]
+        frames_per_segment = max(1, int(round(self.segment_seconds * sr / self.hop_length)))
+        starts = np.arange(0, n_frames, frames_per_segment)
+        
+        sums = np.add.reduceat(values.astype(np.float64), starts, axis=1).T
+        counts = np.diff(np.append(starts, n_frames))
+        return sums.astype(np.float32), counts.astype(np.int32)
+    
+    def summarize_frame_features(self, frames: Dict[str, np.ndarray], tempo, duration: float) -> Dict:
+        """
+        Resume las características por frame en el fingerprint de la pista
+        
+        Args:
+            frames (Dict[str, np.ndarray]): Resultado de compute_frame_features
+            tempo: Tempo estimado en BPM
+            duration (float): Duración en segundos
+            
+        Returns:
+            Dict: Fingerprint con hash y características
+        """
+        stats = {}
+        for key in ('mfcc', 'spectral_centroid', 'spectral_rolloff', 'zero_crossing_rate', 'chroma', 'contrast'):
+            values = np.atleast_2d(frames[key])
+            stats[key] = (np.mean(values, axis=1), np.std(values, axis=1))
+        
+        return self.build_fingerprint(stats, tempo, duration)
+    
+    def build_fingerprint(self, stats: Dict[str, Tuple[np.ndarray, np.ndarray]], tempo, duration: float) -> Dict:
+        """
+        Construye el fingerprint a partir de medias y desviaciones por característica
+        
+        Args:
+            stats (Dict[str, Tuple[np.ndarray, np.ndarray]]): (media, std) por característica
+            tempo: Tempo estimado en BPM
+            duration (float): Duración en segundos
+            
+        Returns:
+            Dict: Fingerprint con hash y características
+        """
+        mfcc_mean, mfcc_std = stats['mfcc']
+        centroid_mean, centroid_std = (float(v[0]) for v in stats['spectral_centroid'])
+        rolloff_mean, rolloff_std = (float(v[0]) for v in stats['spectral_rolloff'])
+        zcr_mean, zcr_std = (float(v[0]) for v in stats['zero_crossing_rate'])
+        chroma_mean = stats['chroma'][0]
+        contrast_mean = stats['contrast'][0]
+        
+        # Crear fingerprint hash único
+        features_array = np.concatenate([
+            mfcc_mean,
+            mfcc_std,
+            [centroid_mean, centroid_std],
+            [rolloff_mean, rolloff_std],
+            [zcr_mean, zcr_std],
+            chroma_mean,
+            contrast_mean,
+            np.atleast_1d(tempo)
+        ])
+        
+        # Generar hash único para este fingerprint
+        fingerprint_hash = hashlib.md5(features_array.tobytes()).hexdigest()
+        
+        return {
+            'fingerprint_hash': fingerprint_hash,
+            'features': {
+                'mfcc_mean': mfcc_mean.tolist(),
+                'mfcc_std': mfcc_std.tolist(),
+                'spectral_centroid_mean': centroid_mean,
+                'spectral_centroid_std': centroid_std,
+                'spectral_rolloff_mean': rolloff_mean,
+                'spectral_rolloff_std': rolloff_std,
+                'zero_crossing_rate_mean': zcr_mean,
+                'zero_crossing_rate_std': zcr_std,
+                'chroma_mean': chroma_mean.tolist(),
+                'contrast_mean': contrast_mean.tolist(),
+                'tempo': float(np.atleast_1d(tempo)[0]),
+                'duration': float(duration)
+            },
+            'success': True
+        }
+    
+    def compare_fingerprints(self, features1: Dict, features2: Dict, log_details: bool = True) -> float:
         """
         Compara dos fingerprints y retorna un score de similitud mejorado
         
         Args:
             features1 (Dict): Características del primer audio
             features2 (Dict): Características del segundo audio
+            log_details (bool): Registrar cada componente de la similitud (False
+                al re-puntuar muchos candidatos)
             
         Returns:
             float: Score de similitud (0-1, donde 1 es idéntico)
@@ -178,13 +639,14 @@ class SimpleFingerprint:
             )
             
             # Log de debugging para análisis
-            logger.info(f"🔍 Comparación de fingerprints:")
-            logger.info(f"   MFCC similarity: {mfcc_similarity:.4f}")
-            logger.info(f"   Chroma similarity: {chroma_similarity:.4f}")
-            logger.info(f"   Contrast similarity: {contrast_similarity:.4f}")
-            logger.info(f"   Tempo similarity: {tempo_similarity:.4f} (diff: {tempo_diff:.2f})")
-            logger.info(f"   Spectral similarity: {spectral_similarity:.4f} (diff: {spectral_diff:.2f})")
-            logger.info(f"   🎯 Total similarity: {total_similarity:.4f}")
+            if log_details:
+                logger.info(f"🔍 Comparación de fingerprints:")
+                logger.info(f"   MFCC similarity: {mfcc_similarity:.4f}")
+                logger.info(f"   Chroma similarity: {chroma_similarity:.4f}")
+                logger.info(f"   Contrast similarity: {contrast_similarity:.4f}")
+                logger.info(f"   Tempo similarity: {tempo_similarity:.4f} (diff: {tempo_diff:.2f})")
+                logger.info(f"   Spectral similarity: {spectral_similarity:.4f} (diff: {spectral_diff:.2f})")
+                logger.info(f"   🎯 Total similarity: {total_similarity:.4f}")
             
             # Asegurar que el resultado esté entre 0 y 1
             final_similarity = max(0.0, min(1.0, total_similarity))
@@ -196,117 +658,1143 @@ class SimpleFingerprint:
             return 0.0
 
 
-class AudioRecognitionService:
+class StreamingPeakFinder:
     """
-    Servicio principal para reconocimiento de audio tipo Shazam
+    Picos del espectrograma para LandmarkFingerprint, calculados por bloques de frames
+    
+    Un punto es pico si es el máximo de su vecindario (maximum_filter con
+    bordes a -inf) y supera en amp_min_db al máximo de toda la pista. Entre
+    bloques se conservan los frames del vecindario que quedan a cada lado del
+    corte, así que los picos son los mismos que con el espectrograma completo.
+    El máximo global solo se conoce al final: se guardan los candidatos que
+    superan el umbral respecto al máximo visto hasta entonces y finish() aplica
+    el umbral definitivo.
+    """
+    
+    # Suelo de magnitud, como librosa.amplitude_to_db
+    AMIN = 1e-5
+    
+    def __init__(self, neighborhood: Tuple[int, int], amp_min_db: float):
+        """
+        Args:
+            neighborhood (Tuple[int, int]): Vecindario (bins de frecuencia, frames)
+            amp_min_db (float): Umbral en dB relativo al máximo de la pista
+        """
+        self.neighborhood = tuple(neighborhood)
+        self.amp_min_db = amp_min_db
+        # Frames del vecindario antes y después del central (origen de scipy)
+        time_size = self.neighborhood[1]
+        self.before = time_size // 2
+        self.after = time_size - 1 - time_size // 2
+        self.floor_db = 20.0 * np.log10(self.AMIN)
+        self.max_db = -np.inf
+        # Frames recibidos y aún necesarios; _offset es el frame de su primera columna
+        self._buffer = None
+        self._offset = 0
+        self._next = 0
+        self._frames, self._bins, self._values = [], [], []
+    
+    def add(self, S: np.ndarray):
+        """
+        Añade frames consecutivos de la STFT de magnitud (bins, n_frames)
+        """
+        if S.shape[1] == 0:
+            return
+        S_db = (20.0 * np.log10(np.maximum(self.AMIN, S))).astype(np.float32)
+        self.max_db = max(self.max_db, float(S_db.max()))
+        self._buffer = S_db if self._buffer is None else np.hstack([self._buffer, S_db])
+        self._scan(final=False)
+    
+    def _scan(self, final: bool):
+        from scipy.ndimage import maximum_filter
+        
+        buffer = self._buffer
+        if buffer is None:
+            return
+        # Solo se evalúan los frames con su vecindario completo (o el final real)
+        stop = buffer.shape[1] if final else buffer.shape[1] - self.after
+        start = self._next - self._offset
+        if stop > start:
+            local_max = maximum_filter(buffer, size=self.neighborhood, mode='constant', cval=-np.inf)
+            region = buffer[:, start:stop]
+            peaks = (region == local_max[:, start:stop]) & (region > self.floor_db) \
+                & (region > self.max_db + self.amp_min_db)
+            freq_bins, frames = np.nonzero(peaks)
+            self._frames.append(frames + self._offset + start)
+            self._bins.append(freq_bins)
+            self._values.append(region[freq_bins, frames])
+            self._next = self._offset + stop
+        
+        # Conservar solo los frames que aún forman parte de algún vecindario
+        keep_from = max(0, self._next - self._offset - self.before)
+        self._buffer = buffer[:, keep_from:]
+        self._offset += keep_from
+    
+    def finish(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Evalúa los últimos frames y aplica el umbral respecto al máximo global
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (frames, bins de frecuencia) ordenados por tiempo
+        """
+        self._scan(final=True)
+        if not self._frames:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        
+        frames = np.concatenate(self._frames)
+        freq_bins = np.concatenate(self._bins)
+        keep = np.concatenate(self._values) > self.max_db + self.amp_min_db
+        frames, freq_bins = frames[keep], freq_bins[keep]
+        order = np.lexsort((freq_bins, frames))
+        return frames[order], freq_bins[order]
+
+
+class LandmarkFingerprint:
+    """
+    Fingerprinting por landmarks (constelación de picos espectrales)
+    
+    Selecciona picos del espectrograma, forma pares ancla-objetivo y genera un
+    hash entero por par a partir de (frecuencia ancla, frecuencia objetivo,
+    delta de tiempo). El reconocimiento vota por el desfase temporal entre las
+    apariciones del hash en el query y en la referencia, lo que permite
+    reconocer fragmentos cortos tomados de cualquier parte de la canción.
     """
     
+    # Bits usados para empaquetar cada componente del hash
+    FREQ_BITS = 11  # n_fft=2048 -> 1025 bins
+    DELTA_BITS = 8
+    # Incrementar al cambiar el cálculo de los hashes (invalida la cache)
+    LANDMARK_VERSION = 2
+    
     def __init__(self):
-        self.fingerprint = SimpleFingerprint()
-        self.cache_timeout = 3600  # 1 hora
+        self.sample_rate = 22050
+        self.n_fft = 2048
+        self.hop_length = 512
+        # Vecindario (bins de frecuencia, frames) para detección de máximos locales
+        self.peak_neighborhood = (20, 10)
+        # Umbral mínimo en dB (relativo al máximo del espectrograma)
+        self.amp_min_db = -60.0
+        # Número de objetivos emparejados con cada ancla
+        self.fan_value = 15
+        self.min_time_delta = 1
+        self.max_time_delta = (1 << self.DELTA_BITS) - 1
+        # Mínimo de hashes alineados para aceptar una coincidencia
+        self.min_aligned_matches = 10
+    
+    def extractor_config(self) -> Dict:
+        """
+        Parámetros que determinan los hashes (clave de la cache, junto con la
+        decodificación que produjo la señal)
+        """
+        return {
+            'extractor': 'landmark',
+            'version': self.LANDMARK_VERSION,
+            'sample_rate': self.sample_rate,
+            'n_fft': self.n_fft,
+            'hop_length': self.hop_length,
+            'peak_neighborhood': list(self.peak_neighborhood),
+            'amp_min_db': self.amp_min_db,
+            'fan_value': self.fan_value,
+            'time_delta': [self.min_time_delta, self.max_time_delta],
+        }
+    
+    def frames_to_seconds(self, frames) -> float:
+        """
+        Convierte un desfase en frames a segundos
+        """
+        return float(frames) * self.hop_length / self.sample_rate
+    
+    def find_peaks(self, y: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Detecta picos locales del espectrograma
+        
+        Args:
+            y (np.ndarray): Señal mono
+            sr (int): Sample rate de la señal
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (frames, bins de frecuencia) ordenados por tiempo
+        """
+        S = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length))
         
-    def create_fingerprint(self, audio_path: str, song_id: str) -> Dict:
+        # Un único bloque: mismo criterio que la versión por bloques
+        finder = self.peak_finder()
+        finder.add(S)
+        return finder.finish()
+    
+    def peak_finder(self) -> StreamingPeakFinder:
         """
-        Crea fingerprint para una canción de referencia
+        Detector de picos por bloques con los parámetros de este extractor
+        """
+        return StreamingPeakFinder(self.peak_neighborhood, self.amp_min_db)
+    
+    def extract_landmarks(self, y: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Genera los hashes de pares de picos
         
         Args:
-            audio_path (str): Ruta al archivo de audio
-            song_id (str): ID único de la canción
+            y (np.ndarray): Señal mono
+            sr (int): Sample rate de la señal
             
         Returns:
-            Dict: Resultado del fingerprinting
+            Tuple[np.ndarray, np.ndarray]: (hashes int64, offset del ancla en frames int32)
         """
-        try:
-            # Extraer características
-            result = self.fingerprint.extract_features(audio_path)
+        return self.hash_peaks(*self.find_peaks(y, sr))
+    
+    def hash_peaks(self, frames: np.ndarray, freqs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Empareja cada pico (ancla) con los fan_value siguientes
+        
+        Args:
+            frames (np.ndarray): Frame de cada pico, ordenados por tiempo
+            freqs (np.ndarray): Bin de frecuencia de cada pico
             
-            if result['success']:
-                # Guardar en cache para búsquedas rápidas
-                cache_key = f"fingerprint_{song_id}"
-                cache.set(cache_key, result['features'], timeout=self.cache_timeout)
-                
-                logger.info(f"Fingerprint creado para song_id: {song_id}")
-                
-                return {
-                    'success': True,
-                    'song_id': song_id,
-                    'fingerprint_hash': result['fingerprint_hash'],
-                    'features': result['features']
-                }
-            else:
-                return result
-                
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (hashes int64, offset del ancla en frames int32)
+        """
+        hashes = []
+        offsets = []
+        for k in range(1, self.fan_value + 1):
+            if k >= len(frames):
+                break
+            anchor_t, target_t = frames[:-k], frames[k:]
+            anchor_f, target_f = freqs[:-k], freqs[k:]
+            delta = target_t - anchor_t
+            valid = (delta >= self.min_time_delta) & (delta <= self.max_time_delta)
+            
+            hashes.append(
+                (anchor_f[valid].astype(np.int64) << (self.FREQ_BITS + self.DELTA_BITS))
+                | (target_f[valid].astype(np.int64) << self.DELTA_BITS)
+                | delta[valid].astype(np.int64)
+            )
+            offsets.append(anchor_t[valid].astype(np.int32))
+        
+        if not hashes:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+        return np.concatenate(hashes), np.concatenate(offsets)
+    
+    def fingerprint_signal(self, y: np.ndarray, sr: int) -> Dict:
+        """
+        Genera los landmarks de una señal
+        
+        Returns:
+            Dict: {'success', 'hashes', 'offsets', 'hash_count'}
+        """
+        try:
+            hashes, offsets = self.extract_landmarks(y, sr)
+            return {
+                'success': True,
+                'hashes': hashes,
+                'offsets': offsets,
+                'hash_count': int(len(hashes))
+            }
         except Exception as e:
-            logger.error(f"Error creando fingerprint para {song_id}: {str(e)}")
+            logger.error(f"Error generando landmarks: {str(e)}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def recognize_audio(self, audio_path: str, reference_tracks: List[Dict]) -> Dict:
+    def vote_offsets(self, track_ids: np.ndarray, ref_offsets: np.ndarray,
+                     query_offsets: np.ndarray, top_k: int = 10) -> List[Dict]:
         """
-        Reconoce un audio comparándolo con tracks de referencia
+        Puntúa candidatos mediante histograma de desfases
+        
+        Cada hash coincidente aporta un voto al par (track, ref_offset - query_offset);
+        el track correcto acumula votos en un único desfase.
         
         Args:
-            audio_path (str): Ruta al archivo a reconocer
-            reference_tracks (List[Dict]): Lista de tracks de referencia con sus fingerprints
+            track_ids (np.ndarray): Track de cada coincidencia
+            ref_offsets (np.ndarray): Offset del hash en la referencia
+            query_offsets (np.ndarray): Offset del hash en el query
+            top_k (int): Número de candidatos a devolver
             
         Returns:
-            Dict: Resultado del reconocimiento
+            List[Dict]: Candidatos ordenados por hashes alineados
         """
-        try:
-            logger.info(f"🎵 Iniciando reconocimiento de audio: {audio_path}")
-            logger.info(f"📊 Tracks de referencia disponibles: {len(reference_tracks)}")
-            
-            # Extraer características del audio a reconocer
-            query_result = self.fingerprint.extract_features(audio_path)
-            
-            if not query_result['success']:
-                logger.error(f"❌ Error extrayendo características del query: {query_result.get('error')}")
-                return query_result
-            
-            query_features = query_result['features']
-            logger.info(f"✅ Características extraídas del query:")
-            logger.info(f"   Tempo: {query_features.get('tempo', 'N/A'):.2f} BPM")
-            logger.info(f"   Centroide espectral: {query_features.get('spectral_centroid_mean', 'N/A'):.2f} Hz")
-            logger.info(f"   Duración: {query_features.get('duration', 'N/A'):.2f} s")
-            
-            best_match = None
-            best_similarity = 0.0
-            all_similarities = []
+        if len(track_ids) == 0:
+            return []
+        
+        deltas = ref_offsets.astype(np.int64) - query_offsets.astype(np.int64)
+        pairs, counts = np.unique(
+            np.column_stack([track_ids.astype(np.int64), deltas]),
+            axis=0,
+            return_counts=True
+        )
+        
+        # Mejor desfase por track
+        order = np.lexsort((-counts, pairs[:, 0]))
+        pairs, counts = pairs[order], counts[order]
+        first = np.ones(len(pairs), dtype=bool)
+        first[1:] = pairs[1:, 0] != pairs[:-1, 0]
+        pairs, counts = pairs[first], counts[first]
+        
+        ranking = np.argsort(-counts, kind='stable')[:top_k]
+        return [
+            {
+                'track_id': int(pairs[i, 0]),
+                'aligned_matches': int(counts[i]),
+                'offset_frames': int(pairs[i, 1]),
+                'offset_seconds': self.frames_to_seconds(max(int(pairs[i, 1]), 0))
+            }
+            for i in ranking
+        ]
+    
+    def match_index(self, query_hashes: np.ndarray, query_offsets: np.ndarray,
+                    track_ids: Optional[List[int]] = None, top_k: int = 10) -> List[Dict]:
+        """
+        Busca los hashes del query en el índice invertido de la base de datos
+        
+        Args:
+            query_hashes (np.ndarray): Hashes del query
+            query_offsets (np.ndarray): Offsets de los hashes del query
+            track_ids (Optional[List[int]]): Restringir candidatos a estos tracks
+            top_k (int): Número de candidatos a devolver
             
-            # Comparar con todos los tracks de referencia
-            for i, track in enumerate(reference_tracks):
-                if 'fingerprint_features' not in track:
-                    logger.warning(f"⚠️  Track {track.get('id', 'N/A')} - {track.get('title', 'N/A')} no tiene fingerprint_features")
-                    continue
-                
-                logger.info(f"\n🔍 Comparando con track {i+1}/{len(reference_tracks)}: {track.get('title', 'N/A')} - {track.get('artist', 'N/A')}")
+        Returns:
+            List[Dict]: Candidatos ordenados por hashes alineados
+        """
+        from .hash_index import lookup_hashes
+        
+        if len(query_hashes) == 0:
+            return []
+        
+        row_hashes, row_tracks, row_offsets = lookup_hashes(query_hashes, track_ids=track_ids)
+        
+        if len(row_hashes) == 0:
+            return []
+        
+        # Unir cada fila del índice con todas las apariciones del hash en el query
+        order = np.argsort(query_hashes, kind='stable')
+        sorted_hashes = query_hashes[order]
+        left = np.searchsorted(sorted_hashes, row_hashes, side='left')
+        right = np.searchsorted(sorted_hashes, row_hashes, side='right')
+        counts = right - left
+        total = int(counts.sum())
+        if total == 0:
+            return []
+        
+        row_idx = np.repeat(np.arange(len(row_hashes)), counts)
+        starts = np.repeat(left - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        query_idx = order[starts + np.arange(total)]
+        
+        return self.vote_offsets(
+            row_tracks[row_idx],
+            row_offsets[row_idx],
+            query_offsets[query_idx],
+            top_k=top_k
+        )
+
+
+class ScalarBoundIndex:
+    """
+    Pre-filtro por cotas sobre tempo y centroide espectral
+    
+    MFCC, chroma y contrast aportan como máximo la suma de sus pesos al score;
+    un track solo puede alcanzar el umbral si sus similitudes de tempo y
+    centroide aportan el resto. Los tracks se agrupan en cubetas de
+    (tempo, centroide); cada cubeta da una cota superior de esa aportación, se
+    descartan las cubetas que no llegan y solo se comprueban fila a fila las
+    supervivientes.
+    """
+    
+    def __init__(self, tempo: np.ndarray, centroid: np.ndarray,
+                 tempo_bucket: float = 5.0, centroid_bucket: float = 250.0):
+        self.tempo = np.asarray(tempo, dtype=np.float64)
+        self.centroid = np.asarray(centroid, dtype=np.float64)
+        
+        keys = np.column_stack([
+            np.floor(self.tempo / tempo_bucket),
+            np.floor(self.centroid / centroid_bucket)
+        ])
+        self.order = np.lexsort((keys[:, 1], keys[:, 0])) if len(keys) else np.zeros(0, dtype=np.int64)
+        sorted_keys = keys[self.order]
+        
+        if len(sorted_keys):
+            boundaries = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+            self.starts = np.concatenate([[0], np.nonzero(boundaries)[0] + 1])
+        else:
+            self.starts = np.zeros(0, dtype=np.int64)
+        self.ends = np.append(self.starts[1:], len(self.order)).astype(np.int64)
+        
+        # Extremos reales de cada cubeta
+        sorted_tempo = self.tempo[self.order]
+        sorted_centroid = self.centroid[self.order]
+        if len(self.starts):
+            self.tempo_min = np.minimum.reduceat(sorted_tempo, self.starts)
+            self.tempo_max = np.maximum.reduceat(sorted_tempo, self.starts)
+            self.centroid_min = np.minimum.reduceat(sorted_centroid, self.starts)
+            self.centroid_max = np.maximum.reduceat(sorted_centroid, self.starts)
+        else:
+            self.tempo_min = self.tempo_max = self.centroid_min = self.centroid_max = np.zeros(0)
+    
+    def __len__(self):
+        return len(self.tempo)
+    
+    @staticmethod
+    def tempo_similarity(t_min, t_max, q_tempo):
+        """
+        Similitud de tempo (cota superior si t_min < t_max); misma fórmula que compare_fingerprints
+        """
+        diff = np.maximum(0.0, np.maximum(t_min - q_tempo, q_tempo - t_max))
+        threshold = np.maximum(np.maximum(t_max, q_tempo) * 0.1, 10.0)
+        return np.maximum(0.0, 1.0 - diff / threshold)
+    
+    @staticmethod
+    def spectral_similarity(c_min, c_max, q_centroid):
+        """
+        Similitud de centroide (cota superior si c_min < c_max); misma fórmula que compare_fingerprints
+        """
+        diff = np.maximum(0.0, np.maximum(c_min - q_centroid, q_centroid - c_max))
+        spectral_max = np.maximum(np.maximum(c_max, q_centroid), 1000.0)
+        return np.maximum(0.0, 1.0 - diff / spectral_max)
+    
+    def candidates(self, q_tempo: float, q_centroid: float, min_scalar_score: float,
+                   tempo_weight: float = 0.10, spectral_weight: float = 0.10) -> np.ndarray:
+        """
+        Filas que pueden alcanzar min_scalar_score con tempo y centroide
+        
+        Args:
+            q_tempo (float): Tempo del query
+            q_centroid (float): Centroide espectral medio del query
+            min_scalar_score (float): Aportación mínima necesaria de tempo + centroide
+            
+        Returns:
+            np.ndarray: Índices de fila supervivientes (orden ascendente)
+        """
+        if min_scalar_score <= 0.0:
+            return np.arange(len(self.tempo))
+        
+        # Margen para no descartar por errores de redondeo
+        min_scalar_score -= 1e-9
+        
+        bucket_bound = (
+            tempo_weight * self.tempo_similarity(self.tempo_min, self.tempo_max, q_tempo)
+            + spectral_weight * self.spectral_similarity(self.centroid_min, self.centroid_max, q_centroid)
+        )
+        buckets = np.nonzero(bucket_bound >= min_scalar_score)[0]
+        if len(buckets) == 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        counts = self.ends[buckets] - self.starts[buckets]
+        positions = np.repeat(self.starts[buckets] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) \
+            + np.arange(int(counts.sum()))
+        rows = self.order[positions]
+        
+        # Comprobación exacta fila a fila
+        scalar_score = (
+            tempo_weight * self.tempo_similarity(self.tempo[rows], self.tempo[rows], q_tempo)
+            + spectral_weight * self.spectral_similarity(self.centroid[rows], self.centroid[rows], q_centroid)
+        )
+        return np.sort(rows[scalar_score >= min_scalar_score])
+
+
+class ReferenceFeatureMatrix:
+    """
+    Vectores de referencia apilados en matrices float32 pre-normalizadas
+    
+    Reproduce SimpleFingerprint.compare_fingerprints para todos los tracks a la
+    vez: cada similitud coseno es un producto matriz-vector y las similitudes
+    de tempo y centroide se calculan sobre arrays.
+    """
+    
+    REQUIRED_KEYS = ['mfcc_mean', 'chroma_mean', 'contrast_mean', 'tempo', 'spectral_centroid_mean']
+    # Dimensiones producidas por SimpleFingerprint.extract_features
+    VECTOR_DIMS = {'mfcc_mean': 13, 'chroma_mean': 12, 'contrast_mean': 7}
+    WEIGHTS = {'mfcc_mean': 0.35, 'chroma_mean': 0.25, 'contrast_mean': 0.20}
+    TEMPO_WEIGHT = 0.10
+    SPECTRAL_WEIGHT = 0.10
+    
+    # Ficheros en disco: reference_matrix_g<generación>.{vectors.npy,scalars.npy,tracks.json}
+    FILE_PREFIX = 'reference_matrix_g'
+    
+    def __init__(self, reference_tracks: List[Dict]):
+        self.tracks = []
+        # Tracks que no encajan en la matriz (se puntúan con compare_fingerprints)
+        self.fallback_tracks = []
+        self._bound_index: Optional[ScalarBoundIndex] = None
+        
+        for track in reference_tracks:
+            features = track.get('fingerprint_features')
+            if features is None:
+                continue
+            if self.fits(features):
+                self.tracks.append(track)
+            else:
+                self.fallback_tracks.append(track)
+        
+        n = len(self.tracks)
+        # Bloques MFCC | chroma | contrast, cada uno normalizado por fila
+        vectors = np.hstack([
+            self._normalize_rows(np.array(
+                [track['fingerprint_features'][key] for track in self.tracks],
+                dtype=np.float64
+            ).reshape(n, dim))
+            for key, dim in self.VECTOR_DIMS.items()
+        ])
+        scalars = np.array(
+            [
+                [float(t['fingerprint_features']['tempo']), float(t['fingerprint_features']['spectral_centroid_mean'])]
+                for t in self.tracks
+            ],
+            dtype=np.float64
+        ).reshape(n, 2)
+        self._set_arrays(vectors, scalars)
+    
+    def _set_arrays(self, vectors: np.ndarray, scalars: np.ndarray):
+        self.matrix = vectors
+        self.scalars = scalars
+        self.vectors = {}
+        start = 0
+        for key, dim in self.VECTOR_DIMS.items():
+            self.vectors[key] = vectors[:, start:start + dim]
+            start += dim
+        self.tempo = scalars[:, 0]
+        self.centroid = scalars[:, 1]
+    
+    def save(self, directory: str, generation: int):
+        """
+        Persiste la matriz en disco (.npy float32) para compartirla entre procesos
+        
+        Cada fichero se escribe con un nombre temporal y se mueve con
+        os.replace a un nombre que lleva la generación, así los lectores nunca
+        ven una escritura a medias. Dos procesos que guarden la misma
+        generación escriben el mismo contenido.
+        
+        Args:
+            directory (str): Directorio destino (p.ej. bajo MEDIA_ROOT)
+            generation (int): Generación del catálogo que representa
+        """
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"{self.FILE_PREFIX}{generation}")
+        
+        def replace_atomically(path: str, write):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        
+        replace_atomically(f"{prefix}.vectors.npy", lambda f: np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32)))
+        replace_atomically(f"{prefix}.scalars.npy", lambda f: np.save(f, np.ascontiguousarray(self.scalars, dtype=np.float64)))
+        track_data = {
+            'tracks': [
+                {'id': t['id'], 'title': t['title'], 'artist': t['artist']}
+                for t in self.tracks
+            ],
+            'fallback_tracks': self.fallback_tracks
+        }
+        replace_atomically(f"{prefix}.tracks.json", lambda f: f.write(json.dumps(track_data).encode()))
+        
+        # Borrar solo generaciones anteriores: una posterior la acaba de
+        # escribir otro proceso más al día (los procesos que tengan mapeada una
+        # generación borrada conservan sus páginas hasta cerrarlas)
+        for name in os.listdir(directory):
+            stored = self.file_generation(name)
+            if stored is not None and stored < generation:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+    
+    @classmethod
+    def file_generation(cls, name: str) -> Optional[int]:
+        """
+        Generación de un fichero escrito por save() (None si no es uno de ellos)
+        """
+        if not name.startswith(cls.FILE_PREFIX) or name.endswith('.tmp'):
+            return None
+        generation = name[len(cls.FILE_PREFIX):].split('.', 1)[0]
+        return int(generation) if generation.isdigit() else None
+    
+    @classmethod
+    def load(cls, directory: str, generation: int,
+             mmap_mode: Optional[str] = 'r') -> Optional['ReferenceFeatureMatrix']:
+        """
+        Carga la matriz de una generación persistida con save(), mapeada en memoria por defecto
+        
+        Args:
+            directory (str): Directorio donde se guardó la matriz
+            generation (int): Generación del catálogo buscada
+            mmap_mode (Optional[str]): Modo de np.load ('r' comparte el page cache)
+            
+        Returns:
+            Optional[ReferenceFeatureMatrix]: Matriz o None si esa generación no está en disco
+        """
+        prefix = os.path.join(directory, f"{cls.FILE_PREFIX}{generation}")
+        try:
+            vectors = np.load(f"{prefix}.vectors.npy", mmap_mode=mmap_mode)
+            scalars = np.load(f"{prefix}.scalars.npy", mmap_mode=mmap_mode)
+            with open(f"{prefix}.tracks.json") as f:
+                track_data = json.load(f)
+            tracks, fallback_tracks = track_data['tracks'], track_data['fallback_tracks']
+        except (OSError, ValueError, KeyError) as e:
+            logger.info(f"Matriz de referencia (generación {generation}) no disponible en disco: {str(e)}")
+            return None
+        
+        if len(vectors) != len(tracks) or len(scalars) != len(tracks):
+            # Ficheros de dos escrituras distintas de la misma generación
+            return None
+        
+        matrix = cls.__new__(cls)
+        matrix.tracks = tracks
+        matrix.fallback_tracks = fallback_tracks
+        matrix._bound_index = None
+        matrix._set_arrays(vectors, scalars)
+        return matrix
+    
+    def __len__(self):
+        return len(self.tracks)
+    
+    @classmethod
+    def row_vector(cls, features: Dict) -> np.ndarray:
+        """
+        Fila de la matriz para unas características (bloques normalizados)
+        """
+        return np.concatenate([
+            cls._normalize_rows(np.asarray(features[key], dtype=np.float64)[None, :])[0]
+            for key in cls.VECTOR_DIMS
+        ])
+    
+    @classmethod
+    def query_vector(cls, features: Dict) -> np.ndarray:
+        """
+        Vector del query con cada bloque ponderado: su producto interno con una
+        fila es la suma ponderada de las similitudes coseno MFCC/chroma/contrast
+        """
+        return np.concatenate([
+            cls.WEIGHTS[key] * cls._normalize_rows(np.asarray(features[key], dtype=np.float64)[None, :])[0]
+            for key in cls.VECTOR_DIMS
+        ]).astype(np.float32)
+    
+    @classmethod
+    def fits(cls, features: Dict) -> bool:
+        """
+        Indica si unas características tienen las claves y dimensiones estándar
+        """
+        if any(key not in features for key in cls.REQUIRED_KEYS):
+            return False
+        return all(np.shape(features[key]) == (dim,) for key, dim in cls.VECTOR_DIMS.items())
+    
+    @staticmethod
+    def _normalize_rows(m: np.ndarray) -> np.ndarray:
+        """
+        Normaliza filas a norma 1; filas nulas (similitud 0) quedan a cero
+        """
+        norms = np.linalg.norm(m, axis=1)
+        zero = np.all(np.abs(m) <= 1e-8, axis=1) | (norms == 0)
+        safe_norms = np.where(zero, 1.0, norms)
+        normalized = m / safe_norms[:, None]
+        normalized[zero] = 0.0
+        return normalized.astype(np.float32)
+    
+    @classmethod
+    def min_scalar_score(cls, similarity_threshold: float) -> float:
+        """
+        Aportación mínima de tempo + centroide para poder alcanzar el umbral
+        con similitudes MFCC/chroma/contrast perfectas
+        """
+        return similarity_threshold - sum(cls.WEIGHTS.values())
+    
+    @property
+    def bound_index(self) -> ScalarBoundIndex:
+        """
+        Índice de cotas de tempo/centroide para el pre-filtro (se construye en el primer uso)
+        """
+        if self._bound_index is None:
+            self._bound_index = ScalarBoundIndex(self.tempo, self.centroid)
+        return self._bound_index
+    
+    def candidate_rows(self, query_features: Dict, similarity_threshold: float) -> np.ndarray:
+        """
+        Filas que pueden alcanzar similarity_threshold según el pre-filtro
+        """
+        if not self.fits(query_features):
+            return np.zeros(0, dtype=np.int64)
+        return self.bound_index.candidates(
+            float(query_features['tempo']),
+            float(query_features['spectral_centroid_mean']),
+            self.min_scalar_score(similarity_threshold),
+            tempo_weight=self.TEMPO_WEIGHT,
+            spectral_weight=self.SPECTRAL_WEIGHT
+        )
+    
+    def score(self, query_features: Dict, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calcula la similitud del query con los tracks de la matriz
+        
+        Args:
+            query_features (Dict): Características del query
+            rows (Optional[np.ndarray]): Puntuar solo estas filas (por defecto todas)
+            
+        Returns:
+            np.ndarray: Similitud (0-1) por track, en el orden de self.tracks (o de rows)
+        """
+        n = len(self.tracks) if rows is None else len(rows)
+        if n == 0 or not self.fits(query_features):
+            return np.zeros(n, dtype=np.float64)
+        
+        matrix, tempo, centroid = self.matrix, self.tempo, self.centroid
+        if rows is not None:
+            matrix, tempo, centroid = matrix[rows], tempo[rows], centroid[rows]
+        
+        # Los bloques están normalizados por separado: un único producto
+        # matriz-vector con el query ponderado por bloque da la suma ponderada
+        # de las tres similitudes coseno
+        total = (matrix @ self.query_vector(query_features)).astype(np.float64)
+        
+        # Similitud de tempo (tolerancia del 10%, mínimo 10 BPM)
+        q_tempo = float(query_features['tempo'])
+        tempo_threshold = np.maximum(np.maximum(tempo, q_tempo) * 0.1, 10.0)
+        tempo_similarity = np.maximum(0.0, 1.0 - np.abs(tempo - q_tempo) / tempo_threshold)
+        
+        # Similitud espectral (normalizada por el centroide mayor, mínimo 1000 Hz)
+        q_centroid = float(query_features['spectral_centroid_mean'])
+        spectral_max = np.maximum(np.maximum(centroid, q_centroid), 1000.0)
+        spectral_similarity = np.maximum(0.0, 1.0 - np.abs(centroid - q_centroid) / spectral_max)
+        
+        total += self.TEMPO_WEIGHT * tempo_similarity + self.SPECTRAL_WEIGHT * spectral_similarity
+        return np.clip(total, 0.0, 1.0)
+
+
+class ReferenceWindowMatrix:
+    """
+    Segmentos de todas las referencias apilados para puntuar ventanas
+    
+    Cada track aporta las sumas de SimpleFingerprint.segment_features. Al
+    reconocer, la media de cada ventana de W segmentos consecutivos sale de
+    las sumas acumuladas y se puntúa igual que ReferenceFeatureMatrix (coseno
+    por bloques + tempo + centroide), con el tempo global del track: un tempo
+    por ventana de pocos segundos no es fiable.
+    """
+    
+    def __init__(self, tracks: List[Dict], segments: List[Tuple[np.ndarray, np.ndarray]],
+                 segment_seconds: float, fallback_tracks: Optional[List[Dict]] = None):
+        """
+        Args:
+            tracks (List[Dict]): Tracks de referencia (formato del catálogo)
+            segments (List[Tuple[np.ndarray, np.ndarray]]): (sumas, frames) de cada track
+            segment_seconds (float): Duración de cada segmento
+            fallback_tracks (Optional[List[Dict]]): Tracks sin segmentos guardados
+                (se comparan con el vector global)
+        """
+        self.tracks = tracks
+        self.fallback_tracks = list(fallback_tracks or [])
+        self.segment_seconds = segment_seconds
+        
+        lengths = np.array([len(counts) for sums, counts in segments], dtype=np.int64)
+        n_columns = sum(dim for key, dim in SimpleFingerprint.SEGMENT_COLUMNS)
+        
+        # Sumas acumuladas con una fila de ceros inicial: ventana [i, j) = C[j] - C[i]
+        sums = np.vstack([s for s, c in segments] or [np.zeros((0, n_columns), dtype=np.float32)])
+        counts = np.concatenate([c for s, c in segments] or [np.zeros(0, dtype=np.int32)])
+        self.cumsum = np.vstack([np.zeros((1, n_columns)), np.cumsum(sums, axis=0, dtype=np.float64)])
+        self.cumcount = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        
+        # Fila de track y posición dentro del track de cada segmento
+        self.track_rows = np.repeat(np.arange(len(tracks)), lengths)
+        self.positions = np.arange(len(counts)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        self.lengths = lengths
+        self.tempo = np.array(
+            [float(t['fingerprint_features']['tempo']) for t in tracks], dtype=np.float64
+        )
+    
+    def __len__(self):
+        return len(self.tracks)
+    
+    def window_segments_for(self, query_duration: float, default: int) -> int:
+        """
+        Número de segmentos por ventana para un query de la duración dada
+        """
+        if query_duration <= 0:
+            return default
+        return max(1, int(round(query_duration / self.segment_seconds)))
+    
+    def score(self, query_features: Dict, window_segments: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Mejor ventana de cada track para el query
+        
+        Args:
+            query_features (Dict): Características del query
+            window_segments (int): Segmentos por ventana (los tracks más cortos
+                se puntúan con una única ventana que los cubre enteros)
+            
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (similitud 0-1, inicio de la mejor ventana en
+                segundos) por track, en el orden de self.tracks
+        """
+        n = len(self.tracks)
+        best_scores = np.zeros(n, dtype=np.float64)
+        best_starts = np.zeros(n, dtype=np.float64)
+        if n == 0 or len(self.positions) == 0 or not ReferenceFeatureMatrix.fits(query_features):
+            return best_scores, best_starts
+        
+        # Ventanas válidas: empiezan en un segmento y no se salen del track
+        width = np.minimum(window_segments, self.lengths)[self.track_rows]
+        valid = self.positions + width <= self.lengths[self.track_rows]
+        starts = np.flatnonzero(valid)
+        ends = starts + width[starts]
+        rows = self.track_rows[starts]
+        
+        frame_counts = (self.cumcount[ends] - self.cumcount[starts]).astype(np.float64)
+        means = (self.cumsum[ends] - self.cumsum[starts]) / np.maximum(frame_counts, 1.0)[:, None]
+        
+        # Bloques normalizados, como las filas de ReferenceFeatureMatrix
+        blocks = []
+        start = 0
+        for key, dim in SimpleFingerprint.SEGMENT_COLUMNS[:-1]:
+            blocks.append(ReferenceFeatureMatrix._normalize_rows(means[:, start:start + dim]))
+            start += dim
+        centroid = means[:, start]
+        total = (np.hstack(blocks) @ ReferenceFeatureMatrix.query_vector(query_features)).astype(np.float64)
+        
+        tempo = self.tempo[rows]
+        q_tempo = float(query_features['tempo'])
+        tempo_threshold = np.maximum(np.maximum(tempo, q_tempo) * 0.1, 10.0)
+        total += ReferenceFeatureMatrix.TEMPO_WEIGHT * np.maximum(0.0, 1.0 - np.abs(tempo - q_tempo) / tempo_threshold)
+        
+        q_centroid = float(query_features['spectral_centroid_mean'])
+        spectral_max = np.maximum(np.maximum(centroid, q_centroid), 1000.0)
+        total += ReferenceFeatureMatrix.SPECTRAL_WEIGHT * np.maximum(0.0, 1.0 - np.abs(centroid - q_centroid) / spectral_max)
+        total = np.clip(total, 0.0, 1.0)
+        
+        # Mejor ventana por track: ordenar por (track, -similitud) y quedarse con la primera
+        order = np.lexsort((-total, rows))
+        first = order[np.r_[True, rows[order][1:] != rows[order][:-1]]]
+        best_scores[rows[first]] = total[first]
+        best_starts[rows[first]] = self.positions[starts[first]] * self.segment_seconds
+        return best_scores, best_starts
+
+
+class AudioRecognitionService:
+    """
+    Servicio principal para reconocimiento de audio tipo Shazam
+    """
+    
+    def __init__(self):
+        self.fingerprint = SimpleFingerprint()
+        self.landmark = LandmarkFingerprint()
+        self.cache_timeout = 3600  # 1 hora
+        # Parámetros del índice aproximado (modo 'ann')
+        self.ann_nlist = None  # None -> ~sqrt(N)
+        self.ann_nprobe = 8
+        self.ann_rerank_k = 50
+        
+    def reference_config(self, decoding: Dict) -> Dict:
+        """
+        Configuración de la extracción completa de una referencia (clave de la cache)
+        
+        Args:
+            decoding (Dict): Decodificador y remuestreador que producen la señal
+                (los del AudioIngestContext, load_audio o la lectura por bloques)
+        """
+        return {
+            'kind': 'reference',
+            'summary': self.fingerprint.extractor_config(),
+            'landmark': self.landmark.extractor_config(),
+            'segment_seconds': self.fingerprint.segment_seconds,
+            **decoding,
+        }
+    
+    def create_fingerprint(self, audio_path: str, song_id: str,
+                           context: Optional[AudioIngestContext] = None) -> Dict:
+        """
+        Crea fingerprint para una canción de referencia
+        
+        Args:
+            audio_path (str): Ruta al archivo de audio
+            song_id (str): ID único de la canción
+            context (Optional[AudioIngestContext]): Audio ya decodificado (evita
+                volver a decodificar el archivo); si es un contexto por bloques,
+                las pistas largas se procesan sin cargarlas enteras
+            
+        Returns:
+            Dict: Resultado del fingerprinting
+        """
+        try:
+            # Un audio idéntico con la misma configuración ya se procesó
+            digest = audio_digest(audio_path)
+            sample_rate = self.fingerprint.sample_rate
+            if context is not None:
+                duration = context.duration_seconds
+            else:
+                duration = self.fingerprint._source_duration(audio_path)
+            streaming = duration >= self.fingerprint.streaming_min_duration
+            
+            # Cada decodificador y remuestreador da una señal algo distinta: la
+            # entrada de la cache lleva los que se usan de verdad
+            if context is not None:
+                decoding = context.decoding
+            elif streaming:
+                decoding = stream_decoding()
+            else:
+                decoding = load_audio_decoding()
+            cached = feature_cache.get(digest, self.reference_config(decoding))
+            
+            if cached is None:
+                if streaming:
+                    # Pistas largas: por bloques, sin la señal completa en memoria
+                    if context is not None:
+                        blocks = context.signal_blocks(sample_rate)
+                    else:
+                        blocks = self.fingerprint._stream_blocks(audio_path)
+                    result = self.reference_from_blocks(blocks)
+                else:
+                    # Decodificar una sola vez para ambos motores
+                    if context is not None:
+                        y, sr = context.signal(sample_rate)
+                        # Con la señal derivada, el PCM original solo hace falta
+                        # para las métricas de calidad, que release_pcm conserva
+                        context.release_pcm()
+                    else:
+                        # Si ffmpeg falla, decode_audio recurre a librosa
+                        y, sr, decoding = decode_audio(audio_path, sr=sample_rate)
+                    result = self.reference_from_signal(y, sr)
                 
-                # Log de características del track de referencia
-                ref_features = track['fingerprint_features']
-                logger.info(f"   Ref Tempo: {ref_features.get('tempo', 'N/A'):.2f} BPM")
-                logger.info(f"   Ref Centroide: {ref_features.get('spectral_centroid_mean', 'N/A'):.2f} Hz")
-                logger.info(f"   Ref Duración: {ref_features.get('duration', 'N/A'):.2f} s")
+                if not result['success']:
+                    return result
+                cached = {key: value for key, value in result.items() if key != 'success'}
+                feature_cache.set(digest, self.reference_config(decoding), cached)
+            
+            # Guardar en cache para búsquedas rápidas
+            cache_key = f"fingerprint_{song_id}"
+            cache.set(cache_key, cached['features'], timeout=self.cache_timeout)
+            
+            logger.info(f"Fingerprint creado para song_id: {song_id} ({cached['landmark_count']} landmarks)")
+            
+            return {
+                'success': True,
+                'song_id': song_id,
+                'audio_sha256': digest,
+                **cached
+            }
                 
-                similarity = self.fingerprint.compare_fingerprints(
-                    query_features, 
-                    track['fingerprint_features']
+        except Exception as e:
+            logger.error(f"Error creando fingerprint para {song_id}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def reference_from_signal(self, y: np.ndarray, sr: int) -> Dict:
+        """
+        Características, segmentos y landmarks de una referencia ya decodificada
+        
+        Returns:
+            Dict: Campos que create_fingerprint guarda en la cache (más 'success')
+        """
+        # Extraer características
+        result = self.fingerprint.extract_features_from_signal(y, sr, with_segments=True)
+        if not result['success']:
+            return result
+        
+        # Landmarks para reconocimiento de fragmentos
+        landmark_result = self.landmark.fingerprint_signal(y, sr)
+        if not landmark_result['success']:
+            return landmark_result
+        
+        return {
+            'success': True,
+            'fingerprint_hash': result['fingerprint_hash'],
+            'features': result['features'],
+            'landmark_hashes': landmark_result['hashes'],
+            'landmark_offsets': landmark_result['offsets'],
+            'landmark_count': landmark_result['hash_count'],
+            'segment_sums': result['segment_sums'],
+            'segment_counts': result['segment_counts']
+        }
+    
+    def reference_from_blocks(self, blocks) -> Dict:
+        """
+        Lo mismo que reference_from_signal con la señal llegando por bloques
+        
+        Una sola STFT por bloque alimenta las características, los segmentos y
+        los picos de landmarks, así que la memoria no crece con la duración
+        (salvo los picos y los hashes, que son el resultado).
+        
+        Args:
+            blocks: Iterable de bloques mono float32 a fingerprint.sample_rate
+            
+        Returns:
+            Dict: Campos que create_fingerprint guarda en la cache (más 'success')
+        """
+        stft_params = ('sample_rate', 'n_fft', 'hop_length')
+        if any(getattr(self.fingerprint, p) != getattr(self.landmark, p) for p in stft_params):
+            raise ValueError('Los extractores summary y landmark no comparten la STFT')
+        
+        peak_finder = self.landmark.peak_finder()
+        result = self.fingerprint.extract_features_from_blocks(blocks, with_segments=True, peak_finder=peak_finder)
+        if not result['success']:
+            return result
+        
+        hashes, offsets = self.landmark.hash_peaks(*peak_finder.finish())
+        return {
+            'success': True,
+            'fingerprint_hash': result['fingerprint_hash'],
+            'features': result['features'],
+            'landmark_hashes': hashes,
+            'landmark_offsets': offsets,
+            'landmark_count': int(len(hashes)),
+            'segment_sums': result['segment_sums'],
+            'segment_counts': result['segment_counts']
+        }
+    
+    def extract_query_features(self, audio_path: str) -> Dict:
+        """
+        Extrae las características de un audio a reconocer, usando la cache por contenido
+        
+        Args:
+            audio_path (str): Ruta al archivo de audio
+            
+        Returns:
+            Dict: Resultado de SimpleFingerprint.extract_features
+        """
+        digest = audio_digest(audio_path)
+        config = self.fingerprint.extractor_config()
+        
+        cached = feature_cache.get(digest, {**config, **self.fingerprint.expected_decoding(audio_path)})
+        if cached is not None:
+            return {'success': True, **cached}
+        
+        result = self.fingerprint.extract_features(audio_path)
+        if result['success']:
+            feature_cache.set(digest, {**config, **result['decoding']}, {
+                'fingerprint_hash': result['fingerprint_hash'],
+                'features': result['features']
+            })
+        return result
+    
+    def extract_query_landmarks(self, audio_path: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hashes de landmarks de un audio a reconocer, usando la cache por contenido
+        
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (hashes, offsets)
+        """
+        digest = audio_digest(audio_path)
+        config = self.landmark.extractor_config()
+        
+        cached = feature_cache.get(digest, {**config, **load_audio_decoding()})
+        if cached is not None:
+            return cached['hashes'], cached['offsets']
+        
+        y, sr, decoding = decode_audio(audio_path, sr=self.landmark.sample_rate)
+        hashes, offsets = self.landmark.extract_landmarks(y, sr)
+        feature_cache.set(digest, {**config, **decoding}, {'hashes': hashes, 'offsets': offsets})
+        return hashes, offsets
+    
+    def recognize_audio(self, audio_path: str, reference_tracks: List[Dict], engine: str = 'summary',
+                        feature_matrix: Optional['ReferenceFeatureMatrix'] = None,
+                        ann_index: Optional[IVFIndex] = None, prefilter: bool = True,
+                        window_matrix: Optional['ReferenceWindowMatrix'] = None) -> Dict:
+        """
+        Reconoce un audio comparándolo con tracks de referencia
+        
+        Args:
+            audio_path (str): Ruta al archivo a reconocer
+            reference_tracks (List[Dict]): Lista de tracks de referencia con sus fingerprints
+            engine (str): 'summary' (vector global, comparación track a track),
+                'matrix' (vector global, puntuación vectorizada), 'ann' (índice aproximado
+                con re-ranking exacto), 'window' (mejor ventana de cada referencia, informa
+                offset_seconds) o 'landmark' (hashes de picos)
+            feature_matrix (Optional[ReferenceFeatureMatrix]): Matriz precalculada de
+                reference_tracks para el modo 'matrix' (se construye si no se pasa)
+            ann_index (Optional[IVFIndex]): Índice precalculado para el modo 'ann'
+            window_matrix (Optional[ReferenceWindowMatrix]): Segmentos de las referencias
+                para el modo 'window' (sin él, solo se usa el vector global)
+            prefilter (bool): Descartar antes de la comparación completa los tracks cuyo
+                tempo y centroide no permiten alcanzar el umbral (modos 'summary' y 'matrix');
+                esos tracks no aparecen en el ranking de diagnóstico
+            
+        Returns:
+            Dict: Resultado del reconocimiento
+        """
+        if engine == 'landmark':
+            return self.recognize_audio_landmarks(audio_path, reference_tracks)
+        
+        try:
+            logger.info(f"🎵 Iniciando reconocimiento de audio: {audio_path}")
+            logger.info(f"📊 Tracks de referencia disponibles: {len(reference_tracks)}")
+            
+            # Extraer características del audio a reconocer (o recuperarlas de la cache)
+            query_result = self.extract_query_features(audio_path)
+            
+            if not query_result['success']:
+                logger.error(f"❌ Error extrayendo características del query: {query_result.get('error')}")
+                return query_result
+            
+            query_features = query_result['features']
+            logger.info(f"✅ Características extraídas del query:")
+            logger.info(f"   Tempo: {query_features.get('tempo', 'N/A'):.2f} BPM")
+            logger.info(f"   Centroide espectral: {query_features.get('spectral_centroid_mean', 'N/A'):.2f} Hz")
+            logger.info(f"   Duración: {query_features.get('duration', 'N/A'):.2f} s")
+            
+            best_match = None
+            best_similarity = 0.0
+            all_similarities = []
+            best_offset = None
+            
+            # Umbral mínimo de similitud más estricto
+            similarity_threshold = 0.85  # Aumentado de 0.75 a 0.85 para mayor precisión
+            
+            if engine == 'matrix':
+                # Todas las similitudes con productos matriz-vector
+                all_similarities, best_match, best_similarity = self.score_reference_matrix(
+                    query_features,
+                    feature_matrix if feature_matrix is not None else ReferenceFeatureMatrix(reference_tracks),
+                    similarity_threshold=similarity_threshold if prefilter else None
+                )
+            elif engine == 'window':
+                # Mejor ventana de cada referencia (sumas acumuladas precalculadas)
+                all_similarities, best_match, best_similarity = self.score_windows(
+                    query_features,
+                    window_matrix if window_matrix is not None else ReferenceWindowMatrix([], [], self.fingerprint.segment_seconds),
+                    reference_tracks
                 )
+                if best_match and all_similarities:
+                    best_offset = all_similarities[0].get('offset_seconds')
+            elif engine == 'ann':
+                # Candidatos del índice aproximado, re-ranking exacto
+                all_similarities, best_match, best_similarity = self.score_ann(
+                    query_features,
+                    reference_tracks,
+                    ann_index if ann_index is not None else self.build_ann_index(reference_tracks)
+                )
+            else:
+                if prefilter:
+                    reference_tracks = self.prefilter_tracks(query_features, reference_tracks, similarity_threshold)
                 
-                all_similarities.append({
-                    'track_id': track['id'],
-                    'title': track['title'],
-                    'artist': track['artist'],
-                    'similarity': similarity
-                })
+                # Comparar con todos los tracks de referencia
+                for i, track in enumerate(reference_tracks):
+                    if 'fingerprint_features' not in track:
+                        logger.warning(f"⚠️  Track {track.get('id', 'N/A')} - {track.get('title', 'N/A')} no tiene fingerprint_features")
+                        continue
+                
+                    logger.info(f"\n🔍 Comparando con track {i+1}/{len(reference_tracks)}: {track.get('title', 'N/A')} - {track.get('artist', 'N/A')}")
+                
+                    # Log de características del track de referencia
+                    ref_features = track['fingerprint_features']
+                    logger.info(f"   Ref Tempo: {ref_features.get('tempo', 'N/A'):.2f} BPM")
+                    logger.info(f"   Ref Centroide: {ref_features.get('spectral_centroid_mean', 'N/A'):.2f} Hz")
+                    logger.info(f"   Ref Duración: {ref_features.get('duration', 'N/A'):.2f} s")
                 
-                logger.info(f"   📈 Similitud calculada: {similarity:.4f}")
+                    similarity = self.fingerprint.compare_fingerprints(
+                        query_features, 
+                        track['fingerprint_features']
+                    )
                 
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = track
-                    logger.info(f"   🎯 ¡Nueva mejor coincidencia! Similitud: {similarity:.4f}")
+                    all_similarities.append({
+                        'track_id': track['id'],
+                        'title': track['title'],
+                        'artist': track['artist'],
+                        'similarity': similarity
+                    })
+                
+                    logger.info(f"   📈 Similitud calculada: {similarity:.4f}")
+                
+                    if similarity > best_similarity:
+                        best_similarity = similarity
+                        best_match = track
+                        logger.info(f"   🎯 ¡Nueva mejor coincidencia! Similitud: {similarity:.4f}")
             
             # Ordenar por similitud para mostrar el ranking
             all_similarities.sort(key=lambda x: x['similarity'], reverse=True)
@@ -315,15 +1803,12 @@ class AudioRecognitionService:
             for i, sim in enumerate(all_similarities[:5]):  # Top 5
                 logger.info(f"   {i+1}. {sim['title']} - {sim['artist']}: {sim['similarity']:.4f}")
             
-            # Umbral mínimo de similitud más estricto
-            similarity_threshold = 0.85  # Aumentado de 0.75 a 0.85 para mayor precisión
-            
             logger.info(f"\n🎯 Mejor similitud: {best_similarity:.4f}")
             logger.info(f"🎯 Umbral requerido: {similarity_threshold:.4f}")
             
             if best_match and best_similarity >= similarity_threshold:
                 logger.info(f"✅ ¡RECONOCIMIENTO EXITOSO! Track: {best_match['title']} - {best_match['artist']}")
-                return {
+                result = {
                     'success': True,
                     'recognized': True,
                     'track_id': best_match['id'],
@@ -334,6 +1819,9 @@ class AudioRecognitionService:
                     'query_features': query_features,
                     'all_similarities': all_similarities[:10]  # Top 10 para análisis
                 }
+                if best_offset is not None:
+                    result['offset_seconds'] = best_offset
+                return result
             else:
                 logger.info(f"❌ No se encontró coincidencia suficiente. Mejor similitud: {best_similarity:.4f} < {similarity_threshold:.4f}")
                 return {
@@ -358,6 +1846,291 @@ class AudioRecognitionService:
                 'error': str(e)
             }
     
+    def prefilter_tracks(self, query_features: Dict, reference_tracks: List[Dict],
+                         similarity_threshold: float) -> List[Dict]:
+        """
+        Descarta los tracks que no pueden alcanzar el umbral por tempo y centroide
+        
+        Args:
+            query_features (Dict): Características del query
+            reference_tracks (List[Dict]): Tracks de referencia
+            similarity_threshold (float): Umbral de reconocimiento
+            
+        Returns:
+            List[Dict]: Tracks supervivientes (mismo orden)
+        """
+        required_keys = ReferenceFeatureMatrix.REQUIRED_KEYS
+        if any(key not in query_features for key in required_keys):
+            return []
+        
+        # Los tracks sin las claves requeridas puntúan 0 en compare_fingerprints
+        tracks = [
+            track for track in reference_tracks
+            if all(key in track.get('fingerprint_features', {}) for key in required_keys)
+        ]
+        bounds = ScalarBoundIndex(
+            [float(t['fingerprint_features']['tempo']) for t in tracks],
+            [float(t['fingerprint_features']['spectral_centroid_mean']) for t in tracks]
+        )
+        rows = bounds.candidates(
+            float(query_features['tempo']),
+            float(query_features['spectral_centroid_mean']),
+            ReferenceFeatureMatrix.min_scalar_score(similarity_threshold),
+            tempo_weight=ReferenceFeatureMatrix.TEMPO_WEIGHT,
+            spectral_weight=ReferenceFeatureMatrix.SPECTRAL_WEIGHT
+        )
+        
+        logger.info(f"🔎 Pre-filtro: {len(rows)}/{len(reference_tracks)} tracks pueden alcanzar el umbral")
+        return [tracks[i] for i in rows]
+    
+    def score_reference_matrix(self, query_features: Dict, matrix: 'ReferenceFeatureMatrix',
+                               top_k: int = 10,
+                               similarity_threshold: Optional[float] = None) -> Tuple[List[Dict], Optional[Dict], float]:
+        """
+        Puntúa el query contra una matriz de referencias y selecciona el top-k
+        
+        Args:
+            query_features (Dict): Características del query
+            matrix (ReferenceFeatureMatrix): Referencias apiladas
+            top_k (int): Número de candidatos a devolver
+            similarity_threshold (Optional[float]): Si se indica, se descartan antes de
+                puntuar los tracks que no pueden alcanzarlo (pre-filtro por cotas)
+            
+        Returns:
+            Tuple[List[Dict], Optional[Dict], float]: (ranking, mejor track, mejor similitud)
+        """
+        if similarity_threshold is None:
+            scores = matrix.score(query_features)
+            tracks = list(matrix.tracks)
+        else:
+            rows = matrix.candidate_rows(query_features, similarity_threshold)
+            logger.info(f"🔎 Pre-filtro: {len(rows)}/{len(matrix)} tracks pueden alcanzar el umbral")
+            scores = matrix.score(query_features, rows)
+            tracks = [matrix.tracks[i] for i in rows]
+        
+        # Tracks con dimensiones no estándar: comparación clásica
+        if matrix.fallback_tracks:
+            fallback_scores = [
+                self.fingerprint.compare_fingerprints(query_features, track['fingerprint_features'])
+                for track in matrix.fallback_tracks
+            ]
+            scores = np.concatenate([scores, np.asarray(fallback_scores, dtype=scores.dtype)])
+            tracks.extend(matrix.fallback_tracks)
+        
+        if len(scores) == 0:
+            return [], None, 0.0
+        
+        # Top-k en O(n): todas las filas con puntuación >= la k-ésima (empates
+        # incluidos) y, entre ellas, orden por (-similitud, fila). Así un empate
+        # se resuelve a favor de la primera fila, como el `>` del bucle clásico
+        k = min(top_k, len(scores))
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= kth)
+        top = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        
+        ranking = [
+            {
+                'track_id': tracks[i]['id'],
+                'title': tracks[i]['title'],
+                'artist': tracks[i]['artist'],
+                'similarity': float(scores[i])
+            }
+            for i in top
+        ]
+        
+        best_similarity = float(scores[top[0]])
+        best_match = tracks[top[0]] if best_similarity > 0.0 else None
+        return ranking, best_match, best_similarity if best_match else 0.0
+    
+    def score_windows(self, query_features: Dict, windows: 'ReferenceWindowMatrix',
+                      reference_tracks: List[Dict],
+                      top_k: int = 10) -> Tuple[List[Dict], Optional[Dict], float]:
+        """
+        Puntúa el query contra las ventanas de las referencias
+        
+        La ventana tiene la duración del query (redondeada a segmentos), así un
+        fragmento de 10 s se compara con tramos de 10 s de cada referencia.
+        
+        Args:
+            query_features (Dict): Características del query
+            windows (ReferenceWindowMatrix): Segmentos de las referencias
+            reference_tracks (List[Dict]): Tracks de referencia; los que no están en
+                windows se comparan con el vector global
+            top_k (int): Número de candidatos a devolver
+            
+        Returns:
+            Tuple[List[Dict], Optional[Dict], float]: (ranking con offset_seconds, mejor
+                track, mejor similitud)
+        """
+        window_segments = windows.window_segments_for(
+            float(query_features.get('duration', 0.0)),
+            self.fingerprint.window_segments
+        )
+        scores, starts = windows.score(query_features, window_segments)
+        
+        ranking = [
+            {
+                'track_id': track['id'],
+                'title': track['title'],
+                'artist': track['artist'],
+                'similarity': float(score),
+                'offset_seconds': float(start)
+            }
+            for track, score, start in zip(windows.tracks, scores, starts)
+        ]
+        
+        # Referencias sin segmentos guardados: comparación del vector global
+        windowed_ids = {track['id'] for track in windows.tracks}
+        tracks_by_id = {track['id']: track for track in windows.tracks}
+        for track in reference_tracks:
+            if track['id'] in windowed_ids or 'fingerprint_features' not in track:
+                continue
+            tracks_by_id[track['id']] = track
+            ranking.append({
+                'track_id': track['id'],
+                'title': track['title'],
+                'artist': track['artist'],
+                'similarity': self.fingerprint.compare_fingerprints(query_features, track['fingerprint_features'])
+            })
+        
+        ranking.sort(key=lambda x: x['similarity'], reverse=True)
+        ranking = ranking[:top_k]
+        
+        logger.info(f"🪟 Ventanas de {window_segments * windows.segment_seconds:.1f}s sobre {len(windows)} tracks")
+        
+        if not ranking or ranking[0]['similarity'] <= 0.0:
+            return ranking, None, 0.0
+        return ranking, tracks_by_id[ranking[0]['track_id']], ranking[0]['similarity']
+    
+    def build_ann_index(self, reference_tracks: List[Dict]) -> IVFIndex:
+        """
+        Construye el índice IVF de los vectores globales de las referencias
+        
+        Los tracks con dimensiones no estándar no se indexan; se guardan en
+        index.fallback_ids y se comparan siempre de forma exacta.
+        """
+        matrix = ReferenceFeatureMatrix(reference_tracks)
+        index = IVFIndex(matrix.matrix.shape[1], nlist=self.ann_nlist, nprobe=self.ann_nprobe)
+        index.train(matrix.matrix)
+        index.add(matrix.matrix, [track['id'] for track in matrix.tracks])
+        index.fallback_ids.update(track['id'] for track in matrix.fallback_tracks)
+        return index
+    
+    def score_ann(self, query_features: Dict, reference_tracks: List[Dict], ann_index: IVFIndex,
+                  top_k: int = 10) -> Tuple[List[Dict], Optional[Dict], float]:
+        """
+        Busca candidatos en el índice aproximado y los re-ordena con compare_fingerprints
+        
+        Args:
+            query_features (Dict): Características del query
+            reference_tracks (List[Dict]): Tracks de referencia (para el re-ranking exacto)
+            ann_index (IVFIndex): Índice de los tracks
+            top_k (int): Número de candidatos a devolver
+            
+        Returns:
+            Tuple[List[Dict], Optional[Dict], float]: (ranking, mejor track, mejor similitud)
+        """
+        tracks_by_id = {track['id']: track for track in reference_tracks}
+        
+        candidate_ids = list(ann_index.fallback_ids)
+        if ReferenceFeatureMatrix.fits(query_features):
+            ids, _ = ann_index.search(ReferenceFeatureMatrix.query_vector(query_features), k=self.ann_rerank_k)
+            candidate_ids.extend(ids.tolist())
+        
+        ranking = []
+        for track_id in candidate_ids:
+            track = tracks_by_id.get(track_id)
+            if track is None or 'fingerprint_features' not in track:
+                continue
+            ranking.append({
+                'track_id': track['id'],
+                'title': track['title'],
+                'artist': track['artist'],
+                'similarity': self.fingerprint.compare_fingerprints(
+                    query_features, track['fingerprint_features'], log_details=False
+                )
+            })
+        
+        ranking.sort(key=lambda x: x['similarity'], reverse=True)
+        ranking = ranking[:top_k]
+        
+        logger.info(f"🔎 ANN: {len(candidate_ids)} candidatos re-puntuados de forma exacta")
+        
+        if not ranking or ranking[0]['similarity'] <= 0.0:
+            return ranking, None, 0.0
+        return ranking, tracks_by_id[ranking[0]['track_id']], ranking[0]['similarity']
+    
+    def recognize_audio_landmarks(self, audio_path: str, reference_tracks: List[Dict]) -> Dict:
+        """
+        Reconoce un audio mediante landmarks y votación de desfases
+        
+        Args:
+            audio_path (str): Ruta al archivo a reconocer
+            reference_tracks (List[Dict]): Tracks de referencia candidatos (sus hashes
+                se leen del índice FingerprintHash)
+            
+        Returns:
+            Dict: Resultado del reconocimiento (incluye offset_seconds y aligned_matches)
+        """
+        try:
+            logger.info(f"🎵 Iniciando reconocimiento por landmarks: {audio_path}")
+            
+            query_hashes, query_offsets = self.extract_query_landmarks(audio_path)
+            
+            logger.info(f"📊 Hashes del query: {len(query_hashes)}")
+            
+            tracks_by_id = {track['id']: track for track in reference_tracks}
+            candidates = self.landmark.match_index(query_hashes, query_offsets, track_ids=tracks_by_id.keys())
+            
+            all_matches = []
+            for candidate in candidates:
+                track = tracks_by_id.get(candidate['track_id'], {})
+                all_matches.append({
+                    **candidate,
+                    'title': track.get('title'),
+                    'artist': track.get('artist'),
+                    'confidence': min(1.0, candidate['aligned_matches'] / max(len(query_hashes), 1))
+                })
+            
+            best = all_matches[0] if all_matches else None
+            threshold = self.landmark.min_aligned_matches
+            
+            if best and best['aligned_matches'] >= threshold:
+                logger.info(f"✅ ¡RECONOCIMIENTO EXITOSO! Track: {best['title']} - {best['artist']} "
+                            f"({best['aligned_matches']} hashes alineados, offset {best['offset_seconds']:.2f}s)")
+                return {
+                    'success': True,
+                    'recognized': True,
+                    'engine': 'landmark',
+                    'track_id': best['track_id'],
+                    'song_name': best['title'],
+                    'artist': best['artist'],
+                    'confidence': best['confidence'],
+                    'aligned_matches': best['aligned_matches'],
+                    'offset_seconds': best['offset_seconds'],
+                    'query_hash_count': int(len(query_hashes)),
+                    'all_matches': all_matches
+                }
+            
+            logger.info(f"❌ No se encontró coincidencia suficiente por landmarks")
+            return {
+                'success': True,
+                'recognized': False,
+                'engine': 'landmark',
+                'message': 'No se encontró coincidencia',
+                'best_aligned_matches': best['aligned_matches'] if best else 0,
+                'threshold': threshold,
+                'query_hash_count': int(len(query_hashes)),
+                'all_matches': all_matches
+            }
+            
+        except Exception as e:
+            logger.error(f"Error reconociendo audio por landmarks {audio_path}: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
     def get_cached_fingerprint(self, song_id: str) -> Optional[Dict]:
         """
         Obtiene fingerprint desde cache
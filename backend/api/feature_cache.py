@@ -0,0 +1,186 @@
+"""
+Cache persistente de características indexado por contenido
+
+La clave combina el SHA-256 de los bytes del audio con la configuración del
+extractor (sample rate, n_fft, hop_length, versión de las características...),
+así que dos subidas idénticas comparten entrada aunque tengan otro nombre y
+cualquier cambio del extractor invalida las entradas antiguas sin borrarlas
+a mano.
+
+Cada entrada es un .npz en FEATURE_CACHE_DIR (arrays tal cual, el resto como
+JSON). Los aciertos actualizan la fecha de modificación del archivo y, cuando
+el tamaño total supera FEATURE_CACHE_MAX_BYTES, se borran primero las
+entradas usadas hace más tiempo (LRU).
+"""
+import os
+import io
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1 << 20
+META_KEY = '__meta__'
+
+
+def audio_digest(audio_path: str) -> str:
+    """
+    SHA-256 de los bytes de un archivo, leído por bloques
+    """
+    digest = hashlib.sha256()
+    with open(audio_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Cache en disco de resultados de extracción con expulsión LRU por tamaño
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Tamaño total estimado en este proceso (None hasta el primer escaneo)
+        self._total_bytes: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'FEATURE_CACHE_ENABLED', True)
+
+    @property
+    def directory(self) -> str:
+        return getattr(
+            settings,
+            'FEATURE_CACHE_DIR',
+            os.path.join(settings.MEDIA_ROOT, 'feature_cache')
+        )
+
+    @property
+    def max_bytes(self) -> int:
+        return getattr(settings, 'FEATURE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+    @staticmethod
+    def make_key(digest: str, config: Dict) -> str:
+        """
+        Clave de una entrada: hash del audio + configuración del extractor
+        """
+        payload = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(f"{digest}:{payload}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npz")
+
+    def get(self, digest: str, config: Dict) -> Optional[Dict]:
+        """
+        Busca una entrada
+
+        Args:
+            digest (str): SHA-256 del audio (audio_digest)
+            config (Dict): Configuración del extractor
+
+        Returns:
+            Optional[Dict]: Valor guardado o None si no existe
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(self.make_key(digest, config))
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                value = json.loads(str(data[META_KEY]))
+                for name in data.files:
+                    if name != META_KEY:
+                        value[name] = data[name]
+            # Marcar como usada recientemente
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️  Entrada de cache de características ilegible {path}: {str(e)}")
+            return None
+
+        logger.info(f"⚡ Características recuperadas de la cache ({digest[:12]})")
+        return value
+
+    def set(self, digest: str, config: Dict, value: Dict):
+        """
+        Guarda una entrada (los np.ndarray se guardan como arrays, el resto como JSON)
+        """
+        if not self.enabled:
+            return
+
+        arrays = {name: v for name, v in value.items() if isinstance(v, np.ndarray)}
+        meta = {name: v for name, v in value.items() if not isinstance(v, np.ndarray)}
+
+        path = self._path(self.make_key(digest, config))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays, **{META_KEY: np.array(json.dumps(meta))})
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += buffer.getbuffer().nbytes
+            if self._total_bytes is None or self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        """
+        Borra las entradas menos usadas hasta quedar por debajo del 90% del límite
+        """
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.npz'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for mtime, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            logger.info(f"🧹 Cache de características: {removed} entradas expulsadas")
+
+        self._total_bytes = total
+
+    def clear(self):
+        """
+        Borra todas las entradas
+        """
+        with self._lock:
+            for root, dirs, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith('.npz'):
+                        try:
+                            os.remove(os.path.join(root, name))
+                        except OSError:
+                            pass
+            self._total_bytes = 0
+
+
+# Instancia global de la cache
+feature_cache = FeatureCache()
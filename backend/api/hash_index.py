@@ -0,0 +1,133 @@
+"""
+Índice invertido de hashes de landmarks en base de datos
+
+La ingesta usa COPY en PostgreSQL (bulk_create por lotes en otros motores) y
+la búsqueda es una única consulta WHERE hash = ANY(...), con el filtro de
+tracks candidatos también en SQL. En motores con límite de parámetros por
+consulta (SQLite: 999) la búsqueda se parte en lotes que caben en ese límite.
+"""
+import io
+import logging
+from typing import Iterable, Optional
+import numpy as np
+from django.db import connection, transaction
+from .models import FingerprintHash
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = 10000
+
+
+def store_track_hashes(track_id: int, hashes: np.ndarray, offsets: np.ndarray) -> int:
+    """
+    Reemplaza los hashes de un track en el índice
+    
+    Args:
+        track_id (int): ID del track
+        hashes (np.ndarray): Hashes de landmarks
+        offsets (np.ndarray): Offset (en frames) de cada hash
+    
+    Returns:
+        int: Número de hashes guardados
+    """
+    hashes = np.asarray(hashes, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    
+    with transaction.atomic():
+        FingerprintHash.objects.filter(track_id=track_id).delete()
+        
+        if len(hashes) == 0:
+            return 0
+        
+        if connection.vendor == 'postgresql':
+            # COPY FROM STDIN: un solo round-trip para todo el track
+            buffer = io.StringIO()
+            np.savetxt(
+                buffer,
+                np.column_stack([hashes, np.full(len(hashes), track_id, dtype=np.int64), offsets]),
+                fmt='%d',
+                delimiter='\t'
+            )
+            buffer.seek(0)
+            table = FingerprintHash._meta.db_table
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f'COPY {table} (hash, track_id, frame_offset) FROM STDIN',
+                    buffer
+                )
+        else:
+            FingerprintHash.objects.bulk_create(
+                (
+                    FingerprintHash(hash=h, track_id=track_id, frame_offset=o)
+                    for h, o in zip(hashes.tolist(), offsets.tolist())
+                ),
+                batch_size=BULK_BATCH_SIZE
+            )
+    
+    logger.info(f"{len(hashes)} hashes guardados en el índice para track {track_id}")
+    return int(len(hashes))
+
+
+def _chunks(values: list, size: Optional[int]):
+    """
+    Parte una lista en lotes de como mucho size elementos (sin límite si size es None)
+    """
+    if not size:
+        yield values
+        return
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def lookup_hashes(hashes: np.ndarray, track_ids: Optional[Iterable[int]] = None):
+    """
+    Busca en el índice todas las apariciones de los hashes dados
+    
+    Args:
+        hashes (np.ndarray): Hashes a buscar
+        track_ids (Optional[Iterable[int]]): Restringir la búsqueda a estos tracks
+    
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: (hash, track_id, frame_offset) de cada fila
+    """
+    empty = np.empty(0, dtype=np.int64)
+    unique_hashes = np.unique(np.asarray(hashes, dtype=np.int64)).tolist()
+    if track_ids is not None:
+        track_ids = sorted({int(t) for t in track_ids})
+        if not track_ids:
+            return empty, empty, empty
+    if not unique_hashes:
+        return empty, empty, empty
+    
+    if connection.vendor == 'postgresql':
+        table = FingerprintHash._meta.db_table
+        query = f'SELECT hash, track_id, frame_offset FROM {table} WHERE hash = ANY(%s)'
+        params = [unique_hashes]
+        if track_ids is not None:
+            query += ' AND track_id = ANY(%s)'
+            params.append(track_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+    else:
+        # hash__in / track_id__in usan un parámetro por valor: repartir el
+        # límite del motor entre las dos listas y consultar por lotes
+        limit = connection.features.max_query_params
+        if limit and track_ids is not None:
+            hash_batch = track_batch = limit // 2
+        else:
+            hash_batch, track_batch = limit, None
+        
+        rows = []
+        for hash_chunk in _chunks(unique_hashes, hash_batch):
+            for track_chunk in (_chunks(track_ids, track_batch) if track_ids is not None else [None]):
+                queryset = FingerprintHash.objects.filter(hash__in=hash_chunk)
+                if track_chunk is not None:
+                    queryset = queryset.filter(track_id__in=track_chunk)
+                rows.extend(queryset.values_list('hash', 'track_id', 'frame_offset'))
+    
+    if not rows:
+        return empty, empty, empty
+    
+    arr = np.asarray(rows, dtype=np.int64)
+    return arr[:, 0], arr[:, 1], arr[:, 2]
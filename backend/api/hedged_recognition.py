@@ -0,0 +1,227 @@
+"""
+Reconocimiento con varios servicios externos en paralelo (hedging)
+
+El mismo fragmento se envía primero al servicio principal; si no responde en
+RECOGNITION_HEDGE_DELAY_MS (o falla / no está seguro antes), se lanza también
+el secundario. Gana la primera respuesta confiable y el resto se cancela.
+
+Los clientes de AudD y ACRCloud son síncronos (requests con la sesión
+compartida), así que cada llamada corre en un hilo del executor de asyncio.
+Un hilo no se puede matar: cancelar activa su cancel_event, que aborta el
+envío del cuerpo si aún no terminó; si la respuesta ya estaba en camino, el
+hilo acaba por su cuenta y su resultado solo alimenta la cache.
+
+Cada llamada lanzada cuesta cuota aunque pierda, así que el respaldo es
+opcional y la espera por defecto ronda el p95 de AudD (2-3 s): solo las
+peticiones lentas de verdad llegan a lanzar el secundario.
+
+Configuración (settings):
+    RECOGNITION_HEDGING_ENABLED: usar el servicio secundario (por defecto False)
+    RECOGNITION_HEDGE_DELAY_MS: espera antes de lanzar el secundario (por defecto 3000)
+    RECOGNITION_HEDGE_MIN_CONFIDENCE: confianza mínima para ganar (por defecto 0.5)
+    RECOGNITION_HEDGE_TIMEOUT: tiempo máximo total en segundos (por defecto 35)
+"""
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ('audd', 'acrcloud')
+
+# Executor propio: la llamada perdedora sigue ocupando su hilo hasta que
+# termina, y no debe quitar hilos al executor por defecto del loop ASGI
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'RECOGNITION_HEDGE_WORKERS', 8),
+    thread_name_prefix='recognition'
+)
+
+
+def build_provider(name: str) -> Optional[Callable]:
+    """
+    Función (file_path, content_hash, cancel_event) -> resultado para un proveedor
+
+    Returns:
+        Optional[Callable]: None si el proveedor no está configurado
+    """
+    try:
+        if name == 'audd':
+            from .audd_service import get_audd_service
+            service = get_audd_service()
+            return lambda path, content_hash, cancel_event: service.recognize_file(
+                path, content_hash=content_hash, cancel_event=cancel_event
+            )
+        if name == 'acrcloud':
+            from .acrcloud_service import get_acrcloud_service
+            service = get_acrcloud_service()
+            return lambda path, content_hash, cancel_event: service.recognize_file(
+                path, cancel_event=cancel_event
+            )
+    except ValueError as e:
+        logger.warning(f"⚠️  Proveedor {name} no disponible: {str(e)}")
+        return None
+
+    raise ValueError(f"Proveedor de reconocimiento desconocido: {name}")
+
+
+def normalize_result(provider: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Homogeneiza la respuesta de un proveedor (confidence y bloque spotify)
+    """
+    result = {**result, 'provider': provider}
+    if not result.get('recognized'):
+        return result
+
+    # AudD solo devuelve coincidencias, sin puntuación
+    result.setdefault('confidence', 1.0)
+
+    track_info = dict(result.get('track_info') or {})
+    if 'spotify' not in track_info:
+        spotify = track_info.get('spotify_id')
+        if isinstance(spotify, dict):
+            spotify = (spotify.get('track') or {}).get('id')
+        track_info['spotify'] = {'id': spotify} if spotify else {}
+    result['track_info'] = track_info
+    return result
+
+
+class HedgedRecognizer:
+    """
+    Envía un audio a varios proveedores escalonados y devuelve el primero confiable
+    """
+
+    def __init__(self, providers: List[str], hedge_delay_ms: Optional[int] = None,
+                 min_confidence: Optional[float] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            providers (List[str]): Proveedores por orden de preferencia (el
+                primero es el principal)
+            hedge_delay_ms (Optional[int]): Espera antes de lanzar el siguiente
+                proveedor (0 = todos a la vez)
+            min_confidence (Optional[float]): Confianza mínima para aceptar un resultado
+            timeout (Optional[float]): Tiempo máximo total en segundos
+        """
+        self.providers = providers
+        self.hedge_delay = (
+            hedge_delay_ms if hedge_delay_ms is not None
+            else getattr(settings, 'RECOGNITION_HEDGE_DELAY_MS', 3000)
+        ) / 1000.0
+        self.min_confidence = (
+            min_confidence if min_confidence is not None
+            else getattr(settings, 'RECOGNITION_HEDGE_MIN_CONFIDENCE', 0.5)
+        )
+        self.timeout = timeout or getattr(settings, 'RECOGNITION_HEDGE_TIMEOUT', 35)
+
+    @classmethod
+    def for_service(cls, service: str = 'audd', hedge: Optional[bool] = None, **kwargs):
+        """
+        Recognizer con `service` como principal y el otro proveedor como respaldo
+
+        Args:
+            service (str): 'audd' o 'acrcloud'
+            hedge (Optional[bool]): Usar el respaldo (por defecto RECOGNITION_HEDGING_ENABLED)
+        """
+        if service not in PROVIDERS:
+            raise ValueError(f"Servicio no soportado: {service}")
+        if hedge is None:
+            hedge = getattr(settings, 'RECOGNITION_HEDGING_ENABLED', False)
+
+        providers = [service]
+        if hedge:
+            providers += [name for name in PROVIDERS if name != service]
+        return cls(providers, **kwargs)
+
+    def is_confident(self, result: Dict[str, Any]) -> bool:
+        return bool(
+            result.get('success') and result.get('recognized')
+            and result.get('confidence', 1.0) >= self.min_confidence
+        )
+
+    async def recognize(self, file_path: str, content_hash: str = None) -> Dict[str, Any]:
+        """
+        Reconoce el audio con los proveedores escalonados
+
+        Returns:
+            Dict[str, Any]: Resultado del proveedor ganador (o el mejor
+                disponible si ninguno es confiable) con 'provider' y 'hedge'
+                (proveedores lanzados y tiempo total)
+        """
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        cancel_event = threading.Event()
+        pending_providers = [
+            (name, fn) for name, fn in ((name, build_provider(name)) for name in self.providers)
+            if fn is not None
+        ]
+        if not pending_providers:
+            return {'success': False, 'error': 'Ningún servicio de reconocimiento configurado'}
+
+        running: Dict[asyncio.Future, str] = {}
+        started: List[str] = []
+        results: List[Dict[str, Any]] = []
+
+        def launch():
+            name, fn = pending_providers.pop(0)
+            started.append(name)
+            logger.info(f"🚀 Reconocimiento enviado a {name}")
+            future = loop.run_in_executor(_executor, fn, file_path, content_hash, cancel_event)
+            running[future] = name
+
+        def finish(result: Dict[str, Any]) -> Dict[str, Any]:
+            cancel_event.set()
+            for future in running:
+                future.cancel()
+            elapsed_ms = int((time.monotonic() - start) * 1000)
+            result['hedge'] = {'started': started, 'elapsed_ms': elapsed_ms}
+            logger.info(
+                f"🏁 Reconocimiento resuelto por {result.get('provider')} en {elapsed_ms} ms "
+                f"(lanzados: {', '.join(started)})"
+            )
+            return result
+
+        launch()
+        deadline = start + self.timeout
+
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # Mientras queden proveedores por lanzar, esperar como mucho hedge_delay
+            wait_for = min(self.hedge_delay, remaining) if pending_providers else remaining
+            done, _ = await asyncio.wait(
+                running.keys(), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = normalize_result(name, future.result())
+                except Exception as e:
+                    result = {'success': False, 'error': str(e), 'provider': name}
+                results.append(result)
+
+                if self.is_confident(result):
+                    return finish(result)
+                logger.info(f"↪️  {name} sin respuesta confiable")
+
+            # Sin ganador: lanzar el siguiente si venció la espera o alguien falló
+            if pending_providers:
+                launch()
+
+        if not results:
+            return finish({
+                'success': False,
+                'error': f'Tiempo de reconocimiento agotado ({self.timeout}s)',
+                'provider': started[0]
+            })
+
+        # Ninguno confiable: preferir un reconocimiento, luego un "no encontrado", luego un error
+        best = max(results, key=lambda r: (
+            bool(r.get('recognized')), bool(r.get('success')), r.get('confidence', 0.0)
+        ))
+        return finish(best)
+
@@ -0,0 +1,210 @@
+"""
+Sesión HTTP compartida para los servicios de reconocimiento externos
+
+Una única requests.Session por proceso reutiliza las conexiones (keep-alive),
+así que solo la primera petición a cada host paga el handshake TCP + TLS.
+El pool de conexiones está acotado y los reintentos usan backoff exponencial
+con jitter. Los fallos de conexión se reintentan siempre (la petición no llegó
+a enviarse); un POST de reconocimiento, en cambio, consume cuota en cuanto el
+proveedor lo procesa, así que tras un timeout de lectura o un 5xx no se
+repite: solo ante un 429/503 con Retry-After, que indica que no se procesó.
+
+Configuración (settings):
+    EXTERNAL_HTTP_POOL_CONNECTIONS: hosts distintos en el pool (por defecto 4)
+    EXTERNAL_HTTP_POOL_MAXSIZE: conexiones por host (por defecto 8)
+    EXTERNAL_HTTP_RETRIES: reintentos máximos (por defecto 3)
+    EXTERNAL_HTTP_BACKOFF: factor de backoff en segundos (por defecto 0.5)
+"""
+import os
+import io
+import uuid
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Métodos sin efectos secundarios: se reintentan también ante un 5xx
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD'])
+# Respuestas con las que un POST se puede repetir (con cabecera Retry-After)
+POST_RETRY_STATUS_CODES = (429, 503)
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+
+
+class ExternalRetry(Retry):
+    """
+    Retry que no repite un POST que el proveedor pudo haber procesado
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method and method.upper() == 'POST':
+            return bool(self.total and has_retry_after and status_code in POST_RETRY_STATUS_CODES)
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def build_session() -> requests.Session:
+    """
+    Crea una sesión con pool acotado y política de reintentos
+    """
+    retry = ExternalRetry(
+        total=getattr(settings, 'EXTERNAL_HTTP_RETRIES', 3),
+        connect=getattr(settings, 'EXTERNAL_HTTP_RETRIES', 3),
+        # Tras un timeout de lectura el proveedor pudo procesar (y cobrar) la petición
+        read=0,
+        status=getattr(settings, 'EXTERNAL_HTTP_RETRIES', 3),
+        backoff_factor=getattr(settings, 'EXTERNAL_HTTP_BACKOFF', 0.5),
+        backoff_jitter=getattr(settings, 'EXTERNAL_HTTP_BACKOFF', 0.5),
+        status_forcelist=RETRY_STATUS_CODES,
+        # Los POST de reconocimiento consumen cuota: ExternalRetry decide cuándo repetirlos
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'EXTERNAL_HTTP_POOL_CONNECTIONS', 4),
+        pool_maxsize=getattr(settings, 'EXTERNAL_HTTP_POOL_MAXSIZE', 8),
+        pool_block=False,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Sesión compartida del proceso (se recrea tras un fork: los sockets no se comparten)
+    """
+    global _session, _session_pid
+
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = build_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+class RequestCancelled(Exception):
+    """
+    El envío se abortó porque otro proveedor ya respondió
+
+    No hereda de OSError: urllib3 trataría la cancelación como un error de
+    conexión y reintentaría la petición con backoff.
+    """
+
+
+class StreamingMultipart(io.RawIOBase):
+    """
+    Cuerpo multipart/form-data que se lee por bloques
+
+    requests construye en memoria el cuerpo completo cuando recibe files=...;
+    este objeto genera la cabecera de cada parte y lee los archivos conforme
+    la conexión pide datos. Conoce su longitud total (Content-Length) y se
+    puede rebobinar para que urllib3 reenvíe el cuerpo al reintentar.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fields: Dict[str, str],
+                 files: List[Tuple[str, str, BinaryIO, int, str]],
+                 cancel_event: Optional[threading.Event] = None):
+        """
+        Args:
+            fields (Dict[str, str]): Campos de texto
+            files (List[Tuple[str, str, BinaryIO, int, str]]): (campo, nombre de
+                archivo, objeto binario, tamaño, content type) de cada archivo
+            cancel_event (Optional[threading.Event]): Si se activa, la siguiente
+                lectura lanza RequestCancelled y la petición se aborta
+        """
+        super().__init__()
+        self.cancel_event = cancel_event
+        self.boundary = uuid.uuid4().hex
+        self._parts = []
+
+        for name, value in fields.items():
+            self._parts.append(self._header(name) + str(value).encode() + b'\r\n')
+        for name, filename, fileobj, size, content_type in files:
+            self._parts.append(self._header(name, filename, content_type))
+            self._parts.append((fileobj, fileobj.tell(), size))
+            self._parts.append(b'\r\n')
+        self._parts.append(f'--{self.boundary}--\r\n'.encode())
+
+        self._length = sum(p[2] if isinstance(p, tuple) else len(p) for p in self._parts)
+        self.seek(0)
+
+    def _header(self, name: str, filename: str = None, content_type: str = None) -> bytes:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        header = f'--{self.boundary}\r\nContent-Disposition: {disposition}\r\n'
+        if content_type:
+            header += f'Content-Type: {content_type}\r\n'
+        return (header + '\r\n').encode()
+
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self._length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('Solo se puede rebobinar al inicio')
+        self._position = 0
+        self._part_index = 0
+        self._part_offset = 0
+        return 0
+
+    def read(self, size=-1):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise RequestCancelled('Petición cancelada')
+        if size is None or size < 0:
+            size = self._length - self._position
+        output = bytearray()
+
+        while len(output) < size and self._part_index < len(self._parts):
+            part = self._parts[self._part_index]
+            wanted = size - len(output)
+
+            if isinstance(part, tuple):
+                fileobj, start, part_size = part
+                remaining = part_size - self._part_offset
+                fileobj.seek(start + self._part_offset)
+                chunk = fileobj.read(min(wanted, remaining, self.CHUNK_SIZE))
+                if not chunk:
+                    raise IOError('El archivo terminó antes de lo esperado')
+                part_size_done = self._part_offset + len(chunk) >= part_size
+            else:
+                chunk = part[self._part_offset:self._part_offset + wanted]
+                part_size_done = self._part_offset + len(chunk) >= len(part)
+
+            output += chunk
+            self._part_offset += len(chunk)
+            if part_size_done:
+                self._part_index += 1
+                self._part_offset = 0
+
+        self._position += len(output)
+        return bytes(output)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
@@ -0,0 +1,84 @@
+import time
+import numpy as np
+import librosa
+from django.core.management.base import BaseCommand, CommandError
+from api.audio_decode import RESAMPLE_QUALITIES, decode_with_ffmpeg, ffmpeg_binary
+from api.dejavu_service import SimpleFingerprint
+
+
+class Command(BaseCommand):
+    help = 'Compara tiempo de decodificación y características entre librosa.load y la tubería de ffmpeg'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Archivos de audio a medir')
+        parser.add_argument(
+            '--quality',
+            choices=sorted(RESAMPLE_QUALITIES),
+            default='hq',
+            help='Calidad de remuestreo de ffmpeg',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Repeticiones por archivo (se usa la mejor)',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.01,
+            help='Diferencia relativa máxima admitida por característica',
+        )
+
+    def best_time(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        if ffmpeg_binary() is None:
+            raise CommandError('ffmpeg no está instalado')
+
+        fingerprint = SimpleFingerprint()
+        sr = fingerprint.sample_rate
+        quality = options['quality']
+        failures = 0
+
+        for path in options['files']:
+            librosa_time, (y_ref, _) = self.best_time(
+                lambda: librosa.load(path, sr=sr), options['repeat']
+            )
+            ffmpeg_time, (y_new, _) = self.best_time(
+                lambda: decode_with_ffmpeg(path, sr=sr, quality=quality), options['repeat']
+            )
+
+            self.stdout.write(
+                f"{path}: librosa {librosa_time:.3f}s, ffmpeg ({quality}) {ffmpeg_time:.3f}s "
+                f"(x{librosa_time / max(ffmpeg_time, 1e-9):.1f}), muestras {len(y_ref)} / {len(y_new)}"
+            )
+
+            features_ref = fingerprint.extract_features_from_signal(y_ref, sr)['features']
+            features_new = fingerprint.extract_features_from_signal(y_new, sr)['features']
+
+            for key, ref_value in features_ref.items():
+                ref_value = np.atleast_1d(np.asarray(ref_value, dtype=np.float64))
+                new_value = np.atleast_1d(np.asarray(features_new[key], dtype=np.float64))
+                scale = max(float(np.max(np.abs(ref_value))), 1e-9)
+                difference = float(np.max(np.abs(ref_value - new_value))) / scale
+
+                if difference > options['tolerance']:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(f"   {key}: diferencia relativa {difference:.5f}"))
+                else:
+                    self.stdout.write(f"   {key}: diferencia relativa {difference:.5f}")
+
+            similarity = fingerprint.compare_fingerprints(features_ref, features_new)
+            self.stdout.write(f"   similitud entre fingerprints: {similarity:.4f}")
+
+        if failures:
+            raise CommandError(f'{failures} características fuera de tolerancia')
+        self.stdout.write(self.style.SUCCESS('Características equivalentes con ambos decodificadores'))
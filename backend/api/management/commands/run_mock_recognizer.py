@@ -0,0 +1,95 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from api.mock_recognizer import (
+    DEFAULT_CATALOG, LatencyDistribution, MockRecognizerState, catalog_from_database, make_server
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Arranca un servidor local que imita AudD y ACRCloud para pruebas de carga. '
+        'Apunta la aplicación a él con RECOGNITION_MOCK_URL=http://HOST:PORT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interfaz de escucha')
+        parser.add_argument('--port', type=int, default=8765, help='Puerto de escucha')
+        parser.add_argument(
+            '--catalog',
+            help='JSON con la lista de canciones (por defecto, los tracks de la base de datos)',
+        )
+        parser.add_argument(
+            '--latency',
+            default='lognormal:1500:0.35',
+            help='Latencia de ambos proveedores: fixed:MS, uniform:MIN:MAX o lognormal:MEDIANA:SIGMA',
+        )
+        parser.add_argument('--audd-latency', help='Latencia solo de AudD (mismo formato)')
+        parser.add_argument('--acrcloud-latency', help='Latencia solo de ACRCloud (mismo formato)')
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Fracción de peticiones que responden HTTP 503',
+        )
+        parser.add_argument(
+            '--no-match-rate',
+            type=float,
+            default=0.1,
+            help='Fracción de audios sin coincidencia',
+        )
+        parser.add_argument(
+            '--quota',
+            type=int,
+            help='Peticiones diarias por proveedor antes de devolver cuota agotada',
+        )
+        parser.add_argument('--seed', type=int, help='Semilla de latencias y errores')
+
+    def load_catalog(self, path):
+        if path:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'No se pudo leer el catálogo {path}: {e}')
+
+        try:
+            catalog = catalog_from_database()
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'Base de datos no disponible ({e})'))
+            catalog = []
+
+        if not catalog:
+            self.stdout.write(self.style.WARNING('Usando el catálogo de ejemplo'))
+            catalog = DEFAULT_CATALOG
+        return catalog
+
+    def handle(self, *args, **options):
+        try:
+            latency = {
+                'audd': LatencyDistribution(options['audd_latency'] or options['latency']),
+                'acrcloud': LatencyDistribution(options['acrcloud_latency'] or options['latency']),
+            }
+            state = MockRecognizerState(
+                self.load_catalog(options['catalog']),
+                latency,
+                error_rate=options['error_rate'],
+                no_match_rate=options['no_match_rate'],
+                quota=options['quota'],
+                seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        server = make_server(options['host'], options['port'], state)
+        self.stdout.write(self.style.SUCCESS(
+            f"🎭 Mock de AudD/ACRCloud en http://{options['host']}:{options['port']} "
+            f"({len(state.catalog)} canciones)"
+        ))
+        self.stdout.write(f"   RECOGNITION_MOCK_URL=http://{options['host']}:{options['port']}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
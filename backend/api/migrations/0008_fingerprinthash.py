@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-17 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_musicanalysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FingerprintHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.IntegerField(db_index=True)),
+                ('frame_offset', models.IntegerField()),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint_hashes', to='api.track')),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_uploadedfile_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExternalApiQuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=20, unique=True)),
+                ('day', models.DateField()),
+                ('used', models.PositiveIntegerField(default=0)),
+                ('exhausted', models.BooleanField(default=False)),
+                ('tokens', models.FloatField(default=0.0)),
+                ('refilled_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+def create_state_row(apps, schema_editor):
+    ReferenceCatalogState = apps.get_model('api', 'ReferenceCatalogState')
+    ReferenceCatalogState.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_updated_at_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceCatalogState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_state_row, migrations.RunPython.noop),
+    ]
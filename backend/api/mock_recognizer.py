@@ -0,0 +1,342 @@
+"""
+Servidor local que imita las APIs de AudD y ACRCloud
+
+Sirve para pruebas de carga y latencia de FileUploadView, smart_recognition
+y test_acrcloud_recognition sin gastar cuota real. Habla el mismo formato que
+los servicios reales:
+
+    POST /            AudD (multipart con 'file' o campo 'url')
+    POST /v1/identify ACRCloud (multipart con 'sample')
+    GET  /stats       Contadores de peticiones por proveedor
+
+La canción devuelta sale de un catálogo local y depende solo del contenido
+enviado (el mismo audio siempre da la misma respuesta). La latencia sigue
+una distribución configurable y se pueden simular errores HTTP y cuota
+diaria agotada.
+
+Para apuntar la aplicación al servidor: RECOGNITION_MOCK_URL en settings
+(ver get_audd_service y get_acrcloud_service).
+"""
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Catálogo usado si no hay archivo ni tracks en la base de datos
+DEFAULT_CATALOG = [
+    {'title': 'Blinding Lights', 'artist': 'The Weeknd', 'album': 'After Hours',
+     'release_date': '2019-11-29', 'duration': 200, 'genre': 'Pop', 'spotify_id': '0VjIjW4GlUZAMYd2vXMi3b'},
+    {'title': 'Bohemian Rhapsody', 'artist': 'Queen', 'album': 'A Night at the Opera',
+     'release_date': '1975-10-31', 'duration': 354, 'genre': 'Rock', 'spotify_id': '7tFiyTwD0nx5a1eklYtX2J'},
+    {'title': 'Billie Jean', 'artist': 'Michael Jackson', 'album': 'Thriller',
+     'release_date': '1982-11-30', 'duration': 294, 'genre': 'Pop', 'spotify_id': '5ChkMS8OtdzJeqyybCc9R5'},
+    {'title': 'Smells Like Teen Spirit', 'artist': 'Nirvana', 'album': 'Nevermind',
+     'release_date': '1991-09-10', 'duration': 301, 'genre': 'Grunge', 'spotify_id': '5ghIJDpPoe3CfHMGu71E6T'},
+]
+
+
+class LatencyDistribution:
+    """
+    Distribución de latencia a partir de una especificación en texto
+
+    Formatos:
+        fixed:MS
+        uniform:MIN_MS:MAX_MS
+        lognormal:MEDIANA_MS:SIGMA
+    """
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        parts = spec.split(':')
+        self.kind = parts[0]
+        try:
+            self.params = [float(p) for p in parts[1:]]
+        except ValueError:
+            raise ValueError(f"Latencia inválida: {spec}")
+
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Latencia inválida: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Latencia en segundos
+        """
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(*self.params)
+        else:
+            median, sigma = self.params
+            ms = rng.lognormvariate(0.0, sigma) * median
+        return max(ms, 0.0) / 1000.0
+
+
+class MockRecognizerState:
+    """
+    Configuración y contadores compartidos por los hilos del servidor
+    """
+
+    def __init__(self, catalog: List[Dict], latency: Dict[str, LatencyDistribution],
+                 error_rate: float = 0.0, no_match_rate: float = 0.1,
+                 quota: Optional[int] = None, seed: Optional[int] = None):
+        """
+        Args:
+            catalog (List[Dict]): Canciones (title, artist, album, release_date,
+                duration, genre, spotify_id)
+            latency (Dict[str, LatencyDistribution]): Latencia por proveedor
+            error_rate (float): Fracción de peticiones que responden HTTP 503
+            no_match_rate (float): Fracción de audios sin coincidencia
+            quota (Optional[int]): Peticiones diarias por proveedor (None = sin límite)
+            seed (Optional[int]): Semilla de latencias y errores
+        """
+        if not catalog:
+            raise ValueError('El catálogo está vacío')
+        self.catalog = catalog
+        self.latency = latency
+        self.error_rate = error_rate
+        self.no_match_rate = no_match_rate
+        self.quota = quota
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.day = time.strftime('%Y-%m-%d')
+        self.stats = {provider: self.empty_stats() for provider in latency}
+
+    @staticmethod
+    def empty_stats() -> Dict[str, int]:
+        return {'requests': 0, 'matches': 0, 'no_match': 0, 'errors': 0, 'quota_exceeded': 0}
+
+    def begin(self, provider: str) -> Tuple[float, bool, bool]:
+        """
+        Registra una petición
+
+        Returns:
+            Tuple[float, bool, bool]: (latencia en segundos, fallo simulado, cuota agotada)
+        """
+        with self.lock:
+            today = time.strftime('%Y-%m-%d')
+            if today != self.day:
+                self.day = today
+                self.stats = {name: self.empty_stats() for name in self.stats}
+
+            stats = self.stats[provider]
+            stats['requests'] += 1
+            delay = self.latency[provider].sample(self.rng)
+            failed = self.rng.random() < self.error_rate
+            exhausted = self.quota is not None and stats['requests'] > self.quota
+
+            if exhausted:
+                stats['quota_exceeded'] += 1
+            elif failed:
+                stats['errors'] += 1
+            return delay, failed, exhausted
+
+    def match(self, provider: str, digest: bytes) -> Optional[Dict]:
+        """
+        Canción del catálogo para un audio (determinista por contenido)
+        """
+        # Primeros 8 bytes del hash: fracción sin coincidencia; siguientes: índice
+        no_match = int.from_bytes(digest[:8], 'big') / 2 ** 64 < self.no_match_rate
+        with self.lock:
+            self.stats[provider]['no_match' if no_match else 'matches'] += 1
+        if no_match:
+            return None
+        return self.catalog[int.from_bytes(digest[8:16], 'big') % len(self.catalog)]
+
+
+def audd_payload(track: Optional[Dict]) -> Dict:
+    """
+    Respuesta de AudD con return=apple_music,spotify
+    """
+    if track is None:
+        return {'status': 'success', 'result': None}
+
+    result = {
+        'artist': track['artist'],
+        'title': track['title'],
+        'album': track.get('album', ''),
+        'release_date': track.get('release_date'),
+        'label': track.get('label', 'Mock Records'),
+        'timecode': '00:42',
+        'song_link': f"https://lis.tn/mock-{hashlib.md5(track['title'].encode()).hexdigest()[:8]}",
+        'apple_music': {
+            'url': None,
+            'artwork': {'url': None},
+            'genreNames': [track['genre']] if track.get('genre') else [],
+            'previewUrl': None,
+        },
+    }
+    if track.get('spotify_id'):
+        result['spotify'] = {
+            'id': track['spotify_id'],
+            'external_urls': {'spotify': f"https://open.spotify.com/track/{track['spotify_id']}"},
+            'preview_url': None,
+            'popularity': 50,
+            'artists': [{'name': track['artist']}],
+        }
+    return {'status': 'success', 'result': result}
+
+
+def acrcloud_payload(track: Optional[Dict], score: int = 100) -> Dict:
+    """
+    Respuesta de /v1/identify de ACRCloud
+    """
+    if track is None:
+        return {'status': {'msg': 'No result', 'code': 1001, 'version': '1.0'}}
+
+    external_ids = {}
+    if track.get('spotify_id'):
+        external_ids['spotify'] = {'track': {'id': track['spotify_id']}}
+
+    return {
+        'status': {'msg': 'Success', 'code': 0, 'version': '1.0'},
+        'metadata': {
+            'timestamp_utc': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+            'music': [{
+                'title': track['title'],
+                'artists': [{'name': track['artist']}],
+                'album': {'name': track.get('album', '')},
+                'duration_ms': int(track.get('duration') or 0) * 1000,
+                'release_date': track.get('release_date'),
+                'genres': [{'name': track['genre']}] if track.get('genre') else [],
+                'acrid': hashlib.md5(track['title'].encode()).hexdigest(),
+                'score': score,
+                'external_ids': external_ids,
+            }],
+        },
+    }
+
+
+QUOTA_PAYLOADS = {
+    'audd': {'status': 'error', 'error': {
+        'error_code': 901,
+        'error_message': 'Recognition limit reached for this api_token (mock quota)',
+    }},
+    'acrcloud': {'status': {'msg': 'Limit exceeded', 'code': 3003, 'version': '1.0'}},
+}
+
+
+def parse_multipart(content_type: str, body: bytes) -> Dict[str, bytes]:
+    """
+    Campos de un cuerpo multipart/form-data (nombre -> bytes)
+    """
+    message = BytesParser(policy=HTTP).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode() + body
+    )
+    fields = {}
+    if message.is_multipart():
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name:
+                fields[name] = part.get_payload(decode=True) or b''
+    return fields
+
+
+class MockRecognizerHandler(BaseHTTPRequestHandler):
+    """
+    Atiende las rutas de AudD y ACRCloud
+    """
+
+    server_version = 'MockRecognizer/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self) -> MockRecognizerState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.state.lock:
+                self.send_json({'day': self.state.day, 'providers': self.state.stats})
+        else:
+            self.send_json({'error': 'Not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        path = self.path.split('?')[0].rstrip('/')
+
+        if path in ('', '/recognize'):
+            provider, sample_field = 'audd', ('file', 'url', 'audio')
+        elif path == '/v1/identify':
+            provider, sample_field = 'acrcloud', ('sample',)
+        else:
+            self.send_json({'error': 'Not found'}, status=404)
+            return
+
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/'):
+            fields = parse_multipart(content_type, body)
+        else:
+            from urllib.parse import parse_qs
+            fields = {k: v[0].encode() for k, v in parse_qs(body.decode(errors='replace')).items()}
+
+        sample = next((fields[name] for name in sample_field if name in fields), None)
+        if sample is None:
+            self.send_json({'error': f'Falta el campo {sample_field[0]}'}, status=400)
+            return
+
+        delay, failed, exhausted = self.state.begin(provider)
+        time.sleep(delay)
+
+        if failed:
+            self.send_json({'error': 'Service temporarily unavailable (mock)'}, status=503)
+            return
+        if exhausted:
+            self.send_json(QUOTA_PAYLOADS[provider])
+            return
+
+        track = self.state.match(provider, hashlib.sha256(sample).digest())
+        if provider == 'audd':
+            self.send_json(audd_payload(track))
+        else:
+            self.send_json(acrcloud_payload(track))
+
+
+def catalog_from_database() -> List[Dict]:
+    """
+    Catálogo con los tracks de la base de datos
+    """
+    from .models import Track
+
+    catalog = []
+    for track in Track.objects.select_related('artist', 'genre').all():
+        catalog.append({
+            'title': track.title,
+            'artist': track.artist.name,
+            'album': '',
+            'release_date': None,
+            'duration': track.duration,
+            'genre': track.genre.name if track.genre else None,
+            'spotify_id': track.spotify_id,
+        })
+    return catalog
+
+
+def make_server(host: str, port: int, state: MockRecognizerState) -> ThreadingHTTPServer:
+    """
+    Servidor HTTP multihilo listo para serve_forever()
+    """
+    server = ThreadingHTTPServer((host, port), MockRecognizerHandler)
+    server.daemon_threads = True
+    server.state = state
+    return server
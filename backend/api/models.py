@@ -17,6 +17,7 @@ class Artist(models.Model):
     name = models.CharField(max_length=200)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='artists')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     # Campos adicionales para metadatos
     description = models.TextField(blank=True, null=True)
     country = models.CharField(max_length=100, blank=True, null=True)
@@ -34,6 +35,8 @@ class Genre(models.Model):
     description = models.TextField(blank=True)
     # Color para visualización en frontend
     color_code = models.CharField(max_length=7, default='#3498db')  # Hex color
+    # Validador para GET condicionales (ETag/Last-Modified)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -44,6 +47,8 @@ class Mood(models.Model):
     description = models.TextField(blank=True)
     # Valor numérico para análisis (ej: -1 a 1, donde -1 es triste, 1 es alegre)
     valence_score = models.FloatField(default=0.0)
+    # Validador para GET condicionales (ETag/Last-Modified)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -58,6 +63,7 @@ class Track(models.Model):
     genre = models.ForeignKey(Genre, on_delete=models.SET_NULL, null=True, related_name='tracks')
     mood = models.ForeignKey(Mood, on_delete=models.SET_NULL, null=True, related_name='tracks')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     # CAMPOS PARA INTEGRACIÓN CON SERVICIOS EXTERNOS
     spotify_id = models.CharField(max_length=50, null=True, blank=True, unique=True, help_text="ID de Spotify para vincular con AudD")
@@ -138,6 +144,7 @@ class Recognition(models.Model):
     processing_time = models.FloatField(null=True, blank=True)  # Tiempo de procesamiento en segundos
     recognition_error = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     # Resultado completo de Dejavu (JSON)
     dejavu_result = JSONField(null=True, blank=True)
@@ -182,6 +189,18 @@ class Analysis(models.Model):
         return f"Analysis for {self.track.title}"
 
 
+class FingerprintHash(models.Model):
+    """
+    Índice invertido de hashes de landmarks: hash -> (track, frame de offset)
+    """
+    hash = models.IntegerField(db_index=True)
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='fingerprint_hashes')
+    frame_offset = models.IntegerField()  # Offset del ancla en frames (hop_length)
+
+    def __str__(self):
+        return f"{self.hash} -> track {self.track_id} @ {self.frame_offset}"
+
+
 class UploadedFile(models.Model):
     file = models.FileField(upload_to='uploads/')
     name = models.CharField(max_length=255)
@@ -190,6 +209,9 @@ class UploadedFile(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="uploaded_files")
     
+    # SHA-256 del contenido (calculado durante la subida) para detectar duplicados
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    
     # Nuevos campos para reconocimiento
     # Estado del procesamiento
     processing_status = models.CharField(
@@ -265,4 +287,40 @@ class MusicAnalysis(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Análisis de Música'
-        verbose_name_plural = 'Análisis de Música'
\ No newline at end of file
+        verbose_name_plural = 'Análisis de Música'
+
+class ExternalApiQuota(models.Model):
+    """
+    Consumo de cuota de un servicio de reconocimiento externo (AudD, ACRCloud)
+
+    Una fila por proveedor, compartida por todos los procesos: el uso diario
+    y el token bucket de ritmo se actualizan con la fila bloqueada
+    (ver api/quota.py).
+    """
+    provider = models.CharField(max_length=20, unique=True)
+    
+    # Uso del día (se reinicia al cambiar de día en UTC)
+    day = models.DateField()
+    used = models.PositiveIntegerField(default=0)
+    # El proveedor informó cuota agotada antes de llegar al límite configurado
+    exhausted = models.BooleanField(default=False)
+    
+    # Token bucket para el ritmo de llamadas
+    tokens = models.FloatField(default=0.0)
+    refilled_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.provider}: {self.used} llamadas el {self.day}"
+
+
+class ReferenceCatalogState(models.Model):
+    """
+    Generación del catálogo de referencia compartida por todos los procesos
+
+    Fila única (pk=1): cada cambio del catálogo la incrementa y cada proceso
+    compara su copia con ella (ver api/reference_catalog.py).
+    """
+    generation = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Catálogo de referencia, generación {self.generation}"
@@ -0,0 +1,234 @@
+"""
+Límite de cuota compartido para los servicios de reconocimiento externos
+
+AudD (25 reconocimientos gratuitos al día) y ACRCloud cobran cada llamada y
+la cuota agotada solo se descubría cuando una petición fallaba. Este módulo
+lleva la cuenta antes de llamar: cada proveedor tiene una fila
+ExternalApiQuota con el uso del día y un token bucket para el ritmo, que se
+actualiza con la fila bloqueada (SELECT ... FOR UPDATE), así que todos los
+procesos (gunicorn, workers de Celery) comparten el mismo presupuesto.
+
+Si se agotó la cuota diaria la llamada se rechaza al momento; si solo falta
+ritmo, se espera hasta EXTERNAL_API_QUOTA_MAX_WAIT segundos a que se recargue
+el bucket. status() consulta el presupuesto restante sin gastar nada.
+
+Configuración (settings):
+    EXTERNAL_API_QUOTA_ENABLED: activar el límite (por defecto True)
+    EXTERNAL_API_QUOTAS: por proveedor, {'daily': llamadas al día o None,
+        'rate': llamadas por ventana, 'per': segundos de la ventana}
+    EXTERNAL_API_QUOTA_MAX_WAIT: espera máxima por ritmo (por defecto 5 s)
+"""
+import time
+import logging
+from datetime import datetime, time as dt_time, timedelta
+from typing import Any, Dict, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUOTAS = {
+    'audd': {'daily': 25, 'rate': 5, 'per': 60},
+    'acrcloud': {'daily': None, 'rate': 10, 'per': 60},
+}
+
+
+class QuotaLimiter:
+    """
+    Presupuesto diario + token bucket por proveedor, guardado en la base de datos
+    """
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'EXTERNAL_API_QUOTA_ENABLED', True)
+
+    @property
+    def max_wait(self) -> float:
+        return getattr(settings, 'EXTERNAL_API_QUOTA_MAX_WAIT', 5)
+
+    def limits(self, provider: str) -> Dict[str, Any]:
+        quotas = getattr(settings, 'EXTERNAL_API_QUOTAS', DEFAULT_QUOTAS)
+        return {'daily': None, 'rate': None, 'per': 60, **quotas.get(provider, {})}
+
+    @staticmethod
+    def seconds_until_reset(now: datetime) -> float:
+        """
+        Segundos hasta la medianoche UTC, cuando se reinicia el uso diario
+        """
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), dt_time.min, tzinfo=now.tzinfo)
+        return (tomorrow - now).total_seconds()
+
+    def _get_row(self, provider: str, now: datetime):
+        from .models import ExternalApiQuota
+
+        limits = self.limits(provider)
+        ExternalApiQuota.objects.get_or_create(
+            provider=provider,
+            defaults={'day': now.date(), 'tokens': limits['rate'] or 0, 'refilled_at': now}
+        )
+        return ExternalApiQuota.objects.select_for_update().get(provider=provider)
+
+    def _refresh(self, row, limits: Dict[str, Any], now: datetime):
+        """
+        Reinicia el día y recarga el bucket en memoria (sin guardar)
+        """
+        if row.day != now.date():
+            row.day = now.date()
+            row.used = 0
+            row.exhausted = False
+
+        if limits['rate']:
+            elapsed = max((now - row.refilled_at).total_seconds(), 0.0)
+            row.tokens = min(float(limits['rate']), row.tokens + elapsed * limits['rate'] / limits['per'])
+        row.refilled_at = now
+
+    def _decision(self, row, limits: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        daily = limits['daily']
+        remaining = None if daily is None else max(daily - row.used, 0)
+        if row.exhausted:
+            remaining = 0
+
+        if remaining == 0:
+            return {'allowed': False, 'reason': 'daily', 'remaining': 0,
+                    'retry_after': self.seconds_until_reset(now)}
+        if limits['rate'] and row.tokens < 1:
+            return {'allowed': False, 'reason': 'rate', 'remaining': remaining,
+                    'retry_after': (1 - row.tokens) * limits['per'] / limits['rate']}
+        return {'allowed': True, 'reason': None, 'remaining': remaining, 'retry_after': 0.0}
+
+    def try_acquire(self, provider: str) -> Dict[str, Any]:
+        """
+        Intenta gastar una llamada sin esperar
+
+        Returns:
+            Dict[str, Any]: allowed, reason ('daily', 'rate' o None),
+                remaining (llamadas del día tras esta; None si no hay límite)
+                y retry_after (segundos)
+        """
+        limits = self.limits(provider)
+        with transaction.atomic():
+            now = timezone.now()
+            row = self._get_row(provider, now)
+            self._refresh(row, limits, now)
+            decision = self._decision(row, limits, now)
+
+            if decision['allowed']:
+                row.used += 1
+                if limits['rate']:
+                    row.tokens -= 1
+                if decision['remaining'] is not None:
+                    decision['remaining'] -= 1
+            row.save()
+        return decision
+
+    def acquire(self, provider: str, max_wait: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Gasta una llamada, esperando a que se recargue el bucket si hace falta
+
+        Args:
+            provider (str): 'audd' o 'acrcloud'
+            max_wait (Optional[float]): Espera máxima (por defecto EXTERNAL_API_QUOTA_MAX_WAIT)
+
+        Returns:
+            Dict[str, Any]: Igual que try_acquire
+        """
+        if not self.enabled:
+            return {'allowed': True, 'reason': None, 'remaining': None, 'retry_after': 0.0}
+
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        while True:
+            try:
+                decision = self.try_acquire(provider)
+            except Exception as e:
+                # Sin base de datos no se bloquea el reconocimiento
+                logger.warning(f"⚠️  No se pudo consultar la cuota de {provider}: {str(e)}")
+                return {'allowed': True, 'reason': None, 'remaining': None, 'retry_after': 0.0}
+
+            if decision['allowed'] or decision['reason'] == 'daily':
+                break
+            if time.monotonic() + decision['retry_after'] > deadline:
+                break
+            time.sleep(decision['retry_after'])
+
+        if not decision['allowed']:
+            logger.warning(
+                f"🚫 Llamada a {provider} rechazada por cuota ({decision['reason']}, "
+                f"reintentar en {decision['retry_after']:.0f}s)"
+            )
+        return decision
+
+    def mark_exhausted(self, provider: str):
+        """
+        El proveedor informó cuota agotada: rechazar el resto del día
+        """
+        if not self.enabled:
+            return
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                row = self._get_row(provider, now)
+                self._refresh(row, self.limits(provider), now)
+                row.exhausted = True
+                row.save()
+            logger.warning(f"🚫 {provider} informó cuota agotada hasta mañana")
+        except Exception as e:
+            logger.warning(f"⚠️  No se pudo registrar la cuota agotada de {provider}: {str(e)}")
+
+    def status(self, provider: str) -> Dict[str, Any]:
+        """
+        Presupuesto actual sin gastar ninguna llamada
+
+        Returns:
+            Dict[str, Any]: provider, daily_limit, used, remaining, exhausted,
+                tokens, allowed_now, retry_after y resets_in (segundos)
+        """
+        from .models import ExternalApiQuota
+
+        limits = self.limits(provider)
+        now = timezone.now()
+        row = ExternalApiQuota.objects.filter(provider=provider).first()
+        if row is None:
+            row = ExternalApiQuota(provider=provider, day=now.date(),
+                                   tokens=limits['rate'] or 0, refilled_at=now)
+        self._refresh(row, limits, now)
+        decision = self._decision(row, limits, now)
+
+        return {
+            'provider': provider,
+            'daily_limit': limits['daily'],
+            'used': row.used,
+            'remaining': decision['remaining'],
+            'exhausted': decision['reason'] == 'daily',
+            'tokens': round(row.tokens, 2) if limits['rate'] else None,
+            'allowed_now': decision['allowed'],
+            'retry_after': decision['retry_after'],
+            'resets_in': self.seconds_until_reset(now),
+        }
+
+
+def quota_refusal(provider: str, decision: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resultado de reconocimiento para una llamada rechazada por el límite
+    """
+    if decision['reason'] == 'daily':
+        return {
+            'success': False,
+            'quota_exceeded': True,
+            'error': f"🚫 Cuota diaria de {provider} agotada",
+            'message': f'Cuota diaria de {provider} agotada; se reinicia a medianoche (UTC)',
+            'retry_after': decision['retry_after'],
+        }
+    return {
+        'success': False,
+        'rate_limited': True,
+        'error': f"🚫 Demasiadas llamadas a {provider}",
+        'message': f"Reintentar en {decision['retry_after']:.0f} segundos",
+        'retry_after': decision['retry_after'],
+    }
+
+
+# Instancia global del limitador
+quota_limiter = QuotaLimiter()
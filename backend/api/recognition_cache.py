@@ -0,0 +1,84 @@
+"""
+Cache de resultados de reconocimiento de servicios externos (AudD, ACRCloud)
+
+Cada llamada a estos servicios consume cuota (AudD gratuito: 25 al día) y
+tarda 2-3 segundos. El resultado ya parseado se guarda en el cache de Django
+RECOGNITION_CACHE_ALIAS (compartido entre el servidor y los workers, y
+persistente; ver CACHES en settings) bajo el SHA-256 del audio enviado: los reconocimientos positivos duran
+RECOGNITION_CACHE_TTL y los "no encontrado" RECOGNITION_CACHE_NEGATIVE_TTL
+(más corto, por si el catálogo del servicio se actualiza). Los errores y los
+avisos de cuota nunca se guardan.
+"""
+import hashlib
+import logging
+from typing import Dict, Optional
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionResultCache:
+    """
+    Resultados de reconocimiento externos indexados por proveedor y contenido
+    """
+
+    KEY_PREFIX = 'recognition_result'
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'RECOGNITION_CACHE_ENABLED', True)
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'RECOGNITION_CACHE_ALIAS', 'recognition')]
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'RECOGNITION_CACHE_TTL', 7 * 24 * 3600)
+
+    @property
+    def negative_ttl(self) -> int:
+        return getattr(settings, 'RECOGNITION_CACHE_NEGATIVE_TTL', 3600)
+
+    @staticmethod
+    def digest_bytes(audio_data: bytes) -> str:
+        return hashlib.sha256(audio_data).hexdigest()
+
+    def make_key(self, provider: str, content_hash: str) -> str:
+        return f"{self.KEY_PREFIX}:{provider}:{content_hash}"
+
+    def get(self, provider: str, content_hash: str) -> Optional[Dict]:
+        """
+        Resultado guardado para este audio o None
+
+        Args:
+            provider (str): 'audd' o 'acrcloud'
+            content_hash (str): SHA-256 del audio enviado
+        """
+        if not self.enabled or not content_hash:
+            return None
+
+        result = self.cache.get(self.make_key(provider, content_hash))
+        if result is not None:
+            logger.info(f"⚡ Resultado de {provider} recuperado de la cache ({content_hash[:12]})")
+            return {**result, 'cached': True}
+        return None
+
+    def set(self, provider: str, content_hash: str, result: Dict):
+        """
+        Guarda un resultado si es definitivo (reconocido o no encontrado)
+        """
+        if not self.enabled or not content_hash or not result.get('success'):
+            return
+
+        timeout = self.ttl if result.get('recognized') else self.negative_ttl
+        if timeout:
+            self.cache.set(self.make_key(provider, content_hash), result, timeout=timeout)
+
+    def invalidate(self, provider: str, content_hash: str):
+        self.cache.delete(self.make_key(provider, content_hash))
+
+
+# Instancia global de la cache de resultados
+recognition_cache = RecognitionResultCache()
@@ -0,0 +1,172 @@
+"""
+Fragmento corto para los servicios de reconocimiento externos
+
+AudD y ACRCloud solo necesitan 10-15 segundos de audio para identificar una
+canción. En lugar de subir el archivo completo (hasta 10 MB), se elige la
+ventana más fuerte (o la central) y se transcodifica en memoria a MP3/Opus
+mono de bitrate bajo: unos 100 KB por petición.
+
+Configuración (settings):
+    RECOGNITION_SNIPPET_ENABLED: activar el recorte (por defecto True)
+    RECOGNITION_SNIPPET_SECONDS: duración del fragmento (por defecto 12)
+    RECOGNITION_SNIPPET_STRATEGY: 'loudest' (por defecto) o 'center'
+    RECOGNITION_SNIPPET_FORMAT: 'mp3' (por defecto) u 'opus'
+    RECOGNITION_SNIPPET_BITRATE: bitrate del fragmento (por defecto '64k')
+"""
+import io
+import os
+import logging
+import functools
+from typing import Any, Dict, Optional
+import numpy as np
+from django.conf import settings
+from .audio_decode import ffmpeg_binary, load_audio, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Sample rate del análisis de volumen (basta para medir energía)
+ANALYSIS_SAMPLE_RATE = 8000
+# Sample rate del fragmento si no hay ffmpeg y se codifica con soundfile
+FALLBACK_SAMPLE_RATE = 16000
+
+SNIPPET_FORMATS = {
+    # formato: (códec de ffmpeg, contenedor, extensión, content type)
+    'mp3': ('libmp3lame', 'mp3', 'mp3', 'audio/mpeg'),
+    'opus': ('libopus', 'ogg', 'ogg', 'audio/ogg'),
+}
+
+
+def select_window(y: np.ndarray, sr: int, seconds: float, strategy: str = 'loudest') -> float:
+    """
+    Inicio (en segundos) de la ventana a enviar
+
+    Args:
+        y (np.ndarray): Señal mono
+        sr (int): Sample rate
+        seconds (float): Duración de la ventana
+        strategy (str): 'loudest' (mayor energía) o 'center'
+
+    Returns:
+        float: Segundo en el que empieza la ventana
+    """
+    duration = len(y) / sr
+    if duration <= seconds:
+        return 0.0
+    if strategy == 'center':
+        return (duration - seconds) / 2
+    if strategy != 'loudest':
+        raise ValueError(f"Estrategia de fragmento desconocida: {strategy}")
+
+    # Energía por bloques de 100 ms y suma deslizante con sumas acumuladas
+    hop = max(sr // 10, 1)
+    n_blocks = len(y) // hop
+    energy = np.square(y[:n_blocks * hop].reshape(n_blocks, hop), dtype=np.float64).sum(axis=1)
+    window_blocks = min(int(round(seconds * 10)), n_blocks)
+    cumulative = np.concatenate([[0.0], np.cumsum(energy)])
+    window_energy = cumulative[window_blocks:] - cumulative[:-window_blocks]
+    return float(np.argmax(window_energy) * hop / sr)
+
+
+def encode_with_ffmpeg(audio_path: str, start: float, seconds: float,
+                       snippet_format: str, bitrate: str) -> bytes:
+    """
+    Recorta y transcodifica con ffmpeg a mono, escribiendo en memoria
+    """
+    codec, container, _, _ = SNIPPET_FORMATS[snippet_format]
+    command = [
+        ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error',
+        # -ss antes de -i: búsqueda directa sin decodificar el principio
+        '-ss', f'{start:.3f}', '-t', f'{seconds:.3f}',
+        '-i', audio_path,
+        '-vn', '-ac', '1',
+        '-acodec', codec, '-b:a', bitrate,
+        '-f', container,
+        'pipe:1',
+    ]
+    data, _ = run_ffmpeg(command)
+    return bytes(data)
+
+
+def encode_with_soundfile(y: np.ndarray, sr: int) -> bytes:
+    """
+    Codifica el fragmento como FLAC mono con soundfile (sin ffmpeg)
+    """
+    import soundfile as sf
+
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format='FLAC', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_snippet(audio_path: str, mtime_ns: int, size: int, seconds: float,
+                    strategy: str, snippet_format: str, bitrate: str) -> Optional[Dict[str, Any]]:
+    """
+    Calcula el fragmento (mtime y tamaño invalidan la entrada si el archivo cambia)
+    """
+    use_ffmpeg = ffmpeg_binary() is not None
+    analysis_sr = ANALYSIS_SAMPLE_RATE if use_ffmpeg else FALLBACK_SAMPLE_RATE
+    y, sr = load_audio(audio_path, sr=analysis_sr, mono=True, quality='fast')
+
+    # Un audio poco más largo que el fragmento no compensa el recorte
+    if len(y) / sr <= seconds * 1.5:
+        return None
+
+    start = select_window(y, sr, seconds, strategy)
+
+    if use_ffmpeg:
+        data = encode_with_ffmpeg(audio_path, start, seconds, snippet_format, bitrate)
+        _, _, extension, content_type = SNIPPET_FORMATS[snippet_format]
+    else:
+        first = int(start * sr)
+        data = encode_with_soundfile(y[first:first + int(seconds * sr)], sr)
+        extension, content_type = 'flac', 'audio/flac'
+
+    if not data:
+        return None
+
+    logger.info(
+        f"✂️  Fragmento de {seconds:g}s desde {start:.1f}s ({strategy}): {len(data) / 1024:.0f} KB"
+    )
+    return {
+        'data': data,
+        'filename': f'snippet.{extension}',
+        'content_type': content_type,
+        'start': start,
+        'duration': seconds,
+    }
+
+
+def extract_snippet(audio_path: str, seconds: Optional[float] = None,
+                    strategy: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Fragmento comprimido del audio para enviar a un servicio externo
+
+    Args:
+        audio_path (str): Ruta al archivo de audio
+        seconds (Optional[float]): Duración (por defecto RECOGNITION_SNIPPET_SECONDS)
+        strategy (Optional[str]): 'loudest' o 'center'
+
+    Returns:
+        Optional[Dict[str, Any]]: data, filename, content_type, start y
+            duration; None si está desactivado, el audio ya es corto o no se
+            pudo recortar (en ese caso se envía el archivo original)
+    """
+    if not getattr(settings, 'RECOGNITION_SNIPPET_ENABLED', True):
+        return None
+
+    seconds = seconds or getattr(settings, 'RECOGNITION_SNIPPET_SECONDS', 12)
+    strategy = strategy or getattr(settings, 'RECOGNITION_SNIPPET_STRATEGY', 'loudest')
+    snippet_format = getattr(settings, 'RECOGNITION_SNIPPET_FORMAT', 'mp3')
+    bitrate = getattr(settings, 'RECOGNITION_SNIPPET_BITRATE', '64k')
+    if snippet_format not in SNIPPET_FORMATS:
+        raise ValueError(f"Formato de fragmento desconocido: {snippet_format}")
+
+    try:
+        stat = os.stat(audio_path)
+        # Con hedging, AudD y ACRCloud piden el mismo fragmento
+        return _cached_snippet(audio_path, stat.st_mtime_ns, stat.st_size,
+                               seconds, strategy, snippet_format, bitrate)
+    except Exception as e:
+        logger.warning(f"⚠️  No se pudo recortar {audio_path}, se envía completo: {str(e)}")
+        return None
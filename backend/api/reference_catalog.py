@@ -0,0 +1,354 @@
+"""
+Catálogo de tracks de referencia compartido por todo el proceso
+
+Se construye una vez por proceso worker y se actualiza de forma incremental
+mediante señales post_save/post_delete de Track y Analysis. Un contador de
+generación guardado en la base de datos (fila única de ReferenceCatalogState)
+permite a otros procesos detectar que su copia quedó obsoleta.
+
+La matriz de características se persiste como .npy bajo MEDIA_ROOT y cada
+proceso la abre con np.load(mmap_mode='r'), de modo que todos los workers
+comparten una única copia a través del page cache.
+"""
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .dejavu_service import ReferenceFeatureMatrix, ReferenceWindowMatrix, SimpleFingerprint
+from .window_index import load_track_windows
+
+logger = logging.getLogger(__name__)
+
+# Fila de ReferenceCatalogState con la generación compartida
+CATALOG_STATE_ID = 1
+
+def matrix_directory() -> str:
+    """
+    Directorio de la matriz compartida (FINGERPRINT_MATRIX_DIR, por defecto bajo MEDIA_ROOT)
+    """
+    return getattr(
+        settings,
+        'FINGERPRINT_MATRIX_DIR',
+        os.path.join(settings.MEDIA_ROOT, 'fingerprint_index')
+    )
+
+
+REQUIRED_KEYS = ['mfcc_mean', 'chroma_mean', 'contrast_mean', 'tempo', 'spectral_centroid_mean']
+
+
+class ReferenceCatalog:
+    """
+    Tracks de referencia con fingerprint completado, listos para reconocimiento
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tracks: Optional[Dict[int, Dict]] = None
+        self._matrix: Optional[ReferenceFeatureMatrix] = None
+        self._matrix_generation: Optional[int] = None
+        self._ann_index = None
+        self._windows: Optional[ReferenceWindowMatrix] = None
+        self._windows_generation: Optional[int] = None
+        # Generación compartida con la que está sincronizada esta copia
+        self._synced_generation: Optional[int] = None
+        # Cambios aplicados en este proceso (diagnóstico)
+        self.local_generation = 0
+    
+    @staticmethod
+    def shared_generation() -> int:
+        """
+        Generación actual del catálogo compartida entre procesos
+        """
+        from .models import ReferenceCatalogState
+        
+        generation = ReferenceCatalogState.objects.filter(pk=CATALOG_STATE_ID) \
+            .values_list('generation', flat=True).first()
+        return generation or 0
+    
+    def is_stale(self) -> bool:
+        """
+        Indica si otro proceso modificó el catálogo desde la última carga
+        """
+        return self._tracks is None or self._synced_generation != self.shared_generation()
+    
+    @staticmethod
+    def build_entry(track) -> Optional[Dict]:
+        """
+        Convierte un Track (con analysis precargado) en una entrada del catálogo
+        
+        Returns:
+            Optional[Dict]: Entrada o None si el track no es una referencia válida
+        """
+        if track.fingerprint_status != 'completed' or not track.is_reference_track:
+            return None
+        
+        analysis = getattr(track, 'analysis', None)
+        if analysis is None or not analysis.fingerprint_result:
+            return None
+        
+        features = analysis.fingerprint_result.get('features', {})
+        missing_keys = [key for key in REQUIRED_KEYS if key not in features]
+        if missing_keys:
+            logger.warning(f"⚠️  Track {track.id} - {track.title}: faltan características {missing_keys}")
+            return None
+        
+        return {
+            'id': track.id,
+            'title': track.title,
+            'artist': track.artist.name,
+            'fingerprint_features': features
+        }
+    
+    def load(self, generation: Optional[int] = None):
+        """
+        Carga completa del catálogo desde la base de datos
+        
+        Args:
+            generation (Optional[int]): Generación ya leída con la que etiquetar
+                la copia (por defecto se lee antes de consultar los tracks)
+        """
+        from .models import Track
+        
+        with self._lock:
+            if generation is None:
+                generation = self.shared_generation()
+            
+            completed_tracks = Track.objects.filter(
+                fingerprint_status='completed',
+                is_reference_track=True
+            ).select_related('artist', 'analysis')
+            
+            tracks = {}
+            for track in completed_tracks:
+                entry = self.build_entry(track)
+                if entry:
+                    tracks[track.id] = entry
+            
+            self._tracks = tracks
+            self._ann_index = None
+            self._synced_generation = generation
+            self.local_generation += 1
+            
+            logger.info(f"📊 Catálogo de referencia cargado: {len(tracks)} tracks (generación {generation})")
+    
+    def _ensure_loaded(self, generation: int):
+        if self._tracks is None or self._synced_generation != generation:
+            self.load(generation)
+    
+    def get_tracks(self) -> List[Dict]:
+        """
+        Lista de tracks de referencia (formato de AudioRecognitionService.recognize_audio)
+        """
+        with self._lock:
+            self._ensure_loaded(self.shared_generation())
+            return list(self._tracks.values())
+    
+    def get_matrix(self) -> ReferenceFeatureMatrix:
+        """
+        Matriz de características de las referencias
+        
+        Se lee mapeada en memoria desde FINGERPRINT_MATRIX_DIR si la copia en
+        disco corresponde a la generación actual; si no, se construye a partir
+        del catálogo y se persiste para el resto de procesos.
+        """
+        with self._lock:
+            return self._matrix_for(self.shared_generation())
+    
+    def _matrix_for(self, generation: int) -> ReferenceFeatureMatrix:
+        if self._matrix is not None and self._matrix_generation == generation:
+            return self._matrix
+        
+        directory = matrix_directory()
+        matrix = ReferenceFeatureMatrix.load(directory, generation)
+        if matrix is None:
+            self._ensure_loaded(generation)
+            built = ReferenceFeatureMatrix(list(self._tracks.values()))
+            try:
+                built.save(directory, generation)
+                logger.info(f"📊 Matriz de referencia persistida en {directory} (generación {generation})")
+                matrix = ReferenceFeatureMatrix.load(directory, generation)
+            except OSError as e:
+                logger.warning(f"⚠️  No se pudo persistir la matriz de referencia: {str(e)}")
+            if matrix is None:
+                # Otro proceso borró o reescribió los ficheros entretanto: usar la copia en memoria
+                matrix = built
+        
+        self._matrix, self._matrix_generation = matrix, generation
+        return self._matrix
+    
+    def get_window_matrix(self, segment_seconds: float) -> ReferenceWindowMatrix:
+        """
+        Segmentos de las referencias apilados para el reconocimiento por ventanas
+        
+        Los tracks sin segmentos guardados (fingerprint anterior a las
+        ventanas) quedan en .fallback_tracks y se comparan con el vector global.
+        """
+        with self._lock:
+            return self._windows_for(self.shared_generation(), segment_seconds)
+    
+    def _windows_for(self, generation: int, segment_seconds: float) -> ReferenceWindowMatrix:
+        if self._windows is not None and self._windows_generation == generation:
+            return self._windows
+        
+        self._ensure_loaded(generation)
+        n_columns = sum(dim for key, dim in SimpleFingerprint.SEGMENT_COLUMNS)
+        tracks, segments, fallback_tracks = [], [], []
+        for entry in self._tracks.values():
+            stored = load_track_windows(entry['id'])
+            if stored is not None and stored[0].shape[1] == n_columns \
+                    and ReferenceFeatureMatrix.fits(entry['fingerprint_features']):
+                tracks.append(entry)
+                segments.append(stored)
+            else:
+                fallback_tracks.append(entry)
+        
+        windows = ReferenceWindowMatrix(tracks, segments, segment_seconds, fallback_tracks=fallback_tracks)
+        self._windows, self._windows_generation = windows, generation
+        
+        logger.info(f"📊 Ventanas de referencia cargadas: {len(tracks)} tracks, {len(windows.positions)} segmentos")
+        return windows
+    
+    def get_ann_index(self):
+        """
+        Índice aproximado (IVF) de los tracks del catálogo
+        
+        Se entrena en el primer uso y tras cada recarga completa; los cambios
+        locales se aplican como inserciones/borrados incrementales.
+        """
+        with self._lock:
+            return self._ann_index_for(self.shared_generation())
+    
+    def _ann_index_for(self, generation: int):
+        from .dejavu_service import audio_recognition_service
+        
+        self._ensure_loaded(generation)
+        if self._ann_index is None or self._ann_index.needs_retrain():
+            self._ann_index = audio_recognition_service.build_ann_index(list(self._tracks.values()))
+        return self._ann_index
+    
+    def snapshot(self, engine: str, segment_seconds: float) -> Dict:
+        """
+        Todo lo que necesita un reconocimiento, tomado de una misma generación
+        
+        Una sola lectura de la generación y un solo bloqueo: los tracks, la
+        matriz, el índice y las ventanas devueltos corresponden al mismo
+        estado del catálogo aunque otro proceso lo modifique entretanto.
+        
+        Args:
+            engine (str): Motor de reconocimiento (decide qué estructuras se preparan)
+            segment_seconds (float): Duración de segmento para el modo 'window'
+            
+        Returns:
+            Dict: generation, reference_tracks, feature_matrix, ann_index y window_matrix
+                (None los que el motor no usa)
+        """
+        with self._lock:
+            generation = self.shared_generation()
+            feature_matrix = ann_index = window_matrix = None
+            
+            if engine == 'matrix':
+                # Solo la matriz compartida mapeada en memoria
+                feature_matrix = self._matrix_for(generation)
+                reference_tracks = feature_matrix.tracks + feature_matrix.fallback_tracks
+            else:
+                self._ensure_loaded(generation)
+                reference_tracks = list(self._tracks.values())
+                if engine == 'ann':
+                    ann_index = self._ann_index_for(generation)
+                elif engine == 'window':
+                    window_matrix = self._windows_for(generation, segment_seconds)
+            
+            return {
+                'generation': generation,
+                'reference_tracks': reference_tracks,
+                'feature_matrix': feature_matrix,
+                'ann_index': ann_index,
+                'window_matrix': window_matrix,
+            }
+    
+    def _update_ann_index(self, track_id: int, entry: Optional[Dict]):
+        if self._ann_index is None:
+            return
+        self._ann_index.fallback_ids.discard(track_id)
+        if entry and ReferenceFeatureMatrix.fits(entry['fingerprint_features']):
+            self._ann_index.add(ReferenceFeatureMatrix.row_vector(entry['fingerprint_features'])[None, :], [track_id])
+        else:
+            self._ann_index.remove([track_id])
+            if entry:
+                self._ann_index.fallback_ids.add(track_id)
+    
+    def _bump_generation(self):
+        """
+        Incrementa la generación compartida tras un cambio local
+        """
+        from .models import ReferenceCatalogState
+        
+        # UPDATE ... SET generation = generation + 1: atómico entre procesos
+        with transaction.atomic():
+            state = ReferenceCatalogState.objects.filter(pk=CATALOG_STATE_ID)
+            if not state.update(generation=F('generation') + 1):
+                ReferenceCatalogState.objects.get_or_create(pk=CATALOG_STATE_ID)
+                state.update(generation=F('generation') + 1)
+            new_generation = state.values_list('generation', flat=True).get()
+        
+        # Si nadie más cambió el catálogo, esta copia sigue sincronizada
+        if self._synced_generation is not None and new_generation == self._synced_generation + 1:
+            self._synced_generation = new_generation
+        else:
+            self._synced_generation = None
+        self.local_generation += 1
+    
+    def refresh_track(self, track_id: int):
+        """
+        Recarga un único track (alta, modificación o baja del catálogo)
+        """
+        from .models import Track
+        
+        with self._lock:
+            track = Track.objects.filter(id=track_id).select_related('artist', 'analysis').first()
+            entry = self.build_entry(track) if track else None
+            
+            # La copia local (al día) ya tiene esta entrada o su ausencia: nada que publicar
+            if not self.is_stale() and self._tracks.get(track_id) == entry:
+                return
+            
+            if self._tracks is not None:
+                if entry:
+                    self._tracks[track_id] = entry
+                else:
+                    self._tracks.pop(track_id, None)
+            self._update_ann_index(track_id, entry)
+            
+            self._bump_generation()
+    
+    def remove_track(self, track_id: int):
+        """
+        Elimina un track del catálogo
+        """
+        with self._lock:
+            # Ya no estaba en la copia local al día (p.ej. lo quitó el borrado de su Analysis)
+            if not self.is_stale() and track_id not in self._tracks:
+                return
+            
+            if self._tracks is not None:
+                self._tracks.pop(track_id, None)
+            self._update_ann_index(track_id, None)
+            self._bump_generation()
+    
+    def clear(self):
+        """
+        Descarta la copia local; se recargará en el próximo acceso
+        """
+        with self._lock:
+            self._tracks = None
+            self._matrix = None
+            self._ann_index = None
+            self._windows = None
+            self._synced_generation = None
+
+
+# Instancia global del catálogo (una por proceso)
+reference_catalog = ReferenceCatalog()
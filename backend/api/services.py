@@ -1,6 +1,7 @@
 import librosa
 import numpy as np
 from typing import Dict, Any
+from .audio_decode import load_audio
 
 def analyze_music_file(file_path: str) -> Dict[str, Any]:
     """
@@ -14,7 +15,7 @@ def analyze_music_file(file_path: str) -> Dict[str, Any]:
     """
     try:
         # Load the audio file
-        y, sr = librosa.load(file_path)
+        y, sr = load_audio(file_path)
         
         # Get duration
         duration = librosa.get_duration(y=y, sr=sr)
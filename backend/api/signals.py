@@ -0,0 +1,84 @@
+"""
+Señales que mantienen actualizado el catálogo de referencia y publican el
+estado de los reconocimientos
+"""
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Track, Analysis, Recognition
+from .reference_catalog import reference_catalog
+from .window_index import delete_track_windows
+from .status_events import publish_status
+
+# Campos de los que depende la entrada de un track en el catálogo de referencia
+CATALOG_TRACK_FIELDS = ('fingerprint_status', 'is_reference_track', 'title', 'artist_id')
+# Valor de un campo diferido (no cargado) en el estado guardado
+DEFERRED = object()
+
+
+def catalog_state(instance):
+    """
+    Valores de un Track/Analysis que determinan su entrada en el catálogo
+
+    Se leen de __dict__ para no disparar consultas con campos diferidos
+    (un campo ausente cuenta como cambio).
+    """
+    if isinstance(instance, Track):
+        return tuple(instance.__dict__.get(field, DEFERRED) for field in CATALOG_TRACK_FIELDS)
+    # Analysis: el hash del fingerprint cambia con cualquier cambio de características
+    result = instance.__dict__.get('fingerprint_result')
+    return result.get('fingerprint_hash') if isinstance(result, dict) else result
+
+
+def in_catalog(state) -> bool:
+    """
+    Indica si un estado de Track corresponde a una referencia del catálogo
+    """
+    return state[0] == 'completed' and state[1] is True
+
+
+@receiver(post_init, sender=Track)
+@receiver(post_init, sender=Analysis)
+def remember_catalog_state(sender, instance, **kwargs):
+    instance._catalog_state = catalog_state(instance)
+
+
+@receiver(post_save, sender=Track)
+@receiver(post_save, sender=Analysis)
+def refresh_reference_track(sender, instance, created, **kwargs):
+    # Solo los guardados que pueden cambiar el catálogo incrementan la
+    # generación compartida: fingerprint_track guarda el track varias veces
+    # (estado processing, contadores...) y cada incremento obliga a todos los
+    # procesos a recargar
+    previous, current = instance._catalog_state, catalog_state(instance)
+    instance._catalog_state = current
+    if sender is Track:
+        if not (created or current != previous) or not (in_catalog(previous) or in_catalog(current)):
+            return
+        track_id = instance.id
+    else:
+        if current == previous and not (created and current is not None):
+            return
+        track_id = instance.track_id
+    transaction.on_commit(lambda: reference_catalog.refresh_track(track_id))
+
+
+@receiver(post_delete, sender=Track)
+@receiver(post_delete, sender=Analysis)
+def remove_reference_track(sender, instance, **kwargs):
+    # Capturar el id ahora: Django lo pone a None al terminar el delete
+    if sender is Track:
+        track_id = instance.id
+        if in_catalog(instance._catalog_state):
+            transaction.on_commit(lambda: reference_catalog.remove_track(track_id))
+        transaction.on_commit(lambda: delete_track_windows(track_id))
+    elif instance._catalog_state is not None:
+        track_id = instance.track_id
+        transaction.on_commit(lambda: reference_catalog.refresh_track(track_id))
+
+
+@receiver(post_save, sender=Recognition)
+def publish_recognition_status(sender, instance, **kwargs):
+    # Las tareas de reconocimiento guardan cada transición: avisar al canal SSE
+    file_id, status, recognition_id = instance.uploaded_file_id, instance.recognition_status, instance.id
+    transaction.on_commit(lambda: publish_status(file_id, status, recognition_id=recognition_id))
@@ -0,0 +1,139 @@
+"""
+Endpoint de server-sent events para el estado de reconocimiento
+
+GET /api/recognition-events/<file_id>/?token=<access JWT>
+
+Alternativa a consultar recognition_status/<file_id>/ en bucle: una sola
+conexión que recibe un evento 'status' con cada transición (processing,
+found, not_found, error) y se cierra al llegar a un estado final. EventSource
+no permite cabeceras, así que el JWT se acepta también como parámetro token.
+
+Es una aplicación ASGI pura (se monta en backend/asgi.py): cada conexión
+abierta es una corrutina, no un worker ocupado.
+"""
+import re
+import json
+import asyncio
+import logging
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .status_events import status_events
+
+logger = logging.getLogger(__name__)
+
+PATH_PATTERN = re.compile(r'^/api/recognition-events/(?P<file_id>\d+)/?$')
+
+
+def match_path(path: str):
+    """
+    file_id si la ruta es la del endpoint SSE, None en otro caso
+    """
+    match = PATH_PATTERN.match(path)
+    return int(match.group('file_id')) if match else None
+
+
+def authenticate(scope) -> int:
+    """
+    ID de usuario del access token (cabecera Authorization o parámetro token)
+
+    Raises:
+        PermissionError: Token ausente o inválido
+    """
+    from rest_framework_simplejwt.tokens import AccessToken
+    from rest_framework_simplejwt.exceptions import TokenError
+
+    token = None
+    for name, value in scope.get('headers', []):
+        if name == b'authorization' and value.lower().startswith(b'bearer '):
+            token = value[7:].decode()
+    if token is None:
+        token = (parse_qs(scope.get('query_string', b'').decode()).get('token') or [None])[0]
+    if not token:
+        raise PermissionError('Authentication credentials were not provided.')
+
+    try:
+        access = AccessToken(token)
+    except TokenError as e:
+        raise PermissionError(str(e))
+    return access[settings.SIMPLE_JWT.get('USER_ID_CLAIM', 'user_id')]
+
+
+def user_owns_file(user_id: int, file_id: int) -> bool:
+    from .models import UploadedFile
+
+    return UploadedFile.objects.filter(id=file_id, uploaded_by_id=user_id).exists()
+
+
+def cors_headers():
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        return [(b'access-control-allow-origin', b'*')]
+    return []
+
+
+async def send_json_error(send, status: int, message: str):
+    body = json.dumps({'error': message}).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')] + cors_headers(),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def recognition_events_app(scope, receive, send):
+    """
+    Aplicación ASGI del stream de estado de un archivo
+    """
+    file_id = match_path(scope['path'])
+
+    if scope['method'] != 'GET':
+        await send_json_error(send, 405, 'Method not allowed')
+        return
+
+    try:
+        user_id = await sync_to_async(authenticate, thread_sensitive=False)(scope)
+    except PermissionError as e:
+        await send_json_error(send, 401, str(e))
+        return
+
+    if not await sync_to_async(user_owns_file)(user_id, file_id):
+        await send_json_error(send, 404, 'File not found')
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            # Sin buffering en nginx/proxies
+            (b'x-accel-buffering', b'no'),
+        ] + cors_headers(),
+    })
+
+    async def stream():
+        async for event in status_events(file_id):
+            if event is None:
+                chunk = b': keep-alive\n\n'
+            else:
+                chunk = f"event: status\ndata: {json.dumps(event)}\n\n".encode()
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    # Terminar en cuanto llegue un estado final o el cliente se desconecte
+    stream_task = asyncio.ensure_future(stream())
+    disconnect_task = asyncio.ensure_future(wait_disconnect())
+    done, pending = await asyncio.wait(
+        [stream_task, disconnect_task], return_when=asyncio.FIRST_COMPLETED
+    )
+    for task in pending:
+        task.cancel()
+
+    if stream_task in done:
+        if stream_task.exception() is not None:
+            logger.error(f"❌ Error en el stream de estado del archivo {file_id}: {stream_task.exception()}")
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
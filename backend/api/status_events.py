@@ -0,0 +1,155 @@
+"""
+Transiciones de estado de reconocimiento para el canal SSE
+
+Cada vez que se guarda un Recognition (desde las tareas de reconocimiento)
+su estado se publica en el canal recognition_status:<file_id> de Redis. El
+endpoint SSE (api/sse.py) se suscribe al canal del archivo y reenvía las
+transiciones al navegador hasta llegar a un estado final.
+
+Sin Redis (desarrollo sin broker, con las tareas en modo eager) no se publica
+nada: el endpoint consulta el estado en la base de datos cada
+RECOGNITION_EVENTS_POLL_INTERVAL segundos dentro del servidor, con una
+consulta ligera, en lugar de que cada cliente repita peticiones completas.
+
+Configuración (settings):
+    RECOGNITION_EVENTS_REDIS_URL: Redis para pub/sub (por defecto
+        CELERY_BROKER_URL si es redis://)
+    RECOGNITION_EVENTS_POLL_INTERVAL: intervalo sin Redis (por defecto 1 s)
+    RECOGNITION_EVENTS_HEARTBEAT: comentario keep-alive (por defecto 15 s)
+    RECOGNITION_EVENTS_TIMEOUT: duración máxima de un stream (por defecto 300 s)
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('found', 'not_found', 'error')
+CHANNEL_PREFIX = 'recognition_status'
+
+_lock = threading.Lock()
+_client = None
+_client_pid: Optional[int] = None
+
+
+def redis_url() -> Optional[str]:
+    """
+    URL de Redis para pub/sub o None si no hay Redis configurado
+    """
+    url = getattr(settings, 'RECOGNITION_EVENTS_REDIS_URL', None)
+    if url:
+        return url
+    broker = getattr(settings, 'CELERY_BROKER_URL', None) or ''
+    return broker if broker.startswith(('redis://', 'rediss://')) else None
+
+
+def channel_name(file_id: int) -> str:
+    return f"{CHANNEL_PREFIX}:{file_id}"
+
+
+def get_redis_client():
+    """
+    Cliente Redis síncrono del proceso (se recrea tras un fork)
+    """
+    global _client, _client_pid
+    import redis
+
+    with _lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = redis.Redis.from_url(redis_url())
+            _client_pid = os.getpid()
+        return _client
+
+
+def publish_status(file_id: int, status: str, **data: Any):
+    """
+    Publica una transición (sin Redis no hace nada; los errores solo se registran)
+
+    Args:
+        file_id (int): ID del UploadedFile
+        status (str): processing, found, not_found o error
+        **data: Campos extra del evento (recognition_id...)
+    """
+    if not redis_url():
+        return
+
+    payload = json.dumps({'file_id': file_id, 'status': status, **data}, default=str)
+    try:
+        get_redis_client().publish(channel_name(file_id), payload)
+    except Exception as e:
+        logger.warning(f"⚠️  No se pudo publicar el estado del archivo {file_id}: {str(e)}")
+
+
+def current_status(file_id: int) -> Dict[str, Any]:
+    """
+    Estado actual del reconocimiento más reciente de un archivo (una consulta)
+    """
+    from .models import Recognition
+
+    recognition = Recognition.objects.filter(
+        uploaded_file_id=file_id
+    ).order_by('-created_at').values('id', 'recognition_status').first()
+
+    if recognition is None:
+        return {'file_id': file_id, 'status': 'processing', 'recognition_id': None}
+    return {
+        'file_id': file_id,
+        'status': recognition['recognition_status'],
+        'recognition_id': recognition['id'],
+    }
+
+
+async def status_events(file_id: int) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Transiciones de estado de un archivo hasta un estado final
+
+    Emite el estado actual al empezar y después cada cambio. Los None son
+    latidos (no hubo cambios en RECOGNITION_EVENTS_HEARTBEAT segundos).
+    """
+    from asgiref.sync import sync_to_async
+
+    heartbeat = getattr(settings, 'RECOGNITION_EVENTS_HEARTBEAT', 15)
+    deadline = time.monotonic() + getattr(settings, 'RECOGNITION_EVENTS_TIMEOUT', 300)
+    read_status = sync_to_async(current_status, thread_sensitive=False)
+
+    pubsub = None
+    if redis_url():
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(redis_url())
+        pubsub = client.pubsub()
+        # Suscribirse antes de leer el estado: no se pierde ninguna transición
+        await pubsub.subscribe(channel_name(file_id))
+
+    try:
+        last = await read_status(file_id)
+        yield last
+        last_beat = time.monotonic()
+
+        while last['status'] not in TERMINAL_STATUSES and time.monotonic() < deadline:
+            event = None
+            if pubsub is not None:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    event = json.loads(message['data'])
+            else:
+                await asyncio.sleep(getattr(settings, 'RECOGNITION_EVENTS_POLL_INTERVAL', 1))
+                event = await read_status(file_id)
+
+            if event is not None and event['status'] != last['status']:
+                last = event
+                last_beat = time.monotonic()
+                yield event
+            elif time.monotonic() - last_beat >= heartbeat:
+                last_beat = time.monotonic()
+                yield None
+    finally:
+        if pubsub is not None:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
@@ -2,12 +2,15 @@
 Tareas de Celery para fingerprinting y reconocimiento de audio usando nuestro servicio personalizado
 """
 from celery import shared_task
+from celery.exceptions import Retry
 from .models import Track, Analysis, Genre, Mood, UploadedFile, Recognition
-import os
+from .dejavu_service import audio_recognition_service
+from .hash_index import store_track_hashes
+from .window_index import store_track_windows
+from .audio_decode import AudioIngestContext
+from .reference_catalog import reference_catalog
 import time
 import logging
-from pydub import AudioSegment
-from pydub.utils import mediainfo
 from django.db import transaction
 import json
 
@@ -34,10 +37,16 @@ def fingerprint_track(track_id):
             track.dejavu_song_id = f"track_{track.id}_{track.title.replace(' ', '_').replace('/', '_')}"
             track.save()
 
+        # Decodificar una sola vez: el PCM (o, en pistas largas, una lectura por
+        # bloques) y los metadatos del contenedor se comparten entre el
+        # fingerprint y el análisis básico
+        context = AudioIngestContext.from_file(track.file.path)
+
         # Realizar fingerprinting con nuestro servicio
         result = audio_recognition_service.create_fingerprint(
             track.file.path, 
-            track.dejavu_song_id
+            track.dejavu_song_id,
+            context=context
         )
 
         if result['success']:
@@ -49,11 +58,18 @@ def fingerprint_track(track_id):
             analysis, created = Analysis.objects.get_or_create(track=track)
             analysis.fingerprint_result = {
                 'fingerprint_hash': result['fingerprint_hash'],
-                'features': result['features']
+                'features': result['features'],
+                'landmark_count': result['landmark_count']
             }
             
-            # Realizar análisis básico con pydub
-            basic_analysis = analyze_audio_file(track.file.path)
+            # Guardar hashes de landmarks en el índice invertido (COPY / bulk_create)
+            store_track_hashes(track.id, result['landmark_hashes'], result['landmark_offsets'])
+            
+            # Guardar sumas por segmento para el reconocimiento por ventanas
+            store_track_windows(track.id, result['segment_sums'], result['segment_counts'])
+            
+            # Realizar análisis básico sobre el mismo audio decodificado
+            basic_analysis = analyze_audio_file(track.file.path, context=context)
             if basic_analysis:
                 # Actualizar campos del track
                 track.duration = basic_analysis.get('duration_seconds')
@@ -61,7 +77,7 @@ def fingerprint_track(track_id):
                 track.channels = basic_analysis.get('channels')
                 track.bitrate = basic_analysis.get('bitrate')
                 
-                # Actualizar análisis con datos de pydub
+                # Actualizar análisis con datos del análisis básico
                 analysis.duration_ms = basic_analysis.get('duration_ms')
                 analysis.frame_rate = basic_analysis.get('sample_rate')
                 analysis.channels_count = basic_analysis.get('channels')
@@ -76,8 +92,8 @@ def fingerprint_track(track_id):
             analysis.save()
             track.save()
             
-            # Contar fingerprints (simulado)
-            fingerprints_count = len(result['features']['mfcc_mean']) * 10  # Estimación
+            # Contar fingerprints (hashes de landmarks generados)
+            fingerprints_count = result.get('landmark_count', 0)
             track.fingerprints_count = fingerprints_count
             track.save()
             
@@ -120,12 +136,13 @@ def fingerprint_track(track_id):
 
 
 @shared_task
-def recognize_audio_file(uploaded_file_id):
+def recognize_audio_file(uploaded_file_id, engine='summary'):
     """
     Reconoce un archivo de audio subido usando nuestro servicio personalizado
     
     Args:
         uploaded_file_id (int): ID del archivo subido
+        engine (str): Motor de reconocimiento ('summary', 'matrix', 'ann', 'window' o 'landmark')
     
     Returns:
         dict: Resultado del reconocimiento
@@ -143,40 +160,11 @@ def recognize_audio_file(uploaded_file_id):
             recognition_status='processing'
         )
 
-        # Obtener tracks de referencia con sus fingerprints
-        reference_tracks = []
-        completed_tracks = Track.objects.filter(
-            fingerprint_status='completed',
-            is_reference_track=True
-        ).select_related('artist', 'genre', 'mood', 'analysis')
-        
-        logger.info(f"🎵 Cargando tracks de referencia desde BD...")
-        logger.info(f"📊 Tracks con fingerprint completado encontrados: {completed_tracks.count()}")
-        
-        for track in completed_tracks:
-            if hasattr(track, 'analysis') and track.analysis.fingerprint_result:
-                fingerprint_features = track.analysis.fingerprint_result.get('features', {})
-                
-                # Validar que las características estén completas
-                required_keys = ['mfcc_mean', 'chroma_mean', 'contrast_mean', 'tempo', 'spectral_centroid_mean']
-                missing_keys = [key for key in required_keys if key not in fingerprint_features]
-                
-                if missing_keys:
-                    logger.warning(f"⚠️  Track {track.id} - {track.title}: faltan características {missing_keys}")
-                    continue
-                
-                reference_tracks.append({
-                    'id': track.id,
-                    'title': track.title,
-                    'artist': track.artist.name,
-                    'fingerprint_features': fingerprint_features
-                })
-                
-                logger.info(f"✅ Track {track.id} añadido: {track.title} - {track.artist.name}")
-                logger.info(f"   Tempo: {fingerprint_features.get('tempo', 'N/A'):.2f} BPM")
-                logger.info(f"   Centroide: {fingerprint_features.get('spectral_centroid_mean', 'N/A'):.2f} Hz")
-            else:
-                logger.warning(f"⚠️  Track {track.id} - {track.title}: sin análisis o fingerprint_result")
+        # Obtener tracks de referencia con sus fingerprints (catálogo del proceso).
+        # Tracks, matriz, índice y ventanas salen de una única instantánea, así
+        # corresponden a la misma generación del catálogo.
+        catalog = reference_catalog.snapshot(engine, audio_recognition_service.fingerprint.segment_seconds)
+        reference_tracks = catalog['reference_tracks']
         
         logger.info(f"📊 Total de tracks de referencia válidos: {len(reference_tracks)}")
 
@@ -202,7 +190,11 @@ def recognize_audio_file(uploaded_file_id):
         # Realizar reconocimiento
         result = audio_recognition_service.recognize_audio(
             uploaded_file.file.path, 
-            reference_tracks
+            reference_tracks,
+            engine=engine,
+            feature_matrix=catalog['feature_matrix'],
+            ann_index=catalog['ann_index'],
+            window_matrix=catalog['window_matrix']
         )
         
         processing_time = time.time() - start_time
@@ -216,8 +208,11 @@ def recognize_audio_file(uploaded_file_id):
                 # Actualizar reconocimiento con resultado exitoso
                 recognition.recognized_track = recognized_track
                 recognition.confidence = result.get('confidence', 0)
-                recognition.offset_seconds = 0  # No calculamos offset en esta implementación
-                recognition.fingerprinted_confidence = int(result.get('similarity', 0) * 100)
+                recognition.offset_seconds = result.get('offset_seconds', 0)
+                if 'aligned_matches' in result:
+                    recognition.fingerprinted_confidence = result['aligned_matches']
+                else:
+                    recognition.fingerprinted_confidence = int(result.get('similarity', 0) * 100)
                 recognition.recognition_status = 'found'
                 recognition.dejavu_result = result
                 recognition.save()
@@ -303,6 +298,128 @@ def recognize_audio_file(uploaded_file_id):
         return {'success': False, 'error': str(e)}
 
 
+@shared_task(bind=True, max_retries=2)
+def recognize_upload_external(self, uploaded_file_id, recognition_id=None):
+    """
+    Reconoce con AudD un archivo subido desde FileUploadView
+    
+    La vista guarda el archivo, crea el Recognition en 'processing' y responde
+    202; esta tarea hace la llamada externa y deja el resultado en el
+    Recognition (recognition_status lo lee desde ahí).
+    
+    Args:
+        uploaded_file_id (int): ID del archivo subido
+        recognition_id (int): Recognition creado por la vista (si no, se crea uno)
+    
+    Returns:
+        dict: Resultado del reconocimiento
+    """
+    from .audd_service import get_audd_service
+    from .views import find_matching_tracks
+    
+    start_time = time.time()
+    
+    try:
+        uploaded_file = UploadedFile.objects.select_related('uploaded_by').get(id=uploaded_file_id)
+        if recognition_id is not None:
+            recognition = Recognition.objects.get(id=recognition_id)
+        else:
+            recognition = Recognition.objects.create(
+                uploaded_file=uploaded_file,
+                recognition_status='processing'
+            )
+        
+        audd_result = get_audd_service().recognize_file(
+            uploaded_file.file.path, content_hash=uploaded_file.content_hash
+        )
+        
+        # Límite de ritmo propio: reintentar cuando se recargue el bucket
+        if audd_result.get('rate_limited') and not self.request.is_eager and self.request.retries < self.max_retries:
+            raise self.retry(countdown=max(audd_result.get('retry_after', 5), 1))
+        
+        processing_time = time.time() - start_time
+        recognition.processing_time = processing_time
+        
+        if audd_result['success'] and audd_result.get('recognized'):
+            external_info = audd_result['track_info']
+            
+            possible_tracks = find_matching_tracks(
+                title=external_info['title'],
+                artist=external_info['artist'],
+                user=uploaded_file.uploaded_by,
+                spotify_id=(external_info.get('spotify') or {}).get('id')
+            )
+            
+            recognition.confidence = 0.95  # Alta confianza con AudD
+            recognition.recognition_status = 'found'
+            if possible_tracks:
+                # Existe en la BD del usuario - usar el track existente
+                recognition.recognized_track = possible_tracks[0]
+                recognition.dejavu_result = {
+                    'audd_result': audd_result,
+                    'matched_with_existing': True,
+                    'existing_track_id': possible_tracks[0].id
+                }
+                logger.info(f"✅ AudD: {external_info['title']} (track {possible_tracks[0].id} en BD)")
+            else:
+                # No existe en la BD - solo información de AudD
+                recognition.recognized_track = None
+                recognition.dejavu_result = {
+                    'audd_result': audd_result,
+                    'track_not_in_db': True,
+                    'external_only': True
+                }
+                logger.info(f"✅ AudD: {external_info['title']} (no está en la BD del usuario)")
+        
+        elif audd_result.get('quota_exceeded'):
+            recognition.recognition_status = 'error'
+            recognition.recognition_error = f"Límite de API: {audd_result.get('message', 'Cuota diaria agotada')}"
+            recognition.dejavu_result = {'audd_result': audd_result}
+        
+        elif audd_result['success']:
+            recognition.recognition_status = 'not_found'
+            recognition.recognition_error = audd_result.get('message', 'Canción no encontrada en AudD')
+            recognition.dejavu_result = {'audd_result': audd_result}
+        
+        else:
+            recognition.recognition_status = 'error'
+            recognition.recognition_error = f"Error AudD: {audd_result.get('error', 'Error desconocido')}"
+            recognition.dejavu_result = {'audd_result': audd_result}
+        
+        recognition.save()
+        
+        uploaded_file.processing_status = 'error' if recognition.recognition_status == 'error' else 'completed'
+        uploaded_file.save(update_fields=['processing_status'])
+        
+        return {
+            'success': recognition.recognition_status == 'found',
+            'status': recognition.recognition_status,
+            'recognition_id': recognition.id,
+            'processing_time': processing_time
+        }
+    
+    except Retry:
+        raise
+    except (UploadedFile.DoesNotExist, Recognition.DoesNotExist):
+        logger.error(f"UploadedFile {uploaded_file_id} o su reconocimiento no existen")
+        return {'success': False, 'error': 'Archivo no encontrado'}
+    except Exception as e:
+        logger.error(f"❌ Error reconociendo con AudD el archivo {uploaded_file_id}: {str(e)}")
+        
+        try:
+            if 'recognition' in locals():
+                recognition.recognition_status = 'error'
+                recognition.recognition_error = f'Error AudD: {str(e)}'
+                recognition.processing_time = time.time() - start_time
+                recognition.save()
+            
+            UploadedFile.objects.filter(id=uploaded_file_id).update(processing_status='error')
+        except Exception:
+            pass
+        
+        return {'success': False, 'error': str(e)}
+
+
 @shared_task 
 def batch_fingerprint_tracks(track_ids):
     """
@@ -356,49 +473,40 @@ def cleanup_orphaned_fingerprints():
         return {'success': False, 'error': str(e)}
 
 
-def analyze_audio_file(file_path):
+def analyze_audio_file(file_path, context=None):
     """
-    Analiza un archivo de audio usando pydub
+    Analiza un archivo de audio (duración, formato, picos, RMS y silencio)
     
     Args:
         file_path (str): Ruta al archivo de audio
+        context (AudioIngestContext): Audio ya decodificado; si no se pasa, se
+            decodifica aquí
     
     Returns:
         dict: Información del archivo
     """
     try:
-        # Cargar archivo con pydub
-        audio = AudioSegment.from_file(file_path)
-        
-        # Obtener información básica
-        info = mediainfo(file_path)
-        
-        # Calcular métricas básicas
-        max_amplitude = audio.max
-        rms = audio.rms
-        
-        # Detectar clipping (simplificado)
-        clipping_detected = max_amplitude >= 32767 * 0.99  # Para 16-bit
+        if context is None:
+            context = AudioIngestContext.from_file(file_path)
         
-        # Calcular porcentaje de silencio (simplificado)
-        silence_threshold = -50  # dB
-        silence_segments = audio.split_on_silence(min_silence_len=100, silence_thresh=silence_threshold)
-        total_silence = len(audio) - sum(len(segment) for segment in silence_segments)
-        silence_percentage = (total_silence / len(audio)) * 100 if len(audio) > 0 else 0
+        # Picos, clipping, RMS y porcentaje de silencio (umbral -50 dBFS,
+        # silencios de al menos 100 ms) en una pasada vectorizada; con el PCM
+        # ya liberado o leído por bloques se usa lo acumulado por el contexto
+        quality = context.quality_metrics(min_silence_len=100, silence_thresh=-50)
         
         return {
-            'duration_ms': len(audio),
-            'duration_seconds': len(audio) / 1000.0,
-            'sample_rate': audio.frame_rate,
-            'channels': audio.channels,
-            'frame_width': audio.frame_width,
-            'max_amplitude': float(max_amplitude),
-            'rms_amplitude': float(rms),
-            'format': info.get('format_name', '').upper(),
-            'bitrate': int(info.get('bit_rate', 0)) if info.get('bit_rate') else None,
-            'file_size': os.path.getsize(file_path),
-            'clipping_detected': clipping_detected,
-            'silence_percentage': silence_percentage
+            'duration_ms': quality['duration_ms'],
+            'duration_seconds': quality['duration_ms'] / 1000.0,
+            'sample_rate': context.sample_rate,
+            'channels': context.channels,
+            'frame_width': context.frame_width,
+            'max_amplitude': quality['max_amplitude'],
+            'rms_amplitude': quality['rms_amplitude'],
+            'format': context.format_name.upper(),
+            'bitrate': context.bit_rate,
+            'file_size': context.file_size,
+            'clipping_detected': quality['clipping_detected'],
+            'silence_percentage': quality['silence_percentage']
         }
         
     except Exception as e:
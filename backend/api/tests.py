@@ -1,3 +1,1226 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import librosa
+import numpy as np
+import soundfile as sf
+from asgiref.sync import async_to_sync, sync_to_async
+from celery.exceptions import Retry
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache.backends.db import DatabaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from urllib3.exceptions import NewConnectionError, ReadTimeoutError
+
+from .audd_service import AudDService
+from .audio_decode import AudioIngestContext, decode_with_ffmpeg, load_audio, pcm_from_buffer
+from .audio_quality import analyze_quality
+from .checks import check_shared_caches
+from .dejavu_service import AudioRecognitionService, ReferenceFeatureMatrix, ReferenceWindowMatrix, ScalarBoundIndex
+from .feature_cache import feature_cache
+from .hash_index import lookup_hashes, store_track_hashes
+from .hedged_recognition import HedgedRecognizer
+from .http_session import RequestCancelled, StreamingMultipart, build_session
+from .models import Analysis, Artist, ExternalApiQuota, Genre, Mood, Recognition, ReferenceCatalogState, Track, UploadedFile
+from .quota import QuotaLimiter, quota_limiter
+from .recognition_cache import RecognitionResultCache, recognition_cache
+from .recognition_snippet import FALLBACK_SAMPLE_RATE, _cached_snippet, extract_snippet, select_window
+from .reference_catalog import ReferenceCatalog, reference_catalog
+from .sse import recognition_events_app
+from .tasks import recognize_audio_file, recognize_upload_external
+from .window_index import load_track_windows, store_track_windows
+
+
+def make_track(user, title='Track', **fields):
+    artist, _ = Artist.objects.get_or_create(name='Artista', user=user)
+    return Track.objects.create(title=title, artist=artist, file=f'tracks/{title}.mp3', **fields)
+
+
+class HashIndexTests(TestCase):
+    """
+    Índice invertido de hashes (hash_index)
+    """
+
+    def setUp(self):
+        user = User.objects.create_user('indexer', password='x')
+        self.first = make_track(user, 'first')
+        self.second = make_track(user, 'second')
+        # Más hashes que el límite de parámetros de SQLite (999)
+        self.hashes = np.arange(1500, dtype=np.int64)
+        store_track_hashes(self.first.id, self.hashes, np.arange(1500))
+        store_track_hashes(self.second.id, self.hashes[::3], np.arange(500))
+
+    def test_lookup_is_chunked_below_parameter_limit(self):
+        hashes, tracks, offsets = lookup_hashes(self.hashes)
+        self.assertEqual(len(hashes), 2000)
+        self.assertEqual(int((tracks == self.first.id).sum()), 1500)
+
+    def test_lookup_filters_tracks_in_query(self):
+        hashes, tracks, offsets = lookup_hashes(self.hashes, track_ids=[self.second.id])
+        self.assertEqual(len(hashes), 500)
+        self.assertTrue(np.all(tracks == self.second.id))
+        np.testing.assert_array_equal(np.sort(hashes), self.hashes[::3])
+
+    def test_lookup_with_no_candidate_tracks(self):
+        hashes, tracks, offsets = lookup_hashes(self.hashes, track_ids=[])
+        self.assertEqual(len(hashes), 0)
+
+
+def synthetic_catalog(n_tracks, seed=0):
+    """
+    Tracks de referencia con características aleatorias en el formato del catálogo
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'id': i + 1,
+            'title': f'Track {i + 1}',
+            'artist': 'Artista',
+            'fingerprint_features': {
+                'mfcc_mean': rng.normal(0, 50, 13).tolist(),
+                'chroma_mean': rng.random(12).tolist(),
+                'contrast_mean': rng.normal(20, 5, 7).tolist(),
+                'tempo': float(rng.uniform(80, 160)),
+                'spectral_centroid_mean': float(rng.uniform(800, 4000)),
+            },
+        }
+        for i in range(n_tracks)
+    ]
+
+
+class ReferenceMatrixTests(SimpleTestCase):
+    """
+    Modo 'matrix' frente a la comparación clásica track a track
+    """
+
+    def setUp(self):
+        self.service = AudioRecognitionService()
+        self.tracks = synthetic_catalog(200)
+        self.matrix = ReferenceFeatureMatrix(self.tracks)
+
+    def test_scores_match_compare_fingerprints(self):
+        for query in synthetic_catalog(5, seed=1) + self.tracks[:3]:
+            features = query['fingerprint_features']
+            expected = [
+                self.service.fingerprint.compare_fingerprints(features, t['fingerprint_features'])
+                for t in self.tracks
+            ]
+            # Producto float32: igualdad hasta la precisión de float32
+            np.testing.assert_allclose(self.matrix.score(features), expected, atol=1e-5)
+
+    def test_ties_resolve_to_first_track(self):
+        # Tracks 1 y 3 idénticos al query: el bucle clásico se queda con el primero
+        duplicate = dict(self.tracks[0], id=999, title='Duplicado')
+        tracks = self.tracks[:2] + [duplicate] + self.tracks[2:]
+        query = self.tracks[0]['fingerprint_features']
+        ranking, best, similarity = self.service.score_reference_matrix(
+            query, ReferenceFeatureMatrix(tracks), top_k=2
+        )
+        self.assertEqual(best['id'], self.tracks[0]['id'])
+        self.assertEqual([r['track_id'] for r in ranking], [self.tracks[0]['id'], 999])
+        self.assertAlmostEqual(similarity, 1.0, places=5)
+
+    def test_prefilter_keeps_the_best_match(self):
+        query = self.tracks[42]['fingerprint_features']
+        ranking, best, similarity = self.service.score_reference_matrix(
+            query, self.matrix, similarity_threshold=0.85
+        )
+        self.assertEqual(best['id'], 43)
+
+    def test_bound_index_on_loaded_matrix(self):
+        directory = tempfile.mkdtemp()
+        self.matrix.save(directory, 1)
+        loaded = ReferenceFeatureMatrix.load(directory, 1)
+        query = self.tracks[42]['fingerprint_features']
+        np.testing.assert_array_equal(
+            loaded.candidate_rows(query, 0.85), self.matrix.candidate_rows(query, 0.85)
+        )
+        self.assertIsInstance(loaded.bound_index, ScalarBoundIndex)
+
+    def test_saved_generations(self):
+        directory = tempfile.mkdtemp()
+        self.matrix.save(directory, 3)
+        newer = ReferenceFeatureMatrix(self.tracks[:10])
+        newer.save(directory, 5)
+        # Un proceso rezagado guarda una generación anterior: no borra la nueva
+        self.matrix.save(directory, 4)
+        self.assertIsNone(ReferenceFeatureMatrix.load(directory, 3))
+        self.assertEqual(len(ReferenceFeatureMatrix.load(directory, 4)), 200)
+        loaded = ReferenceFeatureMatrix.load(directory, 5)
+        self.assertEqual(len(loaded), 10)
+        features = self.tracks[0]['fingerprint_features']
+        np.testing.assert_allclose(loaded.score(features), newer.score(features), atol=1e-6)
+        self.assertFalse([name for name in os.listdir(directory) if name.endswith('.tmp')])
+
+    def test_catalog_falls_back_to_memory_when_files_vanish(self):
+        catalog = ReferenceCatalog()
+        catalog._tracks = {t['id']: t for t in self.tracks}
+        catalog._synced_generation = 7
+        with self.settings(FINGERPRINT_MATRIX_DIR=tempfile.mkdtemp()), \
+                mock.patch.object(ReferenceFeatureMatrix, 'load', return_value=None):
+            matrix = catalog._matrix_for(7)
+        self.assertEqual(len(matrix), 200)
+
+    def test_ann_rerank_is_exact_and_quiet(self):
+        odd = dict(self.tracks[0], id=500, fingerprint_features=dict(
+            self.tracks[0]['fingerprint_features'], mfcc_mean=[1.0] * 20
+        ))
+        tracks = self.tracks + [odd]
+        index = self.service.build_ann_index(tracks)
+        self.assertEqual(index.fallback_ids, {500})
+        query = self.tracks[17]['fingerprint_features']
+        with self.assertLogs('api.dejavu_service', 'INFO') as logs:
+            ranking, best, similarity = self.service.score_ann(query, tracks, index)
+        self.assertEqual(best['id'], 18)
+        self.assertAlmostEqual(similarity, 1.0, places=6)
+        self.assertFalse([line for line in logs.output if 'Comparación de fingerprints' in line])
+
+
+class ReferenceCatalogTests(TestCase):
+    """
+    Generación compartida del catálogo y señales de Track/Analysis
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('catalog', password='x')
+        reference_catalog.clear()
+        self.addCleanup(reference_catalog.clear)
+
+    def make_reference(self, title='ref'):
+        features = synthetic_catalog(1)[0]['fingerprint_features']
+        with self.captureOnCommitCallbacks(execute=True):
+            track = make_track(self.user, title, is_reference_track=True)
+            Analysis.objects.create(track=track, fingerprint_result={'fingerprint_hash': title, 'features': features})
+            track.fingerprint_status = 'completed'
+            track.save()
+        return track
+
+    def test_generation_lives_in_database(self):
+        before = ReferenceCatalog.shared_generation()
+        self.make_reference()
+        self.assertGreater(ReferenceCatalogState.objects.get(pk=1).generation, before)
+        self.assertEqual(ReferenceCatalog.shared_generation(), ReferenceCatalogState.objects.get(pk=1).generation)
+
+    def test_unrelated_saves_do_not_bump_generation(self):
+        track = self.make_reference()
+        reference_catalog.get_tracks()
+        generation = ReferenceCatalog.shared_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            track.fingerprints_count = 42
+            track.save()
+            other = make_track(self.user, 'pending')
+            other.fingerprint_status = 'processing'
+            other.save()
+            analysis = track.analysis
+            analysis.silence_percentage = 3.0
+            analysis.save()
+        self.assertEqual(ReferenceCatalog.shared_generation(), generation)
+
+    def test_catalog_changes_bump_generation(self):
+        track = self.make_reference()
+        generation = ReferenceCatalog.shared_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            track.title = 'renamed'
+            track.save()
+        self.assertEqual(ReferenceCatalog.shared_generation(), generation + 1)
+        self.assertEqual([t['title'] for t in reference_catalog.get_tracks()], ['renamed'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            track.delete()
+        self.assertEqual(ReferenceCatalog.shared_generation(), generation + 2)
+        self.assertEqual(reference_catalog.get_tracks(), [])
+
+    def test_other_process_change_is_seen(self):
+        self.make_reference('first')
+        self.assertEqual(len(reference_catalog.get_tracks()), 1)
+        # Otro proceso añade un track e incrementa la generación en la base de datos
+        other = make_track(self.user, 'second', is_reference_track=True, fingerprint_status='completed')
+        Analysis.objects.create(track=other, fingerprint_result={
+            'fingerprint_hash': 'second', 'features': synthetic_catalog(1)[0]['fingerprint_features']
+        })
+        ReferenceCatalogState.objects.filter(pk=1).update(generation=F('generation') + 1)
+        self.assertEqual(len(reference_catalog.get_tracks()), 2)
+
+    def test_snapshot_uses_one_generation(self):
+        self.make_reference()
+        with self.settings(FINGERPRINT_MATRIX_DIR=tempfile.mkdtemp()):
+            catalog = reference_catalog.snapshot('matrix', 2.5)
+        self.assertEqual(catalog['generation'], ReferenceCatalog.shared_generation())
+        self.assertEqual(len(catalog['feature_matrix']), 1)
+        self.assertEqual(catalog['reference_tracks'][0]['title'], 'ref')
+        self.assertIsNone(catalog['ann_index'])
+
+
+def synthetic_music(seconds, sr=22050, seed=0, tuned=True):
+    """
+    Notas con armónicos, un bajo y ruido, con un hueco casi en silencio a mitad
+
+    Con tuned=False las notas no siguen la afinación temperada y la
+    afinación estimada por el chroma varía de un bloque a otro.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    y = np.zeros_like(t)
+    n_notes = int(seconds * 2)
+    if tuned:
+        notes = 220.0 * 2.0 ** (rng.integers(-12, 24, size=n_notes) / 12)
+    else:
+        notes = rng.uniform(110, 880, size=n_notes)
+    for i, freq in enumerate(notes):
+        start = int(i * 0.5 * sr)
+        end = min(len(t), start + int(0.45 * sr))
+        envelope = np.exp(-4.0 * np.arange(end - start) / sr)
+        y[start:end] += envelope * (np.sin(2 * np.pi * freq * t[start:end]) + 0.5 * np.sin(4 * np.pi * freq * t[start:end]))
+    y += 0.3 * np.sin(2 * np.pi * 55 * t) * (1 + np.sin(2 * np.pi * 0.1 * t))
+    y += 0.02 * rng.standard_normal(len(t))
+    gap = slice(int(seconds * 0.4 * sr), int((seconds * 0.4 + 3) * sr))
+    y[gap] *= 1e-4
+    return (0.8 * y / np.abs(y).max()).astype(np.float32)
+
+
+class StreamingReferenceTests(SimpleTestCase):
+    """
+    Referencia por bloques frente a la señal completa en memoria
+
+    Los frames de la STFT son idénticos; solo cambian el recorte top_db del
+    espectrograma mel (relativo al máximo visto hasta cada bloque) y la
+    afinación del chroma (estimada en el primer bloque), así que las
+    diferencias en MFCC y chroma quedan acotadas y los landmarks coinciden
+    exactamente.
+    """
+
+    def setUp(self):
+        self.service = AudioRecognitionService()
+        self.service.fingerprint.stream_block_samples = 1 << 15  # ~1.5 s: muchos cortes
+
+    def compare(self, y):
+        in_memory = self.service.reference_from_signal(y, self.service.fingerprint.sample_rate)
+        block = self.service.fingerprint.stream_block_samples
+        streamed = self.service.reference_from_blocks(y[i:i + block] for i in range(0, len(y), block))
+        self.assertTrue(in_memory['success'] and streamed['success'])
+        return in_memory, streamed
+
+    def test_landmarks_are_identical(self):
+        in_memory, streamed = self.compare(synthetic_music(30))
+        self.assertGreater(in_memory['landmark_count'], 1000)
+        np.testing.assert_array_equal(streamed['landmark_hashes'], in_memory['landmark_hashes'])
+        np.testing.assert_array_equal(streamed['landmark_offsets'], in_memory['landmark_offsets'])
+
+    def test_summary_difference_is_bounded(self):
+        in_memory, streamed = self.compare(synthetic_music(30))
+        expected, actual = in_memory['features'], streamed['features']
+
+        # Mismos frames: tempo, duración y características sin mel ni chroma coinciden
+        self.assertEqual(actual['tempo'], expected['tempo'])
+        self.assertEqual(actual['duration'], expected['duration'])
+        for key in ('spectral_centroid_mean', 'spectral_rolloff_mean', 'zero_crossing_rate_mean'):
+            self.assertAlmostEqual(actual[key], expected[key], places=6)
+        np.testing.assert_allclose(actual['contrast_mean'], expected['contrast_mean'], rtol=1e-4)
+
+        # Recorte top_db por bloque: MFCC dentro del 1%
+        np.testing.assert_allclose(actual['mfcc_mean'], expected['mfcc_mean'], rtol=1e-2, atol=0.5)
+        np.testing.assert_allclose(actual['chroma_mean'], expected['chroma_mean'], atol=1e-3)
+        similarity = self.service.fingerprint.compare_fingerprints(actual, expected, log_details=False)
+        self.assertGreater(similarity, 0.9999)
+
+        # Segmentos: mismos frames por segmento, sumas dentro del 1%
+        np.testing.assert_array_equal(streamed['segment_counts'], in_memory['segment_counts'])
+        difference = np.abs(streamed['segment_sums'] - in_memory['segment_sums'])
+        self.assertTrue(np.all(difference <= 1e-2 * (np.abs(in_memory['segment_sums']) + 1.0)))
+
+    def test_detuned_chroma_stays_close(self):
+        # La afinación del primer bloque (aquí solo 1.5 s) no es la de la pista completa
+        in_memory, streamed = self.compare(synthetic_music(30, seed=1, tuned=False))
+        np.testing.assert_allclose(
+            streamed['features']['chroma_mean'], in_memory['features']['chroma_mean'], atol=0.05
+        )
+        similarity = self.service.fingerprint.compare_fingerprints(
+            streamed['features'], in_memory['features'], log_details=False
+        )
+        self.assertGreater(similarity, 0.995)
+
+    def test_quiet_intro_mfcc_stays_close(self):
+        # Tramo inicial 40 dB más bajo que el resto: se recorta con un máximo menor
+        y = synthetic_music(30, seed=2)
+        y[:5 * self.service.fingerprint.sample_rate] *= 0.01
+        in_memory, streamed = self.compare(y)
+        np.testing.assert_allclose(
+            streamed['features']['mfcc_mean'], in_memory['features']['mfcc_mean'], rtol=0.15, atol=1.0
+        )
+        similarity = self.service.fingerprint.compare_fingerprints(
+            streamed['features'], in_memory['features'], log_details=False
+        )
+        self.assertGreater(similarity, 0.999)
+        np.testing.assert_array_equal(streamed['landmark_hashes'], in_memory['landmark_hashes'])
+
+
+@override_settings(FEATURE_CACHE_ENABLED=False)
+class CreateFingerprintTests(TestCase):
+    """
+    Ingesta de referencias: las pistas largas se procesan por bloques
+    """
+
+    def setUp(self):
+        self.service = AudioRecognitionService()
+        self.service.fingerprint.stream_block_samples = 1 << 15
+        self.path = os.path.join(tempfile.mkdtemp(), 'reference.wav')
+        sf.write(self.path, synthetic_music(20), self.service.fingerprint.sample_rate, subtype='FLOAT')
+
+    def test_long_file_is_streamed(self):
+        in_memory = self.service.create_fingerprint(self.path, 'short')
+
+        self.service.fingerprint.streaming_min_duration = 10
+        with mock.patch.object(self.service, 'reference_from_signal') as from_signal:
+            streamed = self.service.create_fingerprint(self.path, 'long')
+        from_signal.assert_not_called()
+
+        self.assertTrue(streamed['success'])
+        np.testing.assert_array_equal(streamed['landmark_hashes'], in_memory['landmark_hashes'])
+        self.assertEqual(streamed['features']['tempo'], in_memory['features']['tempo'])
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_long_context_is_decoded_once_in_blocks(self):
+        in_memory = self.service.create_fingerprint(self.path, 'short')
+
+        self.service.fingerprint.streaming_min_duration = 10
+        context = AudioIngestContext.from_file(self.path, max_seconds=10)
+        self.assertFalse(context.in_memory)
+        with mock.patch.object(context, 'blocks', wraps=context.blocks) as blocks:
+            streamed = self.service.create_fingerprint(self.path, 'long', context=context)
+            quality = context.quality_metrics()
+        # El análisis de calidad reutiliza la pasada del fingerprint
+        self.assertEqual(blocks.call_count, 1)
+
+        np.testing.assert_array_equal(streamed['landmark_hashes'], in_memory['landmark_hashes'])
+        pcm, sample_rate = sf.read(self.path, dtype='float32', always_2d=True)
+        expected = analyze_quality(pcm.T, sample_rate, context.sample_width)
+        np.testing.assert_allclose(list(quality.values()), list(expected.values()), rtol=1e-9)
+
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_cache_is_keyed_on_actual_decoding(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(FEATURE_CACHE_ENABLED=True, FEATURE_CACHE_DIR=directory.name), \
+                mock.patch.object(feature_cache, 'set', wraps=feature_cache.set) as store:
+            self.service.create_fingerprint(self.path, 'context', context=AudioIngestContext.from_file(self.path))
+            self.service.create_fingerprint(self.path, 'file')
+            # Mismo audio y misma decodificación: sale de la cache
+            self.service.create_fingerprint(self.path, 'again', context=AudioIngestContext.from_file(self.path))
+
+        decodings = [(call.args[1]['decoder'], call.args[1]['resampler']) for call in store.call_args_list]
+        self.assertEqual(decodings, [('soundfile', 'soxr_hq'), ('librosa', 'soxr_hq')])
+
+
+class DecodeTests(SimpleTestCase):
+    """
+    Capa de decodificación (audio_decode) frente a librosa.load
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'stereo.wav')
+        left = synthetic_music(8, sr=44100)
+        right = synthetic_music(8, sr=44100, seed=1)
+        sf.write(self.path, np.column_stack([left, right]), 44100, subtype='PCM_16')
+        self.expected, _ = librosa.load(self.path, sr=22050, res_type='soxr_hq')
+
+    def test_pcm_from_buffer_deinterleaves_channels(self):
+        buffer = bytearray(np.arange(6, dtype=np.float32).tobytes() + b'\x00\x00')
+        pcm = pcm_from_buffer(buffer, 2)
+        np.testing.assert_array_equal(pcm, [[0, 2, 4], [1, 3, 5]])
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_librosa_backend_matches_librosa_load(self):
+        y, sr = load_audio(self.path, sr=22050)
+        self.assertEqual(sr, 22050)
+        np.testing.assert_array_equal(y, self.expected)
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_ingest_context_signal_matches_librosa_load(self):
+        context = AudioIngestContext.from_file(self.path)
+        self.assertEqual((context.channels, context.sample_rate, context.sample_width), (2, 44100, 2))
+        y, _ = context.signal(22050)
+        self.assertEqual(len(y), len(self.expected))
+        np.testing.assert_allclose(y, self.expected, atol=1e-5)
+
+    def test_ffmpeg_mono_is_the_channel_mean(self):
+        pcm, _ = sf.read(self.path, dtype='float32')
+        log = (
+            "Input #0, wav, from 'stereo.wav':\n"
+            "  Duration: 00:00:08.00, bitrate: 1411 kb/s\n"
+            "  Stream #0:0: Audio: pcm_s16le ([1][0][0][0] / 0x0001), 44100 Hz, stereo, s16, 1411 kb/s\n"
+        )
+        with mock.patch('api.audio_decode.ffmpeg_binary', return_value='ffmpeg'), \
+                mock.patch('api.audio_decode.run_ffmpeg', return_value=(bytearray(pcm.tobytes()), log)) as run:
+            y, _ = decode_with_ffmpeg(self.path, sr=44100)
+
+        # Sin '-ac 1': la mezcla de swresample no es la media de los canales
+        self.assertNotIn('-ac', run.call_args.args[0])
+        np.testing.assert_array_equal(y, pcm.mean(axis=1))
+
+    @skipUnless(shutil.which('ffmpeg'), 'ffmpeg no está instalado')
+    def test_ffmpeg_features_match_librosa(self):
+        fingerprint = AudioRecognitionService().fingerprint
+        y, sr = decode_with_ffmpeg(self.path, sr=22050, quality='hq')
+        self.assertLess(abs(len(y) - len(self.expected)), 64)
+        # Misma mezcla a mono: mismo nivel que librosa
+        self.assertAlmostEqual(np.sqrt(np.mean(y ** 2)), np.sqrt(np.mean(self.expected ** 2)), delta=1e-3)
+
+        decoded = fingerprint.extract_features_from_signal(y, sr)
+        expected = fingerprint.extract_features_from_signal(self.expected, 22050)
+        self.assertGreater(fingerprint.compare_fingerprints(decoded, expected, log_details=False), 0.999)
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_long_file_context_reads_blocks(self):
+        in_memory = AudioIngestContext.from_file(self.path)
+        streamed = AudioIngestContext.from_file(self.path, max_seconds=5)
+        self.assertTrue(in_memory.in_memory)
+        self.assertFalse(streamed.in_memory)
+        self.assertIsNone(streamed.pcm)
+        self.assertEqual((streamed.channels, streamed.sample_rate, streamed.n_frames),
+                         (in_memory.channels, in_memory.sample_rate, in_memory.n_frames))
+
+        y = np.concatenate(list(streamed.signal_blocks(22050, block_frames=1 << 15)))
+        expected, _ = in_memory.signal(22050)
+        self.assertLess(abs(len(y) - len(expected)), 2)
+        n = min(len(y), len(expected))
+        np.testing.assert_allclose(y[:n], expected[:n], atol=1e-3)
+
+        quality = streamed.quality_metrics()
+        np.testing.assert_allclose(list(quality.values()), list(in_memory.quality_metrics().values()), rtol=1e-9)
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_release_pcm_keeps_quality(self):
+        context = AudioIngestContext.from_file(self.path)
+        expected = analyze_quality(context.pcm, context.sample_rate, context.sample_width)
+        y, _ = context.signal(22050)
+
+        context.release_pcm()
+        self.assertIsNone(context.pcm)
+        self.assertIs(context.signal(22050)[0], y)
+        np.testing.assert_allclose(list(context.quality_metrics().values()), list(expected.values()), rtol=1e-9)
+        with self.assertRaises(ValueError):
+            next(context.blocks())
+
+class QualityParityTests(SimpleTestCase):
+    """
+    analyze_quality frente a las métricas de pydub que sustituye
+    """
+
+    def pydub_metrics(self, samples, sample_rate):
+        from pydub import AudioSegment
+        from pydub.silence import split_on_silence
+
+        audio = AudioSegment(data=samples.T.tobytes(), sample_width=2,
+                             frame_rate=sample_rate, channels=samples.shape[0])
+        chunks = split_on_silence(audio, min_silence_len=100, silence_thresh=-50)
+        return audio, (len(audio) - sum(len(chunk) for chunk in chunks)) / len(audio) * 100
+
+    def test_matches_pydub(self):
+        sample_rate = 8000
+        rng = np.random.default_rng(0)
+        left = synthetic_music(6, sr=sample_rate)
+        right = synthetic_music(6, sr=sample_rate, seed=1)
+        samples = np.vstack([left, right])
+        # Silencios de distinta duración y un pico saturado
+        samples[:, sample_rate:sample_rate + 600] = 0
+        samples[:, 3 * sample_rate:int(3.05 * sample_rate)] = 0
+        samples[:, 4 * sample_rate:5 * sample_rate] = 1e-4 * rng.standard_normal((2, sample_rate))
+        samples[0, 100] = 1.0
+        samples = np.round(np.clip(samples, -1, 32767 / 32768) * 32768).astype(np.int16)
+
+        audio, expected_silence = self.pydub_metrics(samples, sample_rate)
+        quality = analyze_quality(samples / 32768.0, sample_rate, sample_width=2)
+
+        self.assertEqual(quality['duration_ms'], len(audio))
+        self.assertEqual(quality['max_amplitude'], audio.max)
+        self.assertAlmostEqual(quality['rms_amplitude'], audio.rms, delta=1)
+        self.assertTrue(quality['clipping_detected'])
+        self.assertGreater(expected_silence, 10)
+        self.assertAlmostEqual(quality['silence_percentage'], expected_silence, delta=0.1)
+
+    def test_silent_audio(self):
+        samples = np.zeros((1, 8000), dtype=np.int16)
+        audio, expected_silence = self.pydub_metrics(samples, 8000)
+        quality = analyze_quality(samples / 32768.0, 8000)
+        self.assertEqual(quality['max_amplitude'], audio.max)
+        self.assertFalse(quality['clipping_detected'])
+        self.assertAlmostEqual(quality['silence_percentage'], expected_silence, delta=0.1)
+
+
+class UploadDedupTests(TestCase):
+    """
+    Deduplicación de subidas por hash del contenido (FileUploadView)
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        media_override = override_settings(MEDIA_ROOT=media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        enqueue = mock.patch('api.views.enqueue_upload_recognition')
+        self.enqueue = enqueue.start()
+        self.addCleanup(enqueue.stop)
+
+        self.user = User.objects.create_user('uploader', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        buffer = io.BytesIO()
+        sf.write(buffer, synthetic_music(1, sr=8000), 8000, format='WAV', subtype='PCM_16')
+        self.data = buffer.getvalue()
+
+    def upload(self, client=None):
+        return (client or self.client).post(
+            reverse('file-upload'),
+            {'file': SimpleUploadedFile('clip.wav', self.data, content_type='audio/wav')},
+            format='multipart'
+        )
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_hash_is_computed_while_streaming(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        upload = UploadedFile.objects.get()
+        self.assertEqual(upload.content_hash, hashlib.sha256(self.data).hexdigest())
+        self.enqueue.assert_called_once()
+
+    def test_recent_duplicate_returns_previous_result(self):
+        first = self.upload()
+        Recognition.objects.filter(pk=first.data['recognition_preview']['recognition_id']).update(
+            recognition_status='not_found'
+        )
+
+        second = self.upload()
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data['recognition_preview']['duplicate'])
+        self.assertEqual(second.data['recognition_preview']['recognition_id'],
+                         first.data['recognition_preview']['recognition_id'])
+        self.assertEqual(UploadedFile.objects.count(), 1)
+        self.enqueue.assert_called_once()
+
+    def test_unfinished_or_expired_recognition_reuses_stored_file(self):
+        self.upload()
+        # El primer reconocimiento sigue en curso: se reconoce otra vez
+        self.assertEqual(self.upload().status_code, 202)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='x'))
+        with override_settings(UPLOAD_DEDUP_WINDOW=0):
+            self.assertEqual(self.upload(other).status_code, 202)
+
+        self.assertEqual(UploadedFile.objects.count(), 3)
+        self.assertEqual(len(set(UploadedFile.objects.values_list('file', flat=True))), 1)
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(self.enqueue.call_count, 3)
+
+
+class RecognitionCacheTests(TestCase):
+    """
+    Cache de resultados de AudD/ACRCloud (recognition_cache)
+    """
+
+    def other_process_cache(self):
+        # Otra conexión a la misma tabla, como la vería otro proceso
+        return DatabaseCache(settings.CACHES['recognition']['LOCATION'], {})
+
+    def test_results_are_shared_between_processes(self):
+        content_hash = RecognitionResultCache.digest_bytes(b'audio')
+        result = {'success': True, 'recognized': True, 'track_info': {'title': 'Tema'}}
+        recognition_cache.set('audd', content_hash, result)
+
+        stored = self.other_process_cache().get(recognition_cache.make_key('audd', content_hash))
+        self.assertEqual(stored, result)
+        self.assertEqual(recognition_cache.get('audd', content_hash), {**result, 'cached': True})
+        self.assertIsNone(recognition_cache.get('acrcloud', content_hash))
+
+    def test_errors_are_not_cached_and_misses_use_negative_ttl(self):
+        with mock.patch.object(recognition_cache.cache, 'set') as store:
+            recognition_cache.set('audd', 'a' * 64, {'success': False, 'error': 'quota'})
+            recognition_cache.set('audd', 'b' * 64, {'success': True, 'recognized': False})
+        store.assert_called_once()
+        self.assertEqual(store.call_args.kwargs['timeout'], recognition_cache.negative_ttl)
+
+    def test_process_local_backend_is_rejected(self):
+        local = {**settings.CACHES, 'recognition': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local), self.assertRaises(ImproperlyConfigured):
+            check_shared_caches()
+
+
+class QuotaLimiterTests(TestCase):
+    """
+    Presupuesto diario y ritmo de llamadas a AudD/ACRCloud (quota_limiter)
+    """
+
+    def setUp(self):
+        self.now = timezone.now()
+        patcher = mock.patch('api.quota.timezone.now', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def advance(self, **delta):
+        self.now += timedelta(**delta)
+
+    @override_settings(EXTERNAL_API_QUOTAS={'audd': {'daily': 3, 'rate': None}})
+    def test_daily_budget_is_shared_and_resets_next_day(self):
+        decisions = [quota_limiter.try_acquire('audd') for _ in range(3)]
+        self.assertEqual([d['remaining'] for d in decisions], [2, 1, 0])
+
+        # Otra instancia (otro proceso) ve el mismo uso guardado en la base de datos
+        refused = QuotaLimiter().acquire('audd', max_wait=0)
+        self.assertFalse(refused['allowed'])
+        self.assertEqual(refused['reason'], 'daily')
+        self.assertEqual(ExternalApiQuota.objects.get(provider='audd').used, 3)
+        self.assertTrue(quota_limiter.status('audd')['exhausted'])
+
+        self.advance(days=1)
+        self.assertTrue(quota_limiter.try_acquire('audd')['allowed'])
+        self.assertEqual(quota_limiter.status('audd')['used'], 1)
+
+    @override_settings(EXTERNAL_API_QUOTAS={'acrcloud': {'daily': None, 'rate': 2, 'per': 60}})
+    def test_rate_waits_for_the_bucket_to_refill(self):
+        self.assertTrue(quota_limiter.try_acquire('acrcloud')['allowed'])
+        self.assertTrue(quota_limiter.try_acquire('acrcloud')['allowed'])
+
+        refused = quota_limiter.acquire('acrcloud', max_wait=0)
+        self.assertEqual(refused['reason'], 'rate')
+        self.assertAlmostEqual(refused['retry_after'], 30.0)
+
+        # acquire() espera lo que falta para recargar un token
+        with mock.patch('api.quota.time.sleep', side_effect=lambda s: self.advance(seconds=s)) as sleep:
+            decision = quota_limiter.acquire('acrcloud', max_wait=60)
+        self.assertTrue(decision['allowed'])
+        sleep.assert_called_once_with(30.0)
+
+    def test_exhausted_provider_is_refused_without_calling_it(self):
+        quota_limiter.mark_exhausted('audd')
+        with mock.patch('api.audd_service.get_http_session') as session:
+            result = AudDService('token').post_sample(io.BytesIO(b'audio'), 'clip.mp3', 5)
+        session.assert_not_called()
+        self.assertTrue(result['quota_exceeded'])
+        self.assertEqual(result['retry_after'], quota_limiter.seconds_until_reset(self.now))
+
+        self.advance(days=1)
+        self.assertTrue(quota_limiter.status('audd')['allowed_now'])
+
+    @override_settings(EXTERNAL_API_QUOTA_ENABLED=False, EXTERNAL_API_QUOTAS={'audd': {'daily': 0}})
+    def test_disabled_limiter_allows_everything(self):
+        self.assertTrue(quota_limiter.acquire('audd')['allowed'])
+        self.assertFalse(ExternalApiQuota.objects.exists())
+
+
+class ConditionalGetTests(TestCase):
+    """
+    GET condicionales: 304 mientras no cambien las filas de la respuesta
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('poller', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_recognition_status_polling_gets_304_until_it_changes(self):
+        uploaded = UploadedFile.objects.create(
+            file='uploads/clip.mp3', name='clip.mp3', content_type='audio/mpeg',
+            size=5, uploaded_by=self.user
+        )
+        recognition = Recognition.objects.create(uploaded_file=uploaded, recognition_status='processing')
+        url = reverse('recognition-status', args=[uploaded.id])
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        cached = self.revalidate(url, first)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+        recognition.recognition_status = 'not_found'
+        recognition.save()
+        changed = self.revalidate(url, first)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['status'], 'not_found')
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+        # El reconocimiento de otro usuario no revela nada, ni siquiera un 304
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other', password='x'))
+        detail = reverse('recognition-detail', args=[recognition.id])
+        self.assertEqual(other.get(detail, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 404)
+
+    def test_catalog_list_etag_changes_on_delete(self):
+        Genre.objects.create(name='Rock')
+        pop = Genre.objects.create(name='Pop')
+        url = reverse('genre-list')
+
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        pop.delete()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_detail_honours_if_modified_since(self):
+        mood = Mood.objects.create(name='Calma')
+        url = reverse('mood-detail', args=[mood.id])
+
+        first = self.client.get(url)
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_track_analysis_etag_follows_related_rows(self):
+        genre = Genre.objects.create(name='Jazz')
+        track = make_track(self.user, 'analizado', genre=genre)
+        url = reverse('track-analysis', args=[track.id])
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(1):
+            # Solo la consulta values() de los validadores: el track no se carga
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        genre.description = 'Editado'
+        genre.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+
+@override_settings(FEATURE_CACHE_ENABLED=False)
+class RecognitionEngineTests(TestCase):
+    """
+    Reconocimiento de un fragmento tomado de mitad de una referencia
+    """
+
+    CLIP_START = 18.0
+    CLIP_SECONDS = 8.0
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.service = AudioRecognitionService()
+        cls.sr = cls.service.fingerprint.sample_rate
+        cls.hop_seconds = cls.service.landmark.hop_length / cls.service.landmark.sample_rate
+        cls.signals = [synthetic_music(30, seed=seed) for seed in (3, 4)]
+        start = int(cls.CLIP_START * cls.sr)
+        cls.clip = cls.write('clip.wav', cls.signals[1][start:start + int(cls.CLIP_SECONDS * cls.sr)])
+        cls.unrelated = cls.write('unrelated.wav', synthetic_music(cls.CLIP_SECONDS, seed=9))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.directory.cleanup()
+
+    @classmethod
+    def write(cls, name, y):
+        path = os.path.join(cls.directory.name, name)
+        sf.write(path, y, cls.sr, subtype='FLOAT')
+        return path
+
+    @classmethod
+    def setUpTestData(cls):
+        # Referencias calculadas e indexadas una sola vez para toda la clase
+        cls.fingerprints = [
+            cls.service.create_fingerprint(cls.write(f'reference_{i}.wav', y), f'reference_{i}')
+            for i, y in enumerate(cls.signals)
+        ]
+        cls.user = User.objects.create_user('engine', password='x')
+        cls.track_ids = []
+        for i, result in enumerate(cls.fingerprints):
+            track = make_track(cls.user, f'reference_{i}')
+            store_track_hashes(track.id, result['landmark_hashes'], result['landmark_offsets'])
+            cls.track_ids.append(track.id)
+
+    def setUp(self):
+        self.reference_tracks = [
+            {'id': track_id, 'title': f'reference_{i}', 'artist': 'Artista',
+             'fingerprint_features': result['features']}
+            for i, (track_id, result) in enumerate(zip(self.track_ids, self.fingerprints))
+        ]
+
+    def test_landmark_engine_finds_track_and_offset(self):
+        result = self.service.recognize_audio(self.clip, self.reference_tracks, engine='landmark')
+
+        self.assertTrue(result['recognized'])
+        self.assertEqual(result['track_id'], self.track_ids[1])
+        self.assertAlmostEqual(result['offset_seconds'], self.CLIP_START, delta=self.hop_seconds)
+        self.assertGreaterEqual(result['aligned_matches'], self.service.landmark.min_aligned_matches)
+
+    def test_landmark_engine_rejects_unrelated_clip(self):
+        result = self.service.recognize_audio(self.unrelated, self.reference_tracks, engine='landmark')
+
+        self.assertTrue(result['success'])
+        self.assertFalse(result['recognized'])
+        self.assertLess(result['best_aligned_matches'], result['threshold'])
+
+    def test_window_engine_reports_segment_offset(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(FINGERPRINT_WINDOW_DIR=directory.name):
+            for track_id, result in zip(self.track_ids, self.fingerprints):
+                store_track_windows(track_id, result['segment_sums'], result['segment_counts'])
+            segments = [load_track_windows(track_id) for track_id in self.track_ids]
+
+        segment_seconds = self.service.fingerprint.segment_seconds
+        windows = ReferenceWindowMatrix(self.reference_tracks, segments, segment_seconds)
+        result = self.service.recognize_audio(
+            self.clip, self.reference_tracks, engine='window', window_matrix=windows
+        )
+
+        self.assertTrue(result['recognized'])
+        self.assertEqual(result['track_id'], self.track_ids[1])
+        self.assertAlmostEqual(result['offset_seconds'], self.CLIP_START, delta=segment_seconds)
+
+    def test_recognition_stores_alignment(self):
+        uploaded = UploadedFile.objects.create(
+            file='clip.wav', name='clip.wav', content_type='audio/wav',
+            size=os.path.getsize(self.clip), uploaded_by=self.user
+        )
+        snapshot = {'reference_tracks': self.reference_tracks, 'feature_matrix': None,
+                    'ann_index': None, 'window_matrix': None}
+        with override_settings(MEDIA_ROOT=self.directory.name), \
+                mock.patch.object(reference_catalog, 'snapshot', return_value=snapshot):
+            recognize_audio_file(uploaded.id, engine='landmark')
+
+        recognition = Recognition.objects.get(uploaded_file=uploaded)
+        self.assertEqual(recognition.recognition_status, 'found')
+        self.assertEqual(recognition.recognized_track_id, self.track_ids[1])
+        self.assertEqual(recognition.fingerprinted_confidence, recognition.dejavu_result['aligned_matches'])
+        self.assertGreater(recognition.fingerprinted_confidence, 0)
+        self.assertAlmostEqual(recognition.offset_seconds, self.CLIP_START, delta=self.hop_seconds)
+
+
+class RecognitionSnippetTests(SimpleTestCase):
+    """
+    Fragmento que se envía a AudD/ACRCloud (recognition_snippet)
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        _cached_snippet.cache_clear()
+        self.addCleanup(_cached_snippet.cache_clear)
+
+    def write(self, name, seconds, sr=22050):
+        path = os.path.join(self.directory, name)
+        sf.write(path, synthetic_music(seconds, sr=sr), sr, subtype='PCM_16')
+        return path
+
+    def test_select_window_finds_loudest_window(self):
+        sr = 8000
+        y = 0.01 * np.random.default_rng(0).standard_normal(30 * sr)
+        y[17 * sr:19 * sr] += np.sin(2 * np.pi * 440 * np.arange(2 * sr) / sr)
+        start = select_window(y, sr, 5)
+        self.assertGreaterEqual(start, 14.0)
+        self.assertLessEqual(start, 17.0)
+
+    def test_select_window_center_and_short_audio(self):
+        y = np.zeros(30 * 8000)
+        self.assertEqual(select_window(y, 8000, 10, strategy='center'), 10.0)
+        for strategy in ('loudest', 'center'):
+            self.assertEqual(select_window(y[:10 * 8000], 8000, 10, strategy=strategy), 0.0)
+        with self.assertRaises(ValueError):
+            select_window(y, 8000, 10, strategy='random')
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_short_clip_is_sent_whole(self):
+        with mock.patch('api.recognition_snippet.ffmpeg_binary', return_value=None):
+            self.assertIsNone(extract_snippet(self.write('short.wav', 6), seconds=4))
+
+    @override_settings(AUDIO_DECODE_BACKEND='librosa')
+    def test_flac_snippet_without_ffmpeg(self):
+        with mock.patch('api.recognition_snippet.ffmpeg_binary', return_value=None):
+            snippet = extract_snippet(self.write('long.wav', 20), seconds=4, strategy='center')
+
+        self.assertEqual((snippet['filename'], snippet['content_type']), ('snippet.flac', 'audio/flac'))
+        self.assertEqual(snippet['start'], 8.0)
+        self.assertTrue(snippet['data'].startswith(b'fLaC'))
+        y, sr = sf.read(io.BytesIO(snippet['data']))
+        self.assertEqual((sr, len(y)), (FALLBACK_SAMPLE_RATE, 4 * FALLBACK_SAMPLE_RATE))
+
+
+class UploadRecognitionTaskTests(TestCase):
+    """
+    recognize_upload_external: resultado de AudD guardado en el Recognition
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='x')
+        self.uploaded = UploadedFile.objects.create(
+            file='uploads/clip.mp3', name='clip.mp3', content_type='audio/mpeg',
+            size=5, uploaded_by=self.user, processing_status='processing'
+        )
+        self.recognition = Recognition.objects.create(
+            uploaded_file=self.uploaded, recognition_status='processing'
+        )
+        patcher = mock.patch('api.audd_service.get_audd_service')
+        self.recognize_file = patcher.start().return_value.recognize_file
+        self.addCleanup(patcher.stop)
+
+    def run_task(self, audd_result):
+        self.recognize_file.return_value = audd_result
+        recognize_upload_external.apply(args=[self.uploaded.id, self.recognition.id])
+        self.recognition.refresh_from_db()
+        self.uploaded.refresh_from_db()
+
+    def recognized(self, spotify_id):
+        return {
+            'success': True, 'recognized': True,
+            'track_info': {'title': 'Tema', 'artist': 'Artista', 'spotify': {'id': spotify_id}},
+        }
+
+    def test_found_with_local_track(self):
+        track = make_track(self.user, 'Tema', spotify_id='sp-local')
+        self.run_task(self.recognized('sp-local'))
+
+        self.assertEqual(self.recognition.recognition_status, 'found')
+        self.assertEqual(self.recognition.recognized_track, track)
+        self.assertTrue(self.recognition.dejavu_result['matched_with_existing'])
+        self.assertEqual(self.uploaded.processing_status, 'completed')
+
+    def test_found_external_only(self):
+        self.run_task(self.recognized('sp-external'))
+
+        self.assertEqual(self.recognition.recognition_status, 'found')
+        self.assertIsNone(self.recognition.recognized_track)
+        self.assertTrue(self.recognition.dejavu_result['external_only'])
+        self.assertEqual(self.uploaded.processing_status, 'completed')
+
+    def test_not_found(self):
+        self.run_task({'success': True, 'recognized': False, 'message': 'Sin coincidencias'})
+
+        self.assertEqual(self.recognition.recognition_status, 'not_found')
+        self.assertEqual(self.recognition.recognition_error, 'Sin coincidencias')
+        self.assertEqual(self.uploaded.processing_status, 'completed')
+
+    def test_quota_exceeded(self):
+        self.run_task({'success': False, 'quota_exceeded': True, 'message': 'Cuota agotada'})
+
+        self.assertEqual(self.recognition.recognition_status, 'error')
+        self.assertEqual(self.recognition.recognition_error, 'Límite de API: Cuota agotada')
+        self.assertEqual(self.uploaded.processing_status, 'error')
+
+    def test_rate_limited_is_retried_by_worker(self):
+        self.recognize_file.return_value = {'success': False, 'rate_limited': True, 'retry_after': 30}
+        with mock.patch.object(recognize_upload_external, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                recognize_upload_external(self.uploaded.id, self.recognition.id)
+        retry.assert_called_once_with(countdown=30)
+
+        self.recognition.refresh_from_db()
+        self.assertEqual(self.recognition.recognition_status, 'processing')
+
+    def test_rate_limited_eager_run_does_not_retry(self):
+        with mock.patch.object(recognize_upload_external, 'retry') as retry:
+            self.run_task({'success': False, 'rate_limited': True, 'retry_after': 30,
+                           'error': 'Demasiadas llamadas a audd'})
+        retry.assert_not_called()
+
+        self.assertEqual(self.recognition.recognition_status, 'error')
+        self.assertEqual(self.recognition.recognition_error, 'Error AudD: Demasiadas llamadas a audd')
+        self.assertEqual(self.uploaded.processing_status, 'error')
+
+    def test_exception_marks_error(self):
+        self.recognize_file.side_effect = RuntimeError('sin conexión')
+        self.run_task(None)
+
+        self.assertEqual(self.recognition.recognition_status, 'error')
+        self.assertEqual(self.recognition.recognition_error, 'Error AudD: sin conexión')
+        self.assertEqual(self.uploaded.processing_status, 'error')
+
+
+@override_settings(RECOGNITION_EVENTS_REDIS_URL=None, RECOGNITION_EVENTS_POLL_INTERVAL=0.01)
+class RecognitionEventsTests(TransactionTestCase):
+    """
+    Stream SSE de estado (api/sse.py) sin Redis: consulta la base de datos
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('listener', password='x')
+        self.token = str(AccessToken.for_user(self.user))
+        self.uploaded = UploadedFile.objects.create(
+            file='uploads/clip.mp3', name='clip.mp3', content_type='audio/mpeg',
+            size=5, uploaded_by=self.user
+        )
+        self.recognition = Recognition.objects.create(
+            uploaded_file=self.uploaded, recognition_status='processing'
+        )
+
+    def stream(self, file_id=None, query='', headers=(), finish_with=None):
+        """
+        Ejecuta la aplicación ASGI y devuelve los mensajes enviados
+        """
+        scope = {
+            'type': 'http', 'method': 'GET',
+            'path': f'/api/recognition-events/{file_id or self.uploaded.id}/',
+            'query_string': query.encode(), 'headers': list(headers),
+        }
+        messages = []
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            app = asyncio.ensure_future(recognition_events_app(scope, receive, send))
+            if finish_with is not None:
+                await asyncio.sleep(0.05)
+                await sync_to_async(Recognition.objects.filter(pk=self.recognition.pk).update)(
+                    recognition_status=finish_with
+                )
+            await asyncio.wait_for(app, timeout=5)
+
+        async_to_sync(run)()
+        return messages
+
+    @staticmethod
+    def events(messages):
+        body = b''.join(m.get('body', b'') for m in messages[1:]).decode()
+        return [json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')]
+
+    def test_query_string_token_streams_until_terminal_status(self):
+        messages = self.stream(query=f'token={self.token}', finish_with='found')
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), messages[0]['headers'])
+        self.assertEqual([e['status'] for e in self.events(messages)], ['processing', 'found'])
+        self.assertFalse(messages[-1]['more_body'])
+
+    def test_authorization_header_is_accepted(self):
+        self.recognition.recognition_status = 'not_found'
+        self.recognition.save()
+        messages = self.stream(headers=[(b'authorization', f'Bearer {self.token}'.encode())])
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual([e['status'] for e in self.events(messages)], ['not_found'])
+
+    def test_missing_or_invalid_token_is_rejected(self):
+        self.assertEqual(self.stream()[0]['status'], 401)
+        self.assertEqual(self.stream(query='token=invalid')[0]['status'], 401)
+
+    def test_other_users_file_is_not_found(self):
+        other = User.objects.create_user('other', password='x')
+        messages = self.stream(query=f'token={AccessToken.for_user(other)}')
+        self.assertEqual(messages[0]['status'], 404)
+
+
+class HttpSessionTests(SimpleTestCase):
+    """
+    Reintentos de la sesión compartida con AudD y ACRCloud
+    """
+
+    def setUp(self):
+        self.retry = build_session().get_adapter('https://api.audd.io/').max_retries
+
+    def test_post_is_only_retried_when_provider_asks_to_wait(self):
+        self.assertFalse(self.retry.is_retry('POST', 500))
+        self.assertFalse(self.retry.is_retry('POST', 503))
+        self.assertTrue(self.retry.is_retry('POST', 503, has_retry_after=True))
+        self.assertTrue(self.retry.is_retry('POST', 429, has_retry_after=True))
+        self.assertTrue(self.retry.is_retry('GET', 502))
+
+    def test_post_read_timeout_is_not_retried(self):
+        error = ReadTimeoutError(None, '/', 'timeout')
+        with self.assertRaises(ReadTimeoutError):
+            self.retry.increment(method='POST', url='/', error=error)
+        # Un error de conexión no llegó al proveedor: se reintenta
+        retried = self.retry.increment(method='POST', url='/', error=NewConnectionError(None, 'refused'))
+        self.assertEqual(retried.connect, self.retry.connect - 1)
+
+    def test_cancelled_upload_is_not_retried(self):
+        # Servidor que acepta la conexión y nunca responde
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+        url = 'http://127.0.0.1:%d/' % server.getsockname()[1]
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        body = StreamingMultipart({'api_token': 'x'}, [], cancel_event=cancel_event)
+        self.assertNotIsInstance(RequestCancelled(), OSError)
+
+        started = time.monotonic()
+        with self.assertRaises(RequestCancelled):
+            build_session().post(url, data=body, headers={'Content-Type': body.content_type}, timeout=5)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+class SmartRecognitionTests(TestCase):
+    """
+    smart_recognition: vista asíncrona con el respaldo escalonado opcional
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        media_override = override_settings(MEDIA_ROOT=media.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+        user = User.objects.create_user('smart', password='x')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+        self.providers = []
+
+        async def recognize(recognizer, file_path, content_hash=None):
+            self.providers.append((recognizer.providers, recognizer.hedge_delay))
+            self.assertTrue(os.path.exists(file_path))
+            return {'success': True, 'recognized': False, 'provider': recognizer.providers[0]}
+
+        patcher = mock.patch.object(HedgedRecognizer, 'recognize', recognize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, **data):
+        upload = SimpleUploadedFile('clip.mp3', b'ID3audio', content_type='audio/mpeg')
+        return self.client.post(reverse('smart-recognition'), {'file': upload, **data}, **self.auth)
+
+    def test_requires_token(self):
+        self.auth = {}
+        self.assertEqual(self.post().status_code, 401)
+
+    def test_hedging_is_opt_in(self):
+        response = self.post()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['recognized'])
+        self.assertEqual(self.providers, [(['audd'], 3.0)])
+        # El archivo temporal se borra
+        self.assertEqual([name for _, _, names in os.walk(self.media_root) for name in names], [])
+
+        self.post(hedge='true', hedge_delay_ms='500', service='acrcloud')
+        self.assertEqual(self.providers[1], (['acrcloud', 'audd'], 0.5))
+
+    def test_invalid_hedge_delay_is_rejected(self):
+        for value in ('abc', '-5'):
+            response = self.post(hedge_delay_ms=value)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.providers, [])
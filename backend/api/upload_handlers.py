@@ -0,0 +1,33 @@
+"""
+Upload handlers propios
+"""
+import hashlib
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Calcula el SHA-256 de cada archivo mientras se recibe
+
+    No almacena nada: devuelve cada bloque intacto al siguiente handler
+    (memoria o archivo temporal), así que el hash sale sin releer el archivo.
+    Los resultados quedan en .digests, indexados por nombre de campo.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self._hasher = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests[self.field_name] = self._hasher.hexdigest()
+        # None: el archivo lo construye el siguiente handler
+        return None
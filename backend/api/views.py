@@ -3,12 +3,18 @@ from rest_framework.decorators import api_view, parser_classes, permission_class
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from .serializers import UserSerializer, NoteSerializer
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from .models import Note, Artist, Genre, Mood, Track, Analysis, UploadedFile, MusicFile, Recognition, MusicAnalysis
 from .serializers import ArtistSerializer, GenreSerializer, MoodSerializer, TrackSerializer, AnalysisSerializer, UploadedFileSerializer, TrackUploadSerializer, MusicFileSerializer, MusicAnalysisSerializer
 from .tasks import fingerprint_track, recognize_audio_file, batch_fingerprint_tracks
+from .upload_handlers import ContentHashUploadHandler
+from .conditional import ConditionalGetMixin, not_modified, row_validators, set_validators, make_etag
 from django.core.files.storage import default_storage
 import os
 from rest_framework.generics import RetrieveAPIView
@@ -86,11 +92,9 @@ class TrackViewSet(viewsets.ModelViewSet):
                 reference_source='user_upload'
             )
             
-            # Start fingerprinting task
+            # Start fingerprinting task (cola 'fingerprint'; sin broker se ejecuta aquí)
             try:
-                # Ejecutar fingerprinting directamente (sin Celery para desarrollo)
-                from .tasks import fingerprint_track
-                fingerprint_track(track.id)  # Llamada directa sin .delay()
+                enqueue_task(fingerprint_track, track.id)
             except Exception as e:
                 # Si falla el fingerprinting, el track se queda en pending
                 track.fingerprint_error = str(e)
@@ -107,6 +111,18 @@ class TrackViewSet(viewsets.ModelViewSet):
         """
         Obtener análisis de un track
         """
+        # Validadores antes de cargar el track: si nada cambió, 304 sin serializar
+        validators = row_validators(
+            self.get_queryset(),
+            'updated_at', 'analysis__updated_at',
+            'artist__updated_at', 'genre__updated_at', 'mood__updated_at',
+            pk=pk
+        )
+        if validators:
+            cached = not_modified(request, *validators)
+            if cached is not None:
+                return cached
+
         track = self.get_object()
         
         # Si el track tiene análisis completo, devolverlo con todas las características
@@ -159,10 +175,10 @@ class TrackViewSet(viewsets.ModelViewSet):
                 'analysis_complete': True
             }
             
-            return Response(music_analysis, status=status.HTTP_200_OK)
+            return set_validators(Response(music_analysis, status=status.HTTP_200_OK), *validators)
         
         # Si no hay análisis completo, devolver información básica del track
-        return Response({
+        return set_validators(Response({
             'track_id': track.id,
             'track_title': track.title,
             'artist_name': track.artist.name if track.artist else 'Unknown Artist',
@@ -171,7 +187,7 @@ class TrackViewSet(viewsets.ModelViewSet):
             'fingerprints_count': track.fingerprints_count,
             'message': 'Análisis en proceso o no disponible',
             'analysis_complete': False
-        }, status=status.HTTP_200_OK)
+        }, status=status.HTTP_200_OK), *validators)
 
     @action(detail=True, methods=['get'])
     def test_endpoint(self, request, pk=None):
@@ -241,13 +257,13 @@ class ArtistViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class GenreViewSet(viewsets.ModelViewSet):
+class GenreViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [permissions.IsAuthenticated]
 
 
-class MoodViewSet(viewsets.ModelViewSet):
+class MoodViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Mood.objects.all()
     serializer_class = MoodSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -262,12 +278,19 @@ class FileUploadView(generics.CreateAPIView):
     """
     Vista para subir archivos de audio para reconocimiento USANDO AUDD
     REEMPLAZA el sistema anterior por reconocimiento real con AudD
+    
+    Guarda el archivo y responde 202 al momento; el reconocimiento corre en
+    la tarea recognize_upload_external y se consulta en recognition_status.
     """
     serializer_class = UploadedFileSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request, *args, **kwargs):
+        # Calcular el SHA-256 mientras el archivo se recibe (antes de leer request.FILES)
+        hash_handler = ContentHashUploadHandler(request._request)
+        request._request.upload_handlers.insert(0, hash_handler)
+        
         file_obj = request.FILES.get('file')
         
         if not file_obj:
@@ -283,6 +306,19 @@ class FileUploadView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        content_hash = hash_handler.digests.get('file') or hash_uploaded_file(file_obj)
+        
+        # Mismo audio reconocido hace poco por este usuario: devolver ese resultado
+        previous_recognition = find_recent_recognition(request.user, content_hash)
+        if previous_recognition is not None:
+            return Response({
+                **self.get_serializer(previous_recognition.uploaded_file).data,
+                'recognition_preview': build_duplicate_preview(previous_recognition)
+            }, status=status.HTTP_200_OK)
+        
+        # Mismo contenido ya almacenado: referenciarlo en lugar de guardar otra copia
+        stored_upload = find_stored_upload(content_hash)
+        
         # Create file data
         file_data = {
             'file': file_obj,
@@ -294,194 +330,43 @@ class FileUploadView(generics.CreateAPIView):
         serializer = self.get_serializer(data=file_data)
         if serializer.is_valid():
             try:
-                uploaded_file = serializer.save(
-                    uploaded_by=request.user,
-                    file_purpose='recognition',
-                    processing_status='processing'  # Cambiado de 'pending' a 'processing'
-                )
-                
-                # *** AQUÍ ESTÁ EL CAMBIO PRINCIPAL ***
-                # En lugar de usar el sistema anterior, usar AudD directamente
-                try:
-                    from .audd_service import get_audd_service
-                    from django.core.files.storage import default_storage
-                    import time
-                    
-                    start_time = time.time()
-                    
-                    # Obtener ruta completa del archivo
-                    file_path = default_storage.path(uploaded_file.file.name)
-                    
-                    # Reconocer con AudD
-                    service = get_audd_service()
-                    audd_result = service.recognize_file(file_path)
-                    
-                    processing_time = time.time() - start_time
-                    
-                    # Crear registro de reconocimiento
-                    recognition = Recognition.objects.create(
-                        uploaded_file=uploaded_file,
-                        processing_time=processing_time,
-                        recognition_status='processing'
+                if stored_upload is not None:
+                    uploaded_file = UploadedFile.objects.create(
+                        file=stored_upload.file.name,
+                        name=file_obj.name,
+                        content_type=file_obj.content_type,
+                        size=file_obj.size,
+                        uploaded_by=request.user,
+                        file_purpose='recognition',
+                        processing_status='processing',
+                        content_hash=content_hash
                     )
-                    
-                    if audd_result['success'] and audd_result.get('recognized'):
-                        # *** CANCIÓN RECONOCIDA POR AUDD ***
-                        external_info = audd_result['track_info']
-                        
-                        # Buscar si ya existe en tu BD (matching inteligente)
-                        external_info = audd_result['track_info']
-                        
-                        # *** DEBUG: Información de AudD ***
-                        print(f"🔍 AudD identificó:")
-                        print(f"   Título: {external_info['title']}")
-                        print(f"   Artista: {external_info['artist']}")
-                        print(f"   Spotify ID: {external_info.get('spotify', {}).get('id')}")
-                        
-                        possible_tracks = find_matching_tracks(
-                            title=external_info['title'],
-                            artist=external_info['artist'],
-                            user=request.user,
-                            spotify_id=external_info.get('spotify', {}).get('id')
-                        )
-                        
-                        print(f"🔍 Búsqueda resultado: {len(possible_tracks)} tracks encontrados")
-                        if possible_tracks:
-                            track = possible_tracks[0]
-                            print(f"   ✅ ENCONTRADO: {track.title} - {track.artist.name} (Spotify: {track.spotify_id})")
-                        else:
-                            print(f"   ❌ NO ENCONTRADO en BD del usuario {request.user.username}")
-                        
-                        if possible_tracks:
-                            # Existe en tu BD - usar el track existente
-                            existing_track = possible_tracks[0]
-                            recognition.recognized_track = existing_track
-                            recognition.confidence = 0.95  # Alta confianza con AudD
-                            recognition.recognition_status = 'found'
-                            recognition.dejavu_result = {
-                                'audd_result': audd_result,
-                                'matched_with_existing': True,
-                                'existing_track_id': existing_track.id
-                            }
-                            recognition.save()
-                            
-                            # Actualizar archivo
-                            uploaded_file.processing_status = 'completed'
-                            uploaded_file.save()
-                            
-                            # *** RESPUESTA INMEDIATA CON INFO REAL ***
-                            return Response({
-                                **serializer.data,
-                                'recognition_preview': {
-                                    'status': 'found',
-                                    'track': {
-                                        'id': existing_track.id,
-                                        'title': existing_track.title,
-                                        'artist': existing_track.artist.name,
-                                        'genre': existing_track.genre.name if existing_track.genre else 'Sin clasificar',
-                                        'mood': existing_track.mood.name if existing_track.mood else 'Sin clasificar'
-                                    },
-                                    'audd_identified': {
-                                        'title': external_info['title'],
-                                        'artist': external_info['artist'],
-                                        'album': external_info.get('album'),
-                                        'spotify_id': external_info.get('spotify', {}).get('id'),
-                                        'apple_music_url': external_info.get('apple_music', {}).get('url')
-                                    },
-                                    'confidence': 0.95,
-                                    'processing_time': processing_time,
-                                    'recognition_id': recognition.id,
-                                }
-                            }, status=status.HTTP_201_CREATED)
-                        
-                        else:
-                            # No existe en tu BD - mostrar info de AudD sin crear track
-                            recognition.recognized_track = None  # No track asociado
-                            recognition.confidence = 0.95
-                            recognition.recognition_status = 'found'
-                            recognition.dejavu_result = {
-                                'audd_result': audd_result,
-                                'track_not_in_db': True,
-                                'external_only': True
-                            }
-                            recognition.save()
-                            
-                            uploaded_file.processing_status = 'completed'
-                            uploaded_file.save()
-                            
-                            return Response({
-                                **serializer.data,
-                                'recognition_preview': {
-                                    'status': 'found',
-                                    'track': None,  # No track en BD
-                                    'audd_identified': {
-                                        'title': external_info['title'],
-                                        'artist': external_info['artist'],
-                                        'album': external_info.get('album'),
-                                        'spotify_id': external_info.get('spotify', {}).get('id'),
-                                        'apple_music_url': external_info.get('apple_music', {}).get('url'),
-                                        'release_date': external_info.get('release_date'),
-                                        'genres': external_info.get('apple_music', {}).get('genres', [])
-                                    },
-                                    'confidence': 0.95,
-                                    'processing_time': processing_time,
-                                    'recognition_id': recognition.id,
-                                    'message': f'✅ Reconocida: "{external_info["title"]}" por {external_info["artist"]} (No existe en tu BD - Info solo de AudD)'
-                                }
-                            }, status=status.HTTP_201_CREATED)
-                    
-                    else:
-                        # AudD no reconoció la canción
-                        recognition.recognition_status = 'not_found'
-                        
-                        # Verificar si es error de cuota
-                        if audd_result.get('quota_exceeded'):
-                            recognition.recognition_error = f"Límite de API: {audd_result.get('message', 'Cuota diaria agotada')}"
-                            recognition.recognition_status = 'error'
-                            message = audd_result.get('message', 'Has alcanzado el límite diario de AudD')
-                        else:
-                            recognition.recognition_error = audd_result.get('message', 'Canción no encontrada en AudD')
-                            message = 'Canción no encontrada en la base de datos de AudD'
-                        
-                        recognition.dejavu_result = {'audd_result': audd_result}
-                        recognition.save()
-                        
-                        uploaded_file.processing_status = 'completed'
-                        uploaded_file.save()
-                        
-                        return Response({
-                            **serializer.data,
-                            'recognition_preview': {
-                                'status': recognition.recognition_status,
-                                'confidence': 0.0,
-                                'processing_time': processing_time,
-                                'recognition_id': recognition.id,
-                                'message': message,
-                                'quota_exceeded': audd_result.get('quota_exceeded', False),
-                                'error': audd_result.get('error') if audd_result.get('quota_exceeded') else None
-                            }
-                        }, status=status.HTTP_201_CREATED)
-                
-                except Exception as audd_error:
-                    # Error con AudD - crear reconocimiento con error
-                    recognition = Recognition.objects.create(
-                        uploaded_file=uploaded_file,
-                        recognition_status='error',
-                        recognition_error=f'Error AudD: {str(audd_error)}',
-                        processing_time=time.time() - start_time if 'start_time' in locals() else 0
+                    serializer = self.get_serializer(uploaded_file)
+                else:
+                    uploaded_file = serializer.save(
+                        uploaded_by=request.user,
+                        file_purpose='recognition',
+                        processing_status='processing',  # Cambiado de 'pending' a 'processing'
+                        content_hash=content_hash
                     )
-                    
-                    uploaded_file.processing_status = 'error'
-                    uploaded_file.save()
                 
-                    return Response({
-                        **serializer.data,
-                        'recognition_preview': {
-                            'status': 'error',
-                            'error': f'Error en reconocimiento: {str(audd_error)}',
-                            'recognition_id': recognition.id
-                        }
-                    }, status=status.HTTP_201_CREATED)
+                # Reconocimiento con AudD fuera de la petición: la tarea deja el
+                # resultado en el Recognition y el cliente consulta recognition_status
+                recognition = Recognition.objects.create(
+                    uploaded_file=uploaded_file,
+                    recognition_status='processing'
+                )
+                enqueue_upload_recognition(uploaded_file.id, recognition.id)
+                
+                return Response({
+                    **serializer.data,
+                    'recognition_preview': {
+                        'status': 'processing',
+                        'recognition_id': recognition.id,
+                        'status_url': reverse('recognition-status', args=[uploaded_file.id]),
+                        'message': 'Archivo recibido, reconociendo...'
+                    }
+                }, status=status.HTTP_202_ACCEPTED)
                 
             except Exception as e:
                 return Response(
@@ -552,6 +437,12 @@ class RecognitionDetailView(generics.RetrieveAPIView):
     Vista para obtener detalles de un reconocimiento específico
     """
     permission_classes = [IsAuthenticated]
+
+    # Filas que forman la respuesta: cualquier cambio en ellas cambia el ETag
+    validator_fields = (
+        'updated_at', 'recognized_track__updated_at', 'recognized_track__artist__updated_at',
+        'recognized_track__genre__updated_at', 'recognized_track__mood__updated_at',
+    )
     
     def get_object(self):
         recognition_id = self.kwargs['pk']
@@ -562,6 +453,15 @@ class RecognitionDetailView(generics.RetrieveAPIView):
         )
     
     def retrieve(self, request, *args, **kwargs):
+        validators = row_validators(
+            Recognition.objects.filter(id=self.kwargs['pk'], uploaded_file__uploaded_by=request.user),
+            *self.validator_fields
+        )
+        if validators:
+            cached = not_modified(request, *validators)
+            if cached is not None:
+                return cached
+
         recognition = self.get_object()
         
         data = {
@@ -611,7 +511,7 @@ class RecognitionDetailView(generics.RetrieveAPIView):
                 'fingerprints_count': track.fingerprints_count
             }
         
-        return Response(data)
+        return set_validators(Response(data), *validators)
 
 
 @api_view(['GET'])
@@ -627,16 +527,25 @@ def recognition_status(request, file_id):
             uploaded_by=request.user
         )
         
+        # Validadores del reconocimiento más reciente: el polling repetido recibe 304
+        validators = row_validators(
+            Recognition.objects.filter(uploaded_file=uploaded_file).order_by('-created_at'),
+            *RecognitionDetailView.validator_fields
+        ) or (make_etag('api.Recognition', None, file_id), None)
+        cached = not_modified(request, *validators)
+        if cached is not None:
+            return cached
+        
         # Buscar el reconocimiento más reciente para este archivo
         recognition = Recognition.objects.filter(
             uploaded_file=uploaded_file
         ).order_by('-created_at').first()
         
         if not recognition:
-            return Response({
+            return set_validators(Response({
                 'status': 'processing',
                 'message': 'Recognition not started yet'
-            })
+            }), *validators)
         
         # *** INFORMACIÓN REAL DE AUDD ***
         response_data = {
@@ -715,14 +624,23 @@ def recognition_status(request, file_id):
             
             response_data['message'] = f'✅ Identificada: "{audd_info["title"]}" por {audd_info["artist"]} (Solo información de AudD)'
         
+        if recognition.dejavu_result and (recognition.dejavu_result.get('audd_result') or {}).get('quota_exceeded'):
+            response_data['quota_exceeded'] = True
+            response_data['message'] = recognition.dejavu_result['audd_result'].get(
+                'message', 'Has alcanzado el límite diario de AudD'
+            )
+        elif recognition.recognition_status == 'not_found':
+            response_data['message'] = 'Canción no encontrada en la base de datos de AudD'
+        
         if recognition.recognition_error:
             response_data['error'] = recognition.recognition_error
             
             # Si es error de AudD, dar más contexto
-            if 'AudD' in recognition.recognition_error:
+            if (recognition.recognition_status == 'error' and 'AudD' in recognition.recognition_error
+                    and not response_data.get('quota_exceeded')):
                 response_data['message'] = 'Error conectando con el servicio de identificación de música'
         
-        return Response(response_data)
+        return set_validators(Response(response_data), *validators)
         
     except UploadedFile.DoesNotExist:
         return Response(
@@ -1199,7 +1117,7 @@ def debug_recognition_step_by_step(request):
         # PASO 3: Extraer características del archivo subido
         debug_info['steps'].append("PASO 3: Extrayendo características del audio")
         fingerprint_service = audio_recognition_service.fingerprint
-        query_result = fingerprint_service.extract_features(full_path)
+        query_result = audio_recognition_service.extract_query_features(full_path)
         
         if not query_result['success']:
             debug_info['steps'].append(f"❌ ERROR extrayendo características: {query_result.get('error')}")
@@ -1304,112 +1222,282 @@ def debug_recognition_step_by_step(request):
 
 # NUEVOS ENDPOINTS SIMPLIFICADOS PARA RECONOCIMIENTO PRECISO
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def smart_recognition(request):
+async def authenticate_jwt(request):
+    """
+    Usuario del access token JWT de la petición (las vistas async no pasan por DRF)
+    
+    Returns:
+        User o None si no hay token o no es válido
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    
+    try:
+        authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return authenticated[0] if authenticated else None
+
+
+@csrf_exempt
+@require_POST
+async def smart_recognition(request):
     """
     Reconocimiento inteligente que integra AudD con tu base de datos
     Permite enriquecer tracks existentes y tener control total sobre la información
+    
+    Vista asíncrona (DRF 3.14 no las admite, de ahí la autenticación JWT
+    propia): mientras AudD/ACRCloud responden, el worker ASGI sigue atendiendo
+    otras peticiones en lugar de quedarse bloqueado hasta 35 s.
     """
+    user = await authenticate_jwt(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+    
     if 'file' not in request.FILES:
-        return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
     
     file_obj = request.FILES['file']
     
     # Opciones de configuración
-    auto_create = request.data.get('auto_create', 'true').lower() == 'true'
-    update_existing = request.data.get('update_existing', 'true').lower() == 'true'
-    use_service = request.data.get('service', 'audd')
+    auto_create = request.POST.get('auto_create', 'true').lower() == 'true'
+    update_existing = request.POST.get('update_existing', 'true').lower() == 'true'
+    use_service = request.POST.get('service', 'audd')
+    hedge = request.POST.get('hedge')
+    hedge = None if hedge is None else str(hedge).lower() == 'true'
+    hedge_delay_ms = request.POST.get('hedge_delay_ms')
+    
+    if use_service not in ('audd', 'acrcloud'):
+        return JsonResponse({'error': 'service debe ser audd o acrcloud'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if hedge_delay_ms in (None, ''):
+        hedge_delay_ms = None
+    else:
+        try:
+            hedge_delay_ms = int(hedge_delay_ms)
+        except (TypeError, ValueError):
+            hedge_delay_ms = -1
+        if hedge_delay_ms < 0:
+            return JsonResponse({'error': 'hedge_delay_ms debe ser un entero >= 0'},
+                                status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        from django.core.files.storage import default_storage
-        from .audd_service import get_audd_service
+        from .hedged_recognition import HedgedRecognizer
         
         # Guardar archivo temporalmente
         temp_filename = f"smart_recognition_{file_obj.name}"
-        file_path = default_storage.save(temp_filename, file_obj)
+        file_path = await sync_to_async(default_storage.save)(temp_filename, file_obj)
         full_path = default_storage.path(file_path)
         
-        # Reconocer con AudD
-        service = get_audd_service()
-        recognition_result = service.recognize_file(full_path)
-        
-        # Limpiar archivo temporal
+        # Reconocer con el servicio elegido (y el otro como respaldo escalonado si se pide)
+        recognizer = HedgedRecognizer.for_service(use_service, hedge=hedge, hedge_delay_ms=hedge_delay_ms)
         try:
-            default_storage.delete(file_path)
-        except:
-            pass
-        
-        if not recognition_result['success'] or not recognition_result.get('recognized'):
-            return Response({
-                'recognized': False,
-                'service_used': use_service,
-                'message': recognition_result.get('message', 'No se pudo reconocer la música'),
-                'error': recognition_result.get('error')
-            })
-        
-        # Información reconocida por AudD
-        external_info = recognition_result['track_info']
+            recognition_result = await recognizer.recognize(full_path)
+        finally:
+            # Limpiar archivo temporal
+            try:
+                await sync_to_async(default_storage.delete)(file_path)
+            except Exception:
+                pass
         
-        # PASO 1: Buscar tracks existentes (más inteligente)
-        possible_tracks = find_matching_tracks(
-            title=external_info['title'],
-            artist=external_info['artist'],
-            user=request.user,
-            spotify_id=external_info.get('spotify', {}).get('id')
+        response_data = await sync_to_async(build_smart_recognition_response)(
+            recognition_result, user, use_service, auto_create, update_existing
         )
+        return JsonResponse(response_data)
         
-        response_data = {
-            'recognized': True,
+    except Exception as e:
+        return JsonResponse(
+            {'error': f'Error en reconocimiento inteligente: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def build_smart_recognition_response(recognition_result, user, use_service, auto_create, update_existing):
+    """
+    Cuerpo de la respuesta de smart_recognition: busca el track reconocido en
+    la base de datos del usuario y lo enriquece (parte síncrona de la vista)
+    """
+    use_service = recognition_result.get('provider', use_service)
+    
+    if not recognition_result['success'] or not recognition_result.get('recognized'):
+        return {
+            'recognized': False,
             'service_used': use_service,
-            'external_info': external_info,
-            'possible_matches': len(possible_tracks),
+            'hedge': recognition_result.get('hedge'),
+            'message': recognition_result.get('message', 'No se pudo reconocer la música'),
+            'error': recognition_result.get('error')
         }
+    
+    # Información reconocida por AudD
+    external_info = recognition_result['track_info']
+    
+    # PASO 1: Buscar tracks existentes (más inteligente)
+    possible_tracks = find_matching_tracks(
+        title=external_info['title'],
+        artist=external_info['artist'],
+        user=user,
+        spotify_id=external_info.get('spotify', {}).get('id')
+    )
+    
+    response_data = {
+        'recognized': True,
+        'service_used': use_service,
+        'hedge': recognition_result.get('hedge'),
+        'external_info': external_info,
+        'possible_matches': len(possible_tracks),
+    }
+    
+    if possible_tracks:
+        # CASO 1: Track ya existe en tu BD
+        existing_track = possible_tracks[0]  # El mejor match
         
-        if possible_tracks:
-            # CASO 1: Track ya existe en tu BD
-            existing_track = possible_tracks[0]  # El mejor match
-            
-            # Enriquecer track existente con nueva información
-            if update_existing:
-                updated_track = enrich_existing_track(existing_track, external_info)
-                response_data.update({
-                    'track_exists_in_db': True,
-                    'track_updated': update_existing,
-                    'track': serialize_track_with_enrichment(updated_track, external_info),
-                    'enrichment_applied': get_enrichment_summary(existing_track, external_info)
-                })
-            else:
-                response_data.update({
-                    'track_exists_in_db': True,
-                    'track_updated': False,
-                    'track': serialize_track_with_enrichment(existing_track, external_info)
-                })
-        
+        # Enriquecer track existente con nueva información
+        if update_existing:
+            updated_track = enrich_existing_track(existing_track, external_info)
+            response_data.update({
+                'track_exists_in_db': True,
+                'track_updated': update_existing,
+                'track': serialize_track_with_enrichment(updated_track, external_info),
+                'enrichment_applied': get_enrichment_summary(existing_track, external_info)
+            })
         else:
-            # CASO 2: Track no existe, mostrar información de AudD sin crear
-            if auto_create:
-                response_data.update({
-                    'track_exists_in_db': False,
-                    'track_created': False,
-                    'audd_info_only': True,
-                    'external_track_info': serialize_external_info_only(external_info),
-                    'message': 'Track no existe en BD. Información solo de AudD (no se creó track automáticamente)'
-                })
-            else:
-                response_data.update({
-                    'track_exists_in_db': False,
-                    'track_created': False,
-                    'message': 'Track no existe. Usar auto_create=true para más opciones'
-                })
-        
-        return Response(response_data)
-        
+            response_data.update({
+                'track_exists_in_db': True,
+                'track_updated': False,
+                'track': serialize_track_with_enrichment(existing_track, external_info)
+            })
+    
+    else:
+        # CASO 2: Track no existe, mostrar información de AudD sin crear
+        if auto_create:
+            response_data.update({
+                'track_exists_in_db': False,
+                'track_created': False,
+                'audd_info_only': True,
+                'external_track_info': serialize_external_info_only(external_info),
+                'message': 'Track no existe en BD. Información solo de AudD (no se creó track automáticamente)'
+            })
+        else:
+            response_data.update({
+                'track_exists_in_db': False,
+                'track_created': False,
+                'message': 'Track no existe. Usar auto_create=true para más opciones'
+            })
+    
+    return response_data
+
+
+def hash_uploaded_file(file_obj):
+    """
+    SHA-256 de un archivo subido (si el upload handler no pudo calcularlo)
+    """
+    import hashlib
+    
+    digest = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def enqueue_task(task, *args):
+    """
+    Encola una tarea de Celery en la cola que le asigna task_routes
+    
+    Si el broker no está disponible la tarea se ejecuta en el proceso actual,
+    para que el trabajo no quede pendiente para siempre.
+    """
+    import logging
+    
+    try:
+        task.delay(*args)
     except Exception as e:
-        return Response(
-            {'error': f'Error en reconocimiento inteligente: {str(e)}'}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        logging.getLogger(__name__).warning(
+            f"⚠️  No se pudo encolar {task.name} ({str(e)}); ejecutando en la petición"
         )
+        task.apply(args=list(args))
+
+
+def enqueue_upload_recognition(uploaded_file_id, recognition_id):
+    """
+    Encola el reconocimiento con AudD de un archivo subido (cola 'external')
+    """
+    from .tasks import recognize_upload_external
+    
+    enqueue_task(recognize_upload_external, uploaded_file_id, recognition_id)
+
+
+def find_recent_recognition(user, content_hash):
+    """
+    Reconocimiento terminado del mismo contenido subido por el usuario dentro
+    de la ventana UPLOAD_DEDUP_WINDOW (segundos; 0 desactiva la reutilización)
+    """
+    from django.conf import settings
+    from django.utils import timezone
+    from datetime import timedelta
+    
+    window = getattr(settings, 'UPLOAD_DEDUP_WINDOW', 3600)
+    if not content_hash or not window:
+        return None
+    
+    return Recognition.objects.filter(
+        uploaded_file__content_hash=content_hash,
+        uploaded_file__uploaded_by=user,
+        recognition_status__in=['found', 'not_found'],
+        created_at__gte=timezone.now() - timedelta(seconds=window)
+    ).select_related(
+        'uploaded_file', 'recognized_track__artist', 'recognized_track__genre', 'recognized_track__mood'
+    ).order_by('-created_at').first()
+
+
+def find_stored_upload(content_hash):
+    """
+    Archivo ya almacenado con el mismo contenido (de cualquier usuario)
+    """
+    if not content_hash:
+        return None
+    
+    for upload in UploadedFile.objects.filter(content_hash=content_hash).order_by('-uploaded_at')[:5]:
+        if upload.file and default_storage.exists(upload.file.name):
+            return upload
+    return None
+
+
+def build_duplicate_preview(recognition):
+    """
+    recognition_preview de FileUploadView a partir de un reconocimiento anterior
+    """
+    audd_result = (recognition.dejavu_result or {}).get('audd_result') or {}
+    external_info = audd_result.get('track_info') or {}
+    track = recognition.recognized_track
+    
+    preview = {
+        'status': recognition.recognition_status,
+        'track': {
+            'id': track.id,
+            'title': track.title,
+            'artist': track.artist.name,
+            'genre': track.genre.name if track.genre else 'Sin clasificar',
+            'mood': track.mood.name if track.mood else 'Sin clasificar'
+        } if track else None,
+        'confidence': recognition.confidence,
+        'processing_time': recognition.processing_time,
+        'recognition_id': recognition.id,
+        'duplicate': True,
+        'message': '♻️ Este audio ya se reconoció recientemente; se devuelve el resultado anterior'
+    }
+    
+    if external_info:
+        preview['audd_identified'] = {
+            'title': external_info.get('title'),
+            'artist': external_info.get('artist'),
+            'album': external_info.get('album'),
+            'spotify_id': (external_info.get('spotify') or {}).get('id'),
+            'apple_music_url': (external_info.get('apple_music') or {}).get('url')
+        }
+    
+    return preview
 
 
 def find_matching_tracks(title, artist, user, spotify_id=None):
@@ -2055,64 +2143,31 @@ def serialize_external_info_only(external_info):
 def check_audd_quota(request):
     """
     Verificar el estado de la cuota de AudD
+    
+    Lee el contador compartido de llamadas (api/quota.py): no gasta ningún
+    reconocimiento.
     """
     try:
-        from .audd_service import get_audd_service
-        import tempfile
-        import os
-        
-        # Crear un archivo de audio muy pequeño para testing (silencio de 1 segundo)
-        import numpy as np
-        from scipy.io.wavfile import write
+        from .quota import quota_limiter
         
-        # Generar 1 segundo de silencio
-        sample_rate = 22050
-        duration = 1  # segundo
-        samples = np.zeros(int(sample_rate * duration), dtype=np.int16)
+        quota = quota_limiter.status('audd')
         
-        # Guardar temporalmente
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            write(tmp_file.name, sample_rate, samples)
-            temp_path = tmp_file.name
+        if quota['exhausted']:
+            return Response({
+                'quota_status': 'exceeded',
+                'message': 'Cuota diaria de AudD agotada',
+                'recommendation': 'Espera hasta mañana o considera AudD premium',
+                'remaining_quota': 0,
+                'quota': quota
+            })
         
-        try:
-            # Probar AudD con el archivo de silencio
-            service = get_audd_service()
-            result = service.recognize_file(temp_path)
-            
-            # Limpiar archivo temporal
-            os.unlink(temp_path)
-            
-            if result.get('quota_exceeded'):
-                return Response({
-                    'quota_status': 'exceeded',
-                    'message': 'Cuota diaria de AudD agotada (25 reconocimientos)',
-                    'recommendation': 'Espera hasta mañana o considera AudD premium',
-                    'error': result.get('error'),
-                    'raw_response': result.get('raw_response')
-                })
-            elif result.get('success') == False and 'error' in result:
-                return Response({
-                    'quota_status': 'error',
-                    'message': 'Error conectando con AudD',
-                    'error': result.get('error'),
-                    'raw_response': result.get('raw_response')
-                })
-            else:
-                return Response({
-                    'quota_status': 'active',
-                    'message': 'AudD funcionando correctamente',
-                    'recognized': result.get('recognized', False),
-                    'remaining_quota': 'Cuota disponible (no se puede determinar el número exacto)'
-                })
-                
-        except Exception as e:
-            # Limpiar archivo temporal en caso de error
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-            raise e
+        return Response({
+            'quota_status': 'active',
+            'message': 'AudD funcionando correctamente',
+            'remaining_quota': quota['remaining'],
+            'quota': quota,
+            'acrcloud_quota': quota_limiter.status('acrcloud')
+        })
             
     except Exception as e:
         return Response({
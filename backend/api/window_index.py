@@ -0,0 +1,86 @@
+"""
+Almacén en disco de las ventanas de características de cada referencia
+
+Cada track guarda un único .npy float32 con las sumas por segmento de
+SimpleFingerprint.segment_features (última columna: frames del segmento).
+Se calcula una vez al hacer el fingerprint; el reconocimiento solo lee estos
+arrays (mapeados en memoria) y nunca vuelve a decodificar la referencia.
+"""
+import os
+import logging
+from typing import Optional, Tuple
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def window_directory() -> str:
+    """
+    Directorio de las ventanas (FINGERPRINT_WINDOW_DIR, por defecto bajo MEDIA_ROOT)
+    """
+    return getattr(
+        settings,
+        'FINGERPRINT_WINDOW_DIR',
+        os.path.join(settings.MEDIA_ROOT, 'fingerprint_index', 'windows')
+    )
+
+
+def _track_path(track_id: int) -> str:
+    return os.path.join(window_directory(), f"track_{int(track_id)}.npy")
+
+
+def store_track_windows(track_id: int, sums: np.ndarray, counts: np.ndarray) -> int:
+    """
+    Reemplaza los segmentos de un track
+
+    Args:
+        track_id (int): ID del track
+        sums (np.ndarray): Sumas por segmento (n_segmentos, columnas)
+        counts (np.ndarray): Frames de cada segmento
+
+    Returns:
+        int: Número de segmentos guardados
+    """
+    directory = window_directory()
+    os.makedirs(directory, exist_ok=True)
+
+    data = np.column_stack([
+        np.asarray(sums, dtype=np.float32),
+        np.asarray(counts, dtype=np.float32)
+    ])
+
+    # Escribir a un temporal y renombrar: los lectores nunca ven un archivo a medias
+    path = _track_path(track_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_path, data)
+    os.replace(tmp_path, path)
+
+    logger.info(f"{len(data)} segmentos guardados para track {track_id}")
+    return int(len(data))
+
+
+def load_track_windows(track_id: int, mmap_mode: Optional[str] = 'r') -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Lee los segmentos de un track
+
+    Returns:
+        Optional[Tuple[np.ndarray, np.ndarray]]: (sumas, frames por segmento) o None si no existen
+    """
+    try:
+        data = np.load(_track_path(track_id), mmap_mode=mmap_mode)
+    except (OSError, ValueError):
+        return None
+    if data.ndim != 2 or data.shape[1] < 2 or len(data) == 0:
+        return None
+    return data[:, :-1], data[:, -1].astype(np.int32)
+
+
+def delete_track_windows(track_id: int):
+    """
+    Borra los segmentos de un track (si existen)
+    """
+    try:
+        os.remove(_track_path(track_id))
+    except OSError:
+        pass
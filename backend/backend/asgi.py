@@ -3,6 +3,10 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Además de Django, sirve el stream SSE de estado de reconocimiento
+(/api/recognition-events/<file_id>/, ver api/sse.py). Ejecutar con un
+servidor ASGI, por ejemplo: uvicorn backend.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -13,4 +17,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Importar después de configurar Django
+from api.sse import match_path, recognition_events_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and match_path(scope['path']) is not None:
+        await recognition_events_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
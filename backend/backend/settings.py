@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 import os
 
 load_dotenv()
@@ -189,20 +190,63 @@ CORS_ALLOW_HEADERS = [
 
 AUDD_API_TOKEN = "6c93ce3041c7d38cbe29130ba95d8036"
 
+# Servidor local que imita AudD y ACRCloud (python manage.py run_mock_recognizer).
+# Si está definido, get_audd_service y get_acrcloud_service apuntan a él
+RECOGNITION_MOCK_URL = os.getenv("RECOGNITION_MOCK_URL")
+
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 CSRF_TRUSTED_ORIGINS = [
     'http://*', 'https://backend-production-71f7.up.railway.app',  
 ]
 
-# Configuración de Celery (modo desarrollo)
-CELERY_TASK_ALWAYS_EAGER = True  # Ejecutar tareas síncronamente en desarrollo
-CELERY_TASK_EAGER_PROPAGATES = True  # Propagar errores en modo desarrollo
-
-# Cache configuration (usar cache local en lugar de Redis temporalmente)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Configuración de Celery (app en melocuore/celery.py; worker: celery -A melocuore worker -l info)
+# Broker: Redis (CELERY_BROKER_URL=redis://host:6379/0). Sin broker, en desarrollo
+# (DEBUG) las tareas se ejecutan en el proceso que las encola; en producción es obligatorio
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
+if not CELERY_BROKER_URL and not DEBUG:
+    raise ImproperlyConfigured("CELERY_BROKER_URL es obligatorio con DEBUG=False (p. ej. redis://host:6379/0)")
+# El estado de cada tarea se guarda en los modelos (Recognition, Track): sin result backend
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND") or None
+CELERY_TASK_IGNORE_RESULT = True
+# CELERY_TASK_ALWAYS_EAGER=True ejecuta las tareas en el proceso que las encola (sin worker)
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "False") == "True" or not CELERY_BROKER_URL
+CELERY_TASK_EAGER_PROPAGATES = True  # Propagar errores en modo eager
+CELERY_ACCEPT_CONTENT = ["json"]
+CELERY_TASK_SERIALIZER = "json"
+CELERY_RESULT_SERIALIZER = "json"
+CELERY_TIMEZONE = TIME_ZONE
+
+# Cache compartido por todos los procesos (servidor web y workers de Celery).
+# Redis si se define CACHE_REDIS_URL; si no, una tabla de la base de datos
+# (python manage.py createcachetable). LocMemCache no sirve: cada proceso vería
+# solo sus propias entradas, y api/checks.py lo rechaza al arrancar
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+# 'recognition' guarda los resultados de AudD/ACRCloud (api/recognition_cache.py):
+# va aparte para que las entradas de 'default' no los expulsen y sobrevive a
+# los reinicios, así cada resultado ahorra cuota en todos los procesos
+RECOGNITION_CACHE_ALIAS = 'recognition'
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        },
+        RECOGNITION_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'recognition',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        },
+        RECOGNITION_CACHE_ALIAS: {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'recognition_cache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        },
     }
-}
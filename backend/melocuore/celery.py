@@ -1,28 +1,41 @@
 import os
 from celery import Celery
+from kombu import Queue
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'melocuore.settings')
+# Misma configuración que el servidor web (backend/settings.py)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 app = Celery('melocuore')
+# Broker, result backend y modo eager salen de los CELERY_* de settings
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
-# Configuración para modo desarrollo (sin Redis)
-app.conf.update(
-    task_always_eager=True,  # Ejecutar tareas síncronamente
-    task_eager_propagates=True,  # Propagar errores
-    broker_url=None,  # No usar broker
-    result_backend=None,  # No usar backend
-)
-
-# Configuración comentada para cuando se use Redis en producción
-# app.conf.broker_url = 'redis://localhost:6379/0'
-# app.conf.result_backend = 'redis://localhost:6379/0'
-
 # Configure task settings
 app.conf.task_serializer = 'json'
 app.conf.result_serializer = 'json'
 app.conf.accept_content = ['json']
 app.conf.task_track_started = True
 app.conf.task_time_limit = 3600  # 1 hour
-app.conf.worker_prefetch_multiplier = 1 
\ No newline at end of file
+app.conf.worker_prefetch_multiplier = 1
+
+# Colas por tipo de trabajo: cada una la consume un worker con el pool adecuado
+# (topología en DEJAVU_SETUP.md). Un worker sin -Q consume todas.
+#   interactive: reconocimientos locales que un usuario está esperando (CPU, cortos)
+#   external:    llamadas a AudD/ACRCloud (I/O, pool de hilos con mucha concurrencia)
+#   fingerprint: fingerprint de un track (CPU, prefork)
+#   batch:       trabajos largos de mantenimiento (CPU, worker propio para no bloquear al resto)
+app.conf.task_default_queue = 'celery'
+app.conf.task_queues = (
+    Queue('interactive'),
+    Queue('external'),
+    Queue('fingerprint'),
+    Queue('batch'),
+    Queue('celery'),
+)
+app.conf.task_routes = {
+    'api.tasks.recognize_audio_file': {'queue': 'interactive'},
+    'api.tasks.recognize_upload_external': {'queue': 'external'},
+    'api.tasks.fingerprint_track': {'queue': 'fingerprint'},
+    'api.tasks.batch_fingerprint_tracks': {'queue': 'batch'},
+    'api.tasks.cleanup_orphaned_fingerprints': {'queue': 'batch'},
+}
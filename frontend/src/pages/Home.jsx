@@ -105,7 +105,8 @@ function Home() {
                 },
             });
             
-            if (response.status === 201) {
+            // 202: reconocimiento encolado; 200: mismo audio reconocido hace poco
+            if ([200, 201, 202].includes(response.status)) {
                 console.log("📦 Upload response data:", response.data);
                 setMessage("¡Archivo subido con éxito! Reconociendo...");
                 setUploadedFiles(prev => [response.data, ...prev]);
@@ -160,6 +161,10 @@ function Home() {
                             setPollingError("Error en el reconocimiento: " + preview.error);
                         }
                         setAnalysisPolling(false);
+                    } else if (preview.status === 'processing') {
+                        // Reconocimiento encolado en el servidor: consultar el estado
+                        console.log("⏳ Reconocimiento en curso, esperando eventos de estado");
+                        watchRecognition(response.data.id);
                     } else {
                         // Status desconocido, hacer polling por seguridad
                         console.log("⚠️ Status desconocido en preview, iniciando polling");
@@ -188,12 +193,40 @@ function Home() {
         }
     };
 
+    // Eventos de estado (SSE): una conexión hasta el estado final y una sola
+    // consulta del resultado completo. Si el navegador o el servidor no lo
+    // soportan, se usa el polling tradicional
+    const watchRecognition = (fileId) => {
+        const token = localStorage.getItem(ACCESS_TOKEN);
+        if (!window.EventSource || !token) {
+            pollForRecognition(fileId);
+            return;
+        }
+        setAnalysisPolling(true);
+        const source = new EventSource(
+            `${api.defaults.baseURL}/api/recognition-events/${fileId}/?token=${encodeURIComponent(token)}`
+        );
+        source.addEventListener("status", (event) => {
+            const data = JSON.parse(event.data);
+            console.log("📡 Estado de reconocimiento:", data.status);
+            if (["found", "not_found", "error"].includes(data.status)) {
+                source.close();
+                pollForRecognition(fileId);
+            }
+        });
+        source.onerror = () => {
+            console.log("⚠️ Canal de eventos no disponible, usando polling");
+            source.close();
+            pollForRecognition(fileId);
+        };
+    };
+
     // Polling para reconocimiento
     const pollForRecognition = async (fileId, tries = 0) => {
         setAnalysisPolling(true);
         setComparison(null);
         setPollingError("");
-        const maxTries = 5; // Más intentos para reconocimiento
+        const maxTries = 12; // El reconocimiento corre en un worker (hasta ~30 s)
         const delay = 3000; // 3 segundos entre intentos
         try {
             console.log(`🔍 Attempting to fetch recognition for file ${fileId}, try ${tries + 1}`);